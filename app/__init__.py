@@ -64,6 +64,9 @@ def create_app(config_class):
         app.config['RATELIMIT_STORAGE_URL'] = 'memory://'
         app.logger.warning(f"Redis not available: {e}. Using in-memory storage.")
     
+    # Shared client for services that need Redis data structures (see app.utils.redis_client)
+    app.extensions['redis'] = redis_client
+    
     # Limiter (rate limiting)
     # Flask-Limiter 3.x reads RATELIMIT_STORAGE_URL and RATELIMIT_DEFAULT from app.config
     limiter.init_app(app)
@@ -78,6 +81,46 @@ def create_app(config_class):
     else:
         cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
     
+    # In-process LRU in front of the shared cache for hot objects
+    from app.services.two_tier_cache import two_tier_cache
+    two_tier_cache.init_app(app)
+    
+    # User-Agent classification cache for bot detection (per worker LRU + Redis)
+    from app.middleware.bot_detection import user_agent_cache
+    user_agent_cache.init_app(app)
+    
+    # Drop cached posts/profiles when the rows behind them are committed
+    from app.services.cache_manager import CacheManager
+    CacheManager.register_invalidation_events()
+    
+    # Sync post/gallery tag join tables and tag counters on flush
+    from app.services.tag_service import TagService
+    TagService.register_events()
+    
+    # Recent content hashes per user in Redis (duplicate post/comment check)
+    from app.services.spam_detector import SpamDetector
+    SpamDetector.register_events()
+    
+    # LSH index of recent posts for near-duplicate spam waves
+    from app.services.near_duplicate_index import near_duplicate_index
+    near_duplicate_index.init_app(app)
+    
+    # Rolling per-user post/comment counters (spam behaviour checks)
+    from app.services.activity_counters import activity_counters
+    activity_counters.init_app(app)
+    
+    # Write-behind post view counter (flushed by a background thread and on exit)
+    from app.services.view_counter import view_counter
+    view_counter.init_app(app)
+    
+    # In-process search index (only used with SEARCH_BACKEND=memory)
+    from app.services.search_index import search_index
+    search_index.init_app(app)
+    
+    # Related posts vector index (needs numpy; falls back to shared tags)
+    from app.services.related_posts import related_posts
+    related_posts.init_app(app)
+    
     # Create upload directories
     upload_dir = Path(app.config['UPLOAD_DIR'])
     (upload_dir / 'avatars').mkdir(parents=True, exist_ok=True)
@@ -86,7 +129,7 @@ def create_app(config_class):
     # Register blueprints
     from app.routes import main, auth, posts, comments, users, miku, goonzone, gallery, flash, i18n, captcha, admin, pages, rules
     from app.routes import miku_auto_comment, profile_posts, upload, miku_admin_request, search, analytics, preferences, reports, feedback
-    from app.routes import voluntary_ban
+    from app.routes import voluntary_ban, tags
     
     app.register_blueprint(main.main_bp)
     app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
@@ -112,6 +155,7 @@ def create_app(config_class):
     app.register_blueprint(preferences.preferences_bp, url_prefix='/api/preferences')
     app.register_blueprint(rules.rules_bp, url_prefix='/api/rules')
     app.register_blueprint(feedback.feedback_bp, url_prefix='/api/feedback')
+    app.register_blueprint(tags.tags_bp, url_prefix='/api/tags')
     
     # Static files routes (must be before React app route)
     @app.route('/ruffle/<path:filename>')
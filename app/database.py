@@ -19,7 +19,7 @@ def init_db():
         GoonZonePoll, GoonZoneNews, GoonZoneDoc, GoonZoneRule,
         Follow, Collection, CollectionItem, Report, AdminLog,
         Quote, Gallery, MikuInteraction, Translation, HtmlPage, IPBan, MikuSettings, ProfilePost, Image,
-        UserBookmark, UserPreference, ModerationLog, IPSpamLog, PostLike, CommentLike
+        UserBookmark, UserPreference, ModerationLog, IPSpamLog, PostLike, CommentLike, Tag, PostRecommendation
     )
     
     # Import security models
@@ -4,10 +4,39 @@ Authentication middleware
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
 from app.models.user import User
+from app.services.two_tier_cache import two_tier_cache
 import time
 import traceback
 
+# Columns cached for authenticated requests; credentials, e-mail and admin notes
+# stay out of the shared cache and are lazy-loaded on access
+CACHED_USER_COLUMNS = (
+    'id', 'username', 'avatar_url', 'bio', 'status', 'verification_type', 'verification_badge',
+    'premium_tag', 'activity_status', 'activity_data', 'language',
+    'is_banned', 'ban_until', 'is_muted', 'muted_until', 'can_post', 'warning_count',
+    'last_post_time', 'last_comment_time', 'followers_count', 'created_at', 'updated_at',
+)
+
+def load_user(user_id):
+    """Load the authenticated user through the two-tier cache (CACHED_USER_COLUMNS only)"""
+    cache_key = f"auth_user:{user_id}"
+    data = two_tier_cache.get(cache_key)
+    if data is None:
+        user = User.query.get(user_id)
+        if user is not None:
+            two_tier_cache.set(cache_key, {
+                column: getattr(user, column) for column in CACHED_USER_COLUMNS
+            })
+        return user
+    
+    # Attach a copy to the session without a SELECT; other columns and relationships load lazily
+    user = User(**data)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
 def token_required(f):
     """Decorator for protected routes"""
     @wraps(f)
@@ -35,7 +64,7 @@ def token_required(f):
             verify_jwt_in_request()
             user_id = get_jwt_identity()
 
-            user = User.query.get(user_id)
+            user = load_user(user_id)
             if not user or user.is_banned:
                 # #region agent log
                 with open('.cursor/debug.log', 'a', encoding='utf-8') as log_file:
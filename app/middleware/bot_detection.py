@@ -2,11 +2,16 @@
 Bot Detection - детектирование ботов и автоматизированных инструментов
 """
 
-from flask import request
+from flask import request, has_app_context
 from user_agents import parse
+from redis.exceptions import RedisError
+import hashlib
 import logging
 import re
+import threading
 from datetime import datetime, timedelta
+from app.services.two_tier_cache import LRUCache
+from app.utils.redis_client import get_redis
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +30,137 @@ class BotSignature:
         r'linkedinbot', r'slurp', r'msnbot'
     ]
     
+    # Все сигнатуры одним выражением. User-Agent приводится к нижнему регистру,
+    # а паттерны уже в нижнем, поэтому re.IGNORECASE (медленный) не нужен
+    BOT_PATTERN = re.compile('|'.join(BOT_USER_AGENTS))
+    
     SUSPICIOUS_HEADERS = [
         'x-forwarded-for-original', 'x-real-ip-original',
         'x-forwarded-host-original', 'x-forwarded-proto-original'
     ]
 
 
+def classify_user_agent(user_agent: str) -> dict:
+    """Классифицировать User-Agent (без кэша)
+    
+    Returns:
+        {'real_browser': bool, 'suspicious': bool}
+    """
+    suspicious = BotSignature.BOT_PATTERN.search(user_agent.lower()) is not None
+    
+    try:
+        ua = parse(user_agent)
+        
+        # Реальные браузеры имеют тип 'browser', операционную систему и браузер
+        real_browser = (
+            not ua.is_bot
+            and bool(ua.os.family) and ua.os.family != 'Other'
+            and bool(ua.browser.family) and ua.browser.family != 'Other'
+        )
+    except Exception as e:
+        logger.error(f"Ошибка парсинга User-Agent: {e}")
+        real_browser = True  # Даем пользователю второй шанс
+    
+    return {'real_browser': real_browser, 'suspicious': suspicious}
+
+
+class UserAgentCache:
+    """Кэш классификации User-Agent
+    
+    Разных User-Agent намного меньше, чем запросов, а разбор user_agents.parse -
+    каскад регулярных выражений (~1-2 мс). Результат зависит только от строки,
+    поэтому хранится в LRU процесса (L1) и в Redis (L2, общий для воркеров)
+    без инвалидации; TTL в Redis только ограничивает память.
+    """
+    
+    KEY_PREFIX = 'ua:'
+    # Длинные строки не кэшируются, чтобы мусорные заголовки не занимали память
+    MAX_LENGTH = 1024
+    
+    def __init__(self):
+        self.app = None
+        self.l1 = LRUCache(maxsize=10000)
+        self.shared = True
+        self.redis_ttl = 86400
+        self._stats_lock = threading.Lock()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'uncached': 0}
+    
+    def init_app(self, app):
+        """Настроить из конфига (первое приложение побеждает)"""
+        if self.app is not None:
+            return
+        self.app = app
+        self.l1 = LRUCache(maxsize=app.config.get('USER_AGENT_CACHE_MAXSIZE', 10000))
+        self.shared = app.config.get('USER_AGENT_CACHE_SHARED', True)
+        self.redis_ttl = app.config.get('USER_AGENT_CACHE_TTL', 86400)
+    
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+    
+    def _redis(self):
+        if not self.shared or not has_app_context():
+            return None
+        return get_redis()
+    
+    def classify(self, user_agent: str) -> dict:
+        """Классификация User-Agent: L1, затем Redis, затем разбор"""
+        if len(user_agent) > self.MAX_LENGTH:
+            self._count('uncached')
+            return classify_user_agent(user_agent)
+        
+        result = self.l1.get(user_agent)
+        if result is not None:
+            self._count('l1_hits')
+            return result
+        
+        r = self._redis()
+        key = f"{self.KEY_PREFIX}{hashlib.sha1(user_agent.encode('utf-8', 'replace')).hexdigest()}"
+        if r is not None:
+            try:
+                value = r.get(key)
+                if value is not None:
+                    if isinstance(value, bytes):
+                        value = value.decode()
+                    result = {'real_browser': value[0] == '1', 'suspicious': value[1] == '1'}
+                    self._count('l2_hits')
+                    self.l1.set(user_agent, result)
+                    return result
+            except RedisError as e:
+                logger.warning(f"Кэш User-Agent в Redis недоступен: {e}")
+                r = None
+        
+        self._count('misses')
+        result = classify_user_agent(user_agent)
+        self.l1.set(user_agent, result)
+        if r is not None:
+            try:
+                r.set(key, f"{int(result['real_browser'])}{int(result['suspicious'])}", ex=self.redis_ttl)
+            except RedisError as e:
+                logger.warning(f"Кэш User-Agent в Redis недоступен: {e}")
+        return result
+    
+    def get_stats(self):
+        """Попадания в кэш этого воркера"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        l2_lookups = stats['l2_hits'] + stats['misses']
+        stats.update({
+            'l1_size': len(self.l1),
+            'l1_maxsize': self.l1.maxsize,
+            'l1_hit_ratio': round(stats['l1_hits'] / lookups, 4) if lookups else None,
+            'l2_hit_ratio': round(stats['l2_hits'] / l2_lookups, 4) if l2_lookups else None,
+            'hit_ratio': round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else None,
+            'shared': self._redis() is not None,
+        })
+        return stats
+
+
+# Глобальный экземпляр
+user_agent_cache = UserAgentCache()
+
+
 class BotDetector:
     """Класс для детектирования ботов"""
     
@@ -42,39 +172,18 @@ class BotDetector:
     @staticmethod
     def is_suspicious_user_agent() -> bool:
         """Проверить если User-Agent подозрителен"""
-        user_agent = BotDetector.get_user_agent().lower()
+        user_agent = BotDetector.get_user_agent()
         
-        for pattern in BotSignature.BOT_USER_AGENTS:
-            if re.search(pattern, user_agent, re.IGNORECASE):
-                logger.warning(f"🤖 Подозрительный User-Agent: {user_agent}")
-                return True
+        if user_agent_cache.classify(user_agent)['suspicious']:
+            logger.warning(f"🤖 Подозрительный User-Agent: {user_agent.lower()}")
+            return True
         
         return False
     
     @staticmethod
     def is_real_browser() -> bool:
         """Проверить если это реальный браузер"""
-        user_agent = BotDetector.get_user_agent()
-        
-        try:
-            ua = parse(user_agent)
-            
-            # Реальные браузеры имеют тип 'browser'
-            if ua.is_bot:
-                return False
-            
-            # Должна быть операционная система
-            if not ua.os.family or ua.os.family == 'Other':
-                return False
-            
-            # Должен быть браузер
-            if not ua.browser.family or ua.browser.family == 'Other':
-                return False
-            
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка парсинга User-Agent: {e}")
-            return True  # Даем пользователю второй шанс
+        return user_agent_cache.classify(BotDetector.get_user_agent())['real_browser']
     
     @staticmethod
     def has_suspicious_headers() -> bool:
@@ -5,10 +5,15 @@ Spam Detector - детектирование спама и вредоносно
 import re
 import logging
 from datetime import datetime, timedelta
+from flask import current_app
 from app import db
 from app.models.user import User
 from app.models.post import Post
 from app.models.comment import Comment
+from app.services.activity_counters import activity_counters
+from app.services.near_duplicate_index import near_duplicate_index
+from app.utils.content_hash import content_hash
+from app.utils.pattern_matcher import PatternMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -48,9 +53,34 @@ class SpamPatterns:
     ]
 
 
+# Все паттерны контента в одном скомпилированном выражении (один проход по тексту).
+# Паттерны в нижнем регистре и применяются к тексту в нижнем регистре вместо re.IGNORECASE
+CONTENT_MATCHER = PatternMatcher(
+    [('spam', pattern) for pattern in SpamPatterns.SPAM_KEYWORDS]
+    + [('phishing', pattern) for pattern in SpamPatterns.PHISHING_KEYWORDS]
+    + [('malware', pattern) for pattern in SpamPatterns.MALWARE_KEYWORDS]
+    + [('profanity', pattern) for pattern in SpamPatterns.PROFANITY_KEYWORDS]
+)
+URL_MATCHER = PatternMatcher(
+    [('url', pattern) for pattern in SpamPatterns.SPAM_URLS]
+)
+
+# Очки и сообщение для каждой категории (проверки 1, 3, 4, 5)
+CONTENT_CHECKS = {
+    'spam': (15, 'Spam keyword detected', False),
+    'phishing': (25, 'Phishing attempt', True),
+    'malware': (30, 'Malware signature', True),
+    'profanity': (10, 'Profanity detected', False),
+}
+
+
 class SpamDetector:
     """Класс для детектирования спама"""
     
+    # Окна проверки поведения пользователя (секунды)
+    BEHAVIOR_RATE_WINDOW = 3600
+    BEHAVIOR_CONTENT_WINDOW = 86400
+    
     @staticmethod
     def clean_text(text: str) -> str:
         """Очистить текст от спец символов"""
@@ -63,6 +93,17 @@ class SpamDetector:
         urls = re.findall(r'https?://[^\s]+', text)
         return urls
     
+    @staticmethod
+    def _add_hits(checks: dict, hits: list, category: str):
+        """Начислить очки за найденные паттерны категории"""
+        points, label, is_spam = CONTENT_CHECKS[category]
+        for hit in hits:
+            if hit.category == category:
+                checks['score'] += points
+                checks['reasons'].append(f'{label}: {hit.pattern}')
+                if is_spam:
+                    checks['is_spam'] = True
+    
     @staticmethod
     def check_spam_content(text: str) -> dict:
         """Проверить контент на спам"""
@@ -77,41 +118,22 @@ class SpamDetector:
         
         text_lower = text.lower()
         
+        hits = CONTENT_MATCHER.search(text_lower)
+        
         # Проверка 1: Ключевые слова спама
-        for pattern in SpamPatterns.SPAM_KEYWORDS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                checks['score'] += 15
-                checks['reasons'].append(f'Spam keyword detected: {pattern}')
+        SpamDetector._add_hits(checks, hits, 'spam')
         
         # Проверка 2: Подозрительные URL
         urls = SpamDetector.extract_urls(text)
-        if urls:
-            for url in urls:
-                for pattern in SpamPatterns.SPAM_URLS:
-                    if re.search(pattern, url, re.IGNORECASE):
-                        checks['score'] += 20
-                        checks['reasons'].append(f'Suspicious URL: {url}')
-                        checks['is_spam'] = True
-        
-        # Проверка 3: Phishing попытки
-        for pattern in SpamPatterns.PHISHING_KEYWORDS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                checks['score'] += 25
-                checks['reasons'].append(f'Phishing attempt: {pattern}')
-                checks['is_spam'] = True
-        
-        # Проверка 4: Malware сигнатуры
-        for pattern in SpamPatterns.MALWARE_KEYWORDS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                checks['score'] += 30
-                checks['reasons'].append(f'Malware signature: {pattern}')
+        for url in urls:
+            for _ in URL_MATCHER.search(url.lower()):
+                checks['score'] += 20
+                checks['reasons'].append(f'Suspicious URL: {url}')
                 checks['is_spam'] = True
         
-        # Проверка 5: Профанность
-        for pattern in SpamPatterns.PROFANITY_KEYWORDS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                checks['score'] += 10
-                checks['reasons'].append(f'Profanity detected: {pattern}')
+        # Проверки 3-5: Phishing, malware, профанность
+        for category in ('phishing', 'malware', 'profanity'):
+            SpamDetector._add_hits(checks, hits, category)
         
         # Проверка 6: Повторяющиеся символы
         if re.search(r'(.)\1{5,}', text):  # Более 5 повторений
@@ -143,49 +165,38 @@ class SpamDetector:
         if not user:
             return checks
         
+        # Счетчики активности за последний час и сутки (без запросов к таблицам постов)
+        hour, day = SpamDetector.BEHAVIOR_RATE_WINDOW, SpamDetector.BEHAVIOR_CONTENT_WINDOW
+        counts = activity_counters.counts(user_id, (hour, day))
+        
         # Проверка 1: Много постов за короткий время
-        recent_posts = Post.query.filter(
-            Post.user_id == user_id,
-            Post.created_at >= datetime.utcnow() - timedelta(hours=1)
-        ).count()
+        recent_posts = counts['posts'][hour]
         
         if recent_posts > 10:
             checks['score'] += 20
             checks['reasons'].append(f'Too many posts in 1 hour: {recent_posts}')
         
         # Проверка 2: Много комментариев за короткий время
-        recent_comments = Comment.query.filter(
-            Comment.user_id == user_id,
-            Comment.created_at >= datetime.utcnow() - timedelta(hours=1)
-        ).count()
+        recent_comments = counts['comments'][hour]
         
         if recent_comments > 30:
             checks['score'] += 20
             checks['reasons'].append(f'Too many comments in 1 hour: {recent_comments}')
         
         # Проверка 3: Проверить если много одинаковых постов
-        recent_posts_content = db.session.query(Post.content).filter(
-            Post.user_id == user_id,
-            Post.created_at >= datetime.utcnow() - timedelta(days=1)
-        ).all()
+        day_posts = counts['posts'][day]
         
-        if len(recent_posts_content) > 3:
-            contents = [p[0] for p in recent_posts_content]
-            unique_contents = set(contents)
+        if day_posts > 3:
+            unique_contents = counts['post_texts'][day]
             
-            if len(unique_contents) < len(contents) * 0.3:  # Менее 30% уникального контента
+            if unique_contents < day_posts * 0.3:  # Менее 30% уникального контента
                 checks['score'] += 30
                 checks['reasons'].append('Duplicate content detected')
                 checks['is_spammer'] = True
         
         # Проверка 4: Всегда ссылки в постах
-        link_posts = Post.query.filter(
-            Post.user_id == user_id,
-            Post.created_at >= datetime.utcnow() - timedelta(days=1)
-        ).all()
-        
-        link_count = sum(1 for p in link_posts if 'http' in (p.content or '').lower())
-        if len(link_posts) > 5 and link_count / len(link_posts) > 0.9:
+        link_count = counts['link_posts'][day]
+        if day_posts > 5 and link_count / day_posts > 0.9:
             checks['score'] += 25
             checks['reasons'].append('Posts mostly contain links')
             checks['is_spammer'] = True
@@ -205,10 +216,13 @@ class SpamDetector:
         }
         
         # Проверить если этот контент уже был опубликован
+        # (индекс по user_id, content_hash, created_at; сравнение текста отсекает
+        # тексты, отличающиеся только регистром и пробелами по краям)
         similar_posts = Post.query.filter(
             Post.user_id == user_id,
-            Post.content == content,
-            Post.created_at >= datetime.utcnow() - timedelta(days=7)
+            Post.content_hash == content_hash(content),
+            Post.created_at >= datetime.utcnow() - timedelta(days=7),
+            Post.content == content
         ).count()
         
         if similar_posts > 2:
@@ -216,6 +230,16 @@ class SpamDetector:
             checks['score'] += 30
             checks['reasons'].append(f'Same content posted {similar_posts} times in 7 days')
         
+        # Почти тот же текст от других аккаунтов (волна спама, LSH индекс:
+        # находит и слегка измененные копии, тексты от MIN_TOKENS слов,
+        # за NEAR_DUPLICATE_HOURS)
+        near_duplicates = near_duplicate_index.find(content)
+        other_accounts = {match['user_id'] for match in near_duplicates} - {user_id}
+        if len(other_accounts) >= current_app.config.get('NEAR_DUPLICATE_WAVE_ACCOUNTS', 3):
+            checks['is_cross_spam'] = True
+            checks['score'] += 30
+            checks['reasons'].append(f'Same content posted by {len(other_accounts)} other accounts')
+        
         return checks
     
     @staticmethod
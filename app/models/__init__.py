@@ -27,6 +27,8 @@ from app.models.user_bookmark import UserBookmark
 from app.models.user_preference import UserPreference
 from app.models.post_like import PostLike
 from app.models.comment_like import CommentLike
+from app.models.tag import Tag
+from app.models.recommendation import PostRecommendation
 
 __all__ = [
     'User',
@@ -60,4 +62,6 @@ __all__ = [
     'UserPreference',
     'PostLike',
     'CommentLike',
+    'Tag',
+    'PostRecommendation',
 ]
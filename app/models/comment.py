@@ -2,6 +2,8 @@
 Comment model
 """
 from app import db
+from app.utils.content_hash import content_hash as compute_content_hash
+from sqlalchemy.orm import validates
 from datetime import datetime
 import uuid
 
@@ -14,13 +16,28 @@ class Comment(db.Model):
     user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     parent_id = db.Column(db.String(36), db.ForeignKey('comments.id', ondelete='CASCADE'), nullable=True)
     content = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the normalized content, set on assignment
     likes_count = db.Column(db.Integer, default=0, nullable=False)
     is_deleted = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    __table_args__ = (
+        # Top-level comments of a post in order, and reply lookup by parent
+        db.Index('idx_comment_thread', 'post_id', 'parent_id', 'created_at', 'id'),
+        db.Index('idx_comment_parent', 'parent_id', 'created_at'),
+        # Duplicate detection: same text by the same user recently
+        db.Index('idx_comment_user_hash', 'user_id', 'content_hash', 'created_at'),
+    )
+    
     # Relationships
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
     
+    @validates('content')
+    def _update_content_hash(self, key, value):
+        """Keep content_hash in step with content"""
+        self.content_hash = compute_content_hash(value)
+        return value
+    
     def to_dict(self, include_author=True, include_replies=True):
         """Serialize to dictionary"""
         data = {
@@ -20,6 +20,12 @@ class Gallery(db.Model):
     likes_count = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
+    __table_args__ = (
+        # Keyset pagination of the gallery listing
+        db.Index('idx_gallery_feed', 'created_at', 'id'),
+        db.Index('idx_gallery_category_feed', 'category', 'created_at', 'id'),
+    )
+    
     @property
     def tags_list(self):
         """Get tags as list"""
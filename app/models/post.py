@@ -2,6 +2,8 @@
 Post model
 """
 from app import db
+from app.utils.content_hash import content_hash as compute_content_hash
+from sqlalchemy.orm import validates
 from datetime import datetime
 import uuid
 import json
@@ -13,6 +15,7 @@ class Post(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the normalized content, set on assignment
     theme = db.Column(db.String(50), nullable=True)
     tags = db.Column(db.Text, nullable=True)  # JSON array string
     image_url = db.Column(db.String(500), nullable=True)
@@ -32,8 +35,17 @@ class Post(db.Model):
     
     __table_args__ = (
         db.Index('idx_post_popular', 'moderation_status', 'likes_count', 'created_at'),
+        db.Index('idx_post_feed', 'moderation_status', 'created_at', 'id'),
+        # Duplicate detection: same text by the same user recently
+        db.Index('idx_post_user_hash', 'user_id', 'content_hash', 'created_at'),
     )
     
+    @validates('content')
+    def _update_content_hash(self, key, value):
+        """Keep content_hash in step with content"""
+        self.content_hash = compute_content_hash(value)
+        return value
+    
     @property
     def tags_list(self):
         """Get tags as list"""
@@ -0,0 +1,23 @@
+"""
+Precomputed post recommendations (written by RecommendationService.build)
+"""
+from app import db
+from datetime import datetime
+
+
+class PostRecommendation(db.Model):
+    """One recommended post for a user, with its collaborative-filtering score"""
+    __tablename__ = 'post_recommendations'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.String(36), db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # A user's recommendations, best first
+        db.Index('idx_post_recommendations_user_score', 'user_id', 'score'),
+    )
+
+    def __repr__(self):
+        return f'<PostRecommendation {self.user_id} {self.post_id}>'
@@ -0,0 +1,53 @@
+"""
+Tag model and post/gallery tag join tables
+"""
+from app import db
+from datetime import datetime
+
+post_tags = db.Table(
+    'post_tags',
+    db.Column('post_id', db.String(36), db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    # Reverse lookup: posts with a tag
+    db.Index('idx_post_tags_tag', 'tag_id', 'post_id'),
+)
+
+gallery_tags = db.Table(
+    'gallery_tags',
+    db.Column('gallery_id', db.String(36), db.ForeignKey('gallery.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_gallery_tags_tag', 'tag_id', 'gallery_id'),
+)
+
+
+class Tag(db.Model):
+    """Tag with precomputed usage counts (maintained by TagService)"""
+    __tablename__ = 'tags'
+
+    MAX_LENGTH = 64
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(MAX_LENGTH), unique=True, nullable=False, index=True)
+    posts_count = db.Column(db.Integer, default=0, nullable=False)  # Approved, not deleted posts
+    gallery_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_tag_posts_count', 'posts_count'),
+    )
+
+    @property
+    def usage_count(self):
+        return self.posts_count + self.gallery_count
+
+    def to_dict(self):
+        """Serialize to dictionary"""
+        return {
+            'name': self.name,
+            'posts_count': self.posts_count,
+            'gallery_count': self.gallery_count,
+            'usage_count': self.usage_count,
+        }
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
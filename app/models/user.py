@@ -31,6 +31,7 @@ class User(db.Model):
     admin_notes = db.Column(db.Text, nullable=True)  # Admin comments about user
     last_post_time = db.Column(db.DateTime, nullable=True)
     last_comment_time = db.Column(db.DateTime, nullable=True)
+    followers_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Denormalized, see UserSuggestService
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -39,8 +40,15 @@ class User(db.Model):
     comments = db.relationship('Comment', backref='author', lazy='dynamic', cascade='all, delete-orphan')
     user_badges = db.relationship('UserBadge', backref='user', lazy='dynamic', cascade='all, delete-orphan', foreign_keys='UserBadge.user_id')
 
-    def to_dict(self, include_email=False):
-        """Serialize to dictionary"""
+    def to_dict(self, include_email=False, badges=None):
+        """Serialize to dictionary
+
+        Args:
+            include_email: Include the email address
+            badges: Preloaded UserBadge list (avoids a query per user)
+        """
+        if badges is None:
+            badges = self.user_badges
         data = {
             'id': self.id,
             'username': self.username,
@@ -53,7 +61,7 @@ class User(db.Model):
             'activity_status': self.activity_status,
             'activity_data': self.activity_data,
             'language': self.language,
-            'badges': [badge.to_dict() for badge in self.user_badges],
+            'badges': [badge.to_dict() for badge in badges],
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
         if include_email:
@@ -12,6 +12,8 @@ from app.models.miku_settings import MikuSettings
 from app.models.moderation_log import ModerationLog
 from app.middleware.auth import admin_required
 from app.middleware.security_manager import SuspiciousActivityTracker
+from app.services.serializers import serialize_posts, serialize_users
+from app.services.timeline_service import TimelineService
 from datetime import datetime, timedelta
 import uuid
 
@@ -36,7 +38,7 @@ def log_moderation_action(admin_id, user_id, action, reason=None, details=None):
 def get_users():
     """Получить список пользователей (только админ)"""
     users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    return jsonify(serialize_users(users)), 200
 
 @admin_bp.route('/users/<user_id>/ban', methods=['POST'])
 @admin_required
@@ -221,6 +223,26 @@ def get_user_moderation_history(user_id):
         'history': [log.to_dict() for log in history]
     }), 200
 
+@admin_bp.route('/users/<user_id>/activity', methods=['GET'])
+@admin_required
+def get_user_activity(user_id):
+    """Получить счетчики активности пользователя за скользящие окна (только админ)
+    
+    Параметр windows - длины окон в секундах через запятую (по умолчанию 300,3600,86400)
+    """
+    from app.services.activity_counters import activity_counters
+    
+    User.query.get_or_404(user_id)
+    try:
+        windows = [int(value) for value in request.args.get('windows', '300,3600,86400').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'windows должны быть целыми числами секунд'}), 400
+    if not windows or len(windows) > 10 or min(windows) <= 0:
+        return jsonify({'error': 'Укажите от 1 до 10 положительных окон'}), 400
+    
+    summary = activity_counters.summary(user_id, windows)
+    return jsonify({'user_id': user_id, **summary}), 200
+
 @admin_bp.route('/moderation-log', methods=['GET'])
 @admin_required
 def get_moderation_log():
@@ -248,7 +270,7 @@ def get_posts_for_moderation():
     """Получить посты для модерации (только админ)"""
     status = request.args.get('status', 'pending')
     posts = Post.query.filter_by(moderation_status=status).all()
-    return jsonify([post.to_dict() for post in posts]), 200
+    return jsonify(serialize_posts(posts)), 200
 
 @admin_bp.route('/posts/<post_id>/approve', methods=['POST'])
 @admin_required
@@ -257,6 +279,7 @@ def approve_post(post_id):
     post = Post.query.get_or_404(post_id)
     post.moderation_status = 'approved'
     db.session.commit()
+    TimelineService.fan_out(post)
     return jsonify(post.to_dict()), 200
 
 @admin_bp.route('/posts/<post_id>/reject', methods=['POST'])
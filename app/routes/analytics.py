@@ -5,6 +5,10 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.middleware.auth import admin_required
 from app.services.analytics_service import AnalyticsService
+from app.services.view_counter import view_counter
+from app.services.cache_manager import CacheManager
+from app.services.two_tier_cache import two_tier_cache
+from app.middleware.bot_detection import user_agent_cache
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -51,6 +55,22 @@ def get_health_status():
     health = AnalyticsService.get_health_check()
     return jsonify(health), 200
 
+@analytics_bp.route('/view-counter', methods=['GET'])
+@admin_required
+def get_view_counter_stats():
+    """Get pending view counts and flush latency of the write-behind view counter"""
+    return jsonify(view_counter.get_stats()), 200
+
+@analytics_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get cache hit/miss counters (per worker process)"""
+    return jsonify({
+        'read_through': CacheManager.get_stats(),
+        'two_tier': two_tier_cache.get_stats(),
+        'user_agents': user_agent_cache.get_stats(),
+    }), 200
+
 @analytics_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def get_dashboard():
@@ -10,6 +10,10 @@ from app.middleware.captcha import verify_captcha
 from app.middleware.ip_ban import check_ip_ban
 from app.middleware.spam_detector import check_spam
 from app.middleware.security_manager import SuspiciousActivityTracker
+from app.services.like_service import LikeService
+from app.services.trending_service import TrendingService
+from app.services.comment_thread_service import CommentThreadService
+from app.utils.pagination import InvalidCursor
 from app import limiter
 from datetime import datetime
 import uuid
@@ -18,17 +22,33 @@ comments_bp = Blueprint('comments', __name__)
 
 @comments_bp.route('/post/<post_id>', methods=['GET'])
 def get_comments(post_id):
-    """Получить комментарии для поста"""
-    post = Post.query.get_or_404(post_id)
-    
-    # Получить коммментарии верхнего уровня (без родителя)
-    comments = Comment.query.filter_by(
-        post_id=post_id,
-        parent_id=None,
-        is_deleted=False
-    ).order_by(Comment.created_at.asc()).all()
-    
-    return jsonify([comment.to_dict() for comment in comments]), 200
+    """
+    Получить комментарии для поста
+    
+    Без параметров возвращает все комментарии верхнего уровня с ответами.
+    С параметром cursor (пустой для первой страницы) — страница комментариев
+    верхнего уровня по ключу (created_at, id) и next_cursor.
+    """
+    Post.query.with_entities(Post.id).filter_by(id=post_id).first_or_404()
+    
+    if 'cursor' not in request.args:
+        return jsonify(CommentThreadService.get_thread(post_id)), 200
+    
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    try:
+        comments, next_cursor = CommentThreadService.get_thread_page(
+            post_id,
+            cursor=request.args.get('cursor') or None,
+            per_page=per_page
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Неверный курсор'}), 400
+    
+    return jsonify({
+        'comments': comments,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None,
+    }), 200
 
 @comments_bp.route('/', methods=['POST'])
 @token_required
@@ -119,6 +139,8 @@ def create_comment():
     db.session.add(comment)
     db.session.commit()
     
+    TrendingService.record_event(post, 'comment', comment.created_at)
+    
     # Логировать создание комментария
     SuspiciousActivityTracker.log_security_event(
         request.current_user.id,
@@ -133,25 +155,10 @@ def create_comment():
 @limiter.limit("30 per minute")  # Предотвратить спам лайков на комментариях
 def like_comment(comment_id):
     """Лайк/дизлайк комментария (toggle)"""
-    from app.models.comment_like import CommentLike
-    
     comment = Comment.query.get_or_404(comment_id)
-    user_id = request.current_user.id
-    
-    # Проверить, уже ли пользователь лайкнул этот коммент
-    existing_like = CommentLike.query.filter_by(comment_id=comment_id, user_id=user_id).first()
     
-    if existing_like:
-        # Удалить лайк (дизлайк)
-        db.session.delete(existing_like)
-        comment.likes_count = max(0, comment.likes_count - 1)
-    else:
-        # Добавить лайк
-        like = CommentLike(comment_id=comment_id, user_id=user_id)
-        db.session.add(like)
-        comment.likes_count += 1
-    
-    db.session.commit()
+    # Вставка/удаление лайка и счетчик меняются атомарно на стороне БД
+    LikeService.toggle_comment_like(comment.id, request.current_user.id)
     
     return jsonify(comment.to_dict()), 200
 
@@ -168,6 +175,8 @@ def delete_comment(comment_id):
     comment.post.comments_count -= 1
     db.session.commit()
     
+    TrendingService.record_event(comment.post, 'uncomment', comment.created_at)
+    
     return jsonify({'message': 'Комментарий удален'}), 200
 
 
@@ -5,23 +5,46 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.gallery import Gallery
 from app.models.post import Post
+from app.models.tag import Tag, post_tags, gallery_tags
+from app.services.tag_service import TagService
 from app.middleware.auth import token_required
 from app.middleware.captcha import verify_captcha
-from sqlalchemy import or_
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from sqlalchemy import or_, exists
 import json
 
 gallery_bp = Blueprint('gallery', __name__)
 
 @gallery_bp.route('/', methods=['GET'])
 def get_gallery():
-    """Get gallery images"""
+    """
+    Get gallery images
+
+    Pagination:
+    - page (default) - classic pages with total
+    - cursor (empty for the first page) - keyset on (created_at, id), returns
+      next_cursor; total is only counted with include_total=1 (or true/yes)
+    """
     category = request.args.get('category')
     tag = request.args.get('tag')
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
-    
-    # LEFT JOIN to include user-uploaded items (post_id=NULL)
-    query = Gallery.query.outerjoin(Post)
+    use_cursor = 'cursor' in request.args
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    
+    # One projection query: only the columns the listing needs, post tags included.
+    # The outer join is on the post primary key, so rows never repeat (no DISTINCT).
+    query = db.session.query(
+        Gallery.id,
+        Gallery.image_url,
+        Gallery.post_id,
+        Gallery.tags,
+        Post.tags.label('post_tags'),
+        Gallery.is_nsfw,
+        Gallery.likes_count,
+        Gallery.created_at,
+    ).outerjoin(Post, Post.id == Gallery.post_id)
     
     # Either: user-uploaded (post_id is NULL) OR post-linked with approved post
     query = query.filter(
@@ -34,40 +57,43 @@ def get_gallery():
     if category:
         query = query.filter(Gallery.category == category)
     
-    if tag:
-        # Filter by tag in either gallery.tags or post.tags
-        query = query.filter(
-            or_(
-                Gallery.tags.contains(f'"{tag}"'),
-                Post.tags.contains(f'"{tag}"')
+    # Same normalization as stored tags ('#Miku ' -> 'Miku')
+    tag_names = TagService.normalize([tag])
+    if tag_names:
+        # Filter by tag in either gallery tags or post tags (indexed join tables)
+        tag_id = Tag.query.with_entities(Tag.id).filter_by(name=tag_names[0]).scalar()
+        if tag_id is None:
+            query = query.filter(db.false())
+        else:
+            query = query.filter(
+                or_(
+                    exists().where(gallery_tags.c.gallery_id == Gallery.id, gallery_tags.c.tag_id == tag_id),
+                    exists().where(post_tags.c.post_id == Gallery.post_id, post_tags.c.tag_id == tag_id)
+                )
             )
-        )
     
-    pagination = query.distinct().order_by(Gallery.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    
-    items = []
-    for gallery_item in pagination.items:
-        post = Post.query.get(gallery_item.post_id) if gallery_item.post_id else None
-        # Get tags from gallery_item tags field or post tags
-        tags = []
-        if hasattr(gallery_item, 'tags') and gallery_item.tags:
-            tags = gallery_item.tags_list
-        elif post:
-            tags = post.tags_list
+    sort_columns = [Gallery.created_at, Gallery.id]
+    if use_cursor:
+        total = query.order_by(None).count() if include_total else None
+        try:
+            rows, next_cursor = keyset_paginate(query, sort_columns, cursor=cursor, per_page=per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Неверный курсор'}), 400
         
-        items.append({
-            'id': gallery_item.id,
-            'image_url': gallery_item.image_url,
-            'post_id': gallery_item.post_id,
-            'tags': tags,
-            'is_nsfw': gallery_item.is_nsfw,
-            'likes_count': gallery_item.likes_count,
-            'created_at': gallery_item.created_at.isoformat() if gallery_item.created_at else None,
-        })
-    
-    return jsonify({
-        'items': items,
-        'pagination': {
+        pagination_data = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'has_prev': cursor is not None,
+        }
+        if total is not None:
+            pagination_data['total'] = total
+    else:
+        pagination = query.order_by(*[column.desc() for column in sort_columns]).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        rows = pagination.items
+        pagination_data = {
             'page': page,
             'per_page': per_page,
             'total': pagination.total,
@@ -75,28 +101,31 @@ def get_gallery():
             'has_next': pagination.has_next,
             'has_prev': pagination.has_prev,
         }
+    
+    items = []
+    for row in rows:
+        items.append({
+            'id': row.id,
+            'image_url': row.image_url,
+            'post_id': row.post_id,
+            # Tags from the gallery item, else from the linked post
+            'tags': TagService.parse(row.tags if row.tags else row.post_tags),
+            'is_nsfw': row.is_nsfw,
+            'likes_count': row.likes_count,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+        })
+    
+    return jsonify({
+        'items': items,
+        'pagination': pagination_data
     }), 200
 
 @gallery_bp.route('/tags', methods=['GET'])
 def get_tags():
     """Get all tags"""
-    # Extract unique tags from posts
-    posts = Post.query.filter(
-        Post.is_deleted == False,
-        Post.moderation_status == 'approved',
-        Post.tags.isnot(None)
-    ).all()
-    
-    tags = set()
-    for post in posts:
-        if post.tags:
-            try:
-                post_tags = json.loads(post.tags) if isinstance(post.tags, str) else post.tags
-                tags.update(post_tags)
-            except:
-                pass
-    
-    return jsonify(sorted(list(tags))), 200
+    # Precomputed counters: only tags used by visible posts or gallery items
+    tags = TagService.get_tags(sort='name', limit=1000)
+    return jsonify([tag.name for tag in tags]), 200
 
 @gallery_bp.route('/<item_id>/like', methods=['POST'])
 @token_required
@@ -131,7 +160,7 @@ def upload_to_gallery():
     gallery_item = Gallery(
         image_url=data.get('image_url'),
         is_nsfw=data.get('is_nsfw', False),
-        tags=json.dumps(tags),
+        tags=json.dumps(TagService.normalize(tags)),
         user_id=current_user.id,
         category='user-uploads'
     )
@@ -5,6 +5,9 @@ from flask import Blueprint, request, jsonify
 from app.middleware.auth import token_required, admin_required
 from app import db
 from app.models.translation import Translation
+from app.services.two_tier_cache import two_tier_cache
+from app.services.cache_manager import CacheManager
+from app.utils.http_cache import not_modified, conditional_json
 import json
 
 i18n_bp = Blueprint('i18n', __name__)
@@ -403,15 +406,8 @@ def init_default_translations():
                     db.session.add(translation)
     db.session.commit()
 
-@i18n_bp.route('/translations', methods=['GET'])
-def get_translations():
-    """Get translations for language"""
-    lang = request.args.get('lang', 'ru')
-    
-    if lang not in ['ru', 'uk', 'en', 'kz']:
-        lang = 'ru'
-    
-    # Load from database
+def build_translations(lang):
+    """Load translations for a language from the database as a nested dict"""
     translations_db = Translation.query.filter_by(language=lang).all()
     
     if not translations_db:
@@ -429,8 +425,23 @@ def get_translations():
                 current[key] = {}
             current = current[key]
         current[keys[-1]] = trans.value
+    return result
+
+@i18n_bp.route('/translations', methods=['GET'])
+def get_translations():
+    """Get translations for language"""
+    lang = request.args.get('lang', 'ru')
+    
+    if lang not in ['ru', 'uk', 'en', 'kz']:
+        lang = 'ru'
+    
+    versions = CacheManager.get_versions([f"i18n:{lang}"])
+    response = not_modified(versions)
+    if response is not None:
+        return response
     
-    return jsonify(result), 200
+    result = two_tier_cache.get_or_set(f"translations:{lang}", lambda: build_translations(lang))
+    return conditional_json(result, versions), 200
 
 @i18n_bp.route('/translations', methods=['POST'])
 @admin_required
@@ -461,6 +472,8 @@ def update_translation():
         db.session.add(translation)
     
     db.session.commit()
+    two_tier_cache.delete(f"translations:{language}")
+    CacheManager.bump_versions([f"i18n:{language}"])
     return jsonify(translation.to_dict()), 200
 
 @i18n_bp.route('/set-language', methods=['POST'])
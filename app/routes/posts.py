@@ -10,6 +10,16 @@ from app.middleware.ip_ban import check_ip_ban
 from app.middleware.spam_detector import check_spam
 from app.middleware.security_manager import SuspiciousActivityTracker
 from app.middleware.sql_injection_protection import protect_from_sql_injection
+from app.utils.pagination import keyset_paginate, encode_cursor, decode_cursor, InvalidCursor
+from app.utils.http_cache import not_modified, conditional_json
+from app.services.serializers import serialize_posts
+from app.services.timeline_service import TimelineService
+from app.services.view_counter import view_counter
+from app.services.related_posts import related_posts
+from app.services.like_service import LikeService
+from app.services.trending_service import TrendingService
+from app.services.cache_manager import CacheManager
+from app.services.tag_service import TagService
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from app import limiter
 from datetime import datetime
@@ -18,13 +28,44 @@ import uuid
 posts_bp = Blueprint('posts', __name__)
 
 @posts_bp.route('/', methods=['GET'])
-@protect_from_sql_injection
+@protect_from_sql_injection(fields=('filter', 'emotion'))
 def get_posts():
-    """Получить список постов"""
+    """Получить список постов
+
+    Поддерживает два режима пагинации:
+    - page/per_page (старые клиенты) — OFFSET и полный подсчет total;
+    - cursor (пустой для первой страницы) — keyset по ключу сортировки,
+      возвращает next_cursor, total считается только при include_total=1.
+    """
     filter_type = request.args.get('filter', 'new')  # новое, популярное, следящее
     emotion = request.args.get('emotion')
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
+    use_cursor = 'cursor' in request.args
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    
+    # Первая страница публичных лент одинакова для всех — отдаем из кеша
+    feed_cache_key = None
+    if filter_type != 'following' and (cursor is None if use_cursor else page == 1):
+        feed_cache_key = CacheManager.feed_key(
+            'popular' if filter_type == 'popular' else 'new',
+            emotion if emotion in ('HP', 'AG', 'NT') else None,
+            per_page, use_cursor, include_total
+        )
+    
+    # Публичные ленты: ETag из версии ленты, 304 до запросов в БД
+    feed_versions = None
+    if filter_type != 'following':
+        feed_versions = [CacheManager.get_version('feed'), CacheManager.feed_window_version()]
+        response = not_modified(feed_versions)
+        if response is not None:
+            return response
+    
+    if feed_cache_key:
+        cached_feed = CacheManager.cache_feed(feed_cache_key)
+        if cached_feed is not None:
+            return conditional_json(cached_feed, feed_versions), 200
     
     query = Post.query.filter_by(is_deleted=False, moderation_status='approved')
 
@@ -33,64 +74,177 @@ def get_posts():
         query = query.filter_by(theme=emotion)
     
     if filter_type == 'popular':
-        query = query.order_by(Post.likes_count.desc(), Post.created_at.desc())
+        sort_columns = [Post.likes_count, Post.created_at, Post.id]
     elif filter_type == 'following':
         from app.models.follow import Follow
-        from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
         
+        user_id = None
         try:
             verify_jwt_in_request(optional=True)
             user_id = get_jwt_identity()
-            if user_id:
-                following_ids = [f.following_id for f in Follow.query.filter_by(follower_id=user_id).all()]
-                following_ids.append(user_id)  # Включить собственные посты
-                if following_ids:
-                    query = query.filter(Post.user_id.in_(following_ids))
-                else:
-                    # Нет следящих пользователей, возвращаем пусто
-                    return jsonify({
-                        'posts': [],
-                        'pagination': {
-                            'page': page,
-                            'per_page': per_page,
-                            'total': 0,
-                            'pages': 0,
-                            'has_next': False,
-                            'has_prev': False,
-                        }
-                    }), 200
         except:
             pass
-        query = query.order_by(Post.created_at.desc())
+        
+        if user_id:
+            if emotion not in ('HP', 'AG', 'NT'):
+                # Материализованная лента в Redis; None — Redis недоступен, идем в SQL
+                try:
+                    response = _following_timeline_response(user_id, use_cursor, cursor, page, per_page, include_total)
+                except InvalidCursor:
+                    return jsonify({'error': 'Неверный курсор'}), 400
+                if response is not None:
+                    return response
+            
+            following_ids = db.session.query(Follow.following_id).filter_by(follower_id=user_id)
+            # Включить собственные посты
+            query = query.filter(Post.user_id.in_(following_ids) | (Post.user_id == user_id))
+        sort_columns = [Post.created_at, Post.id]
     else:  # новое
-        query = query.order_by(Post.created_at.desc())
+        sort_columns = [Post.created_at, Post.id]
     
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if use_cursor:
+        total = query.count() if include_total else None
+        try:
+            items, next_cursor = keyset_paginate(query, sort_columns, cursor=cursor, per_page=per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Неверный курсор'}), 400
+        
+        pagination_data = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'has_prev': cursor is not None,
+        }
+        if total is not None:
+            pagination_data['total'] = total
+        
+        feed_data = {
+            'posts': serialize_posts(items),
+            'pagination': pagination_data
+        }
+    else:
+        query = query.order_by(*[column.desc() for column in sort_columns])
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        
+        feed_data = {
+            'posts': serialize_posts(pagination.items),
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': pagination.total,
+                'pages': pagination.pages,
+                'has_next': pagination.has_next,
+                'has_prev': pagination.has_prev,
+            }
+        }
+    
+    if feed_cache_key:
+        CacheManager.set_feed(feed_cache_key, feed_data)
+    
+    if feed_versions:
+        return conditional_json(feed_data, feed_versions), 200
+    return jsonify(feed_data), 200
 
+def _following_timeline_response(user_id, use_cursor, cursor, page, per_page, include_total):
+    """Ответ ленты подписок из материализованной ленты (None — использовать SQL)"""
+    if per_page < 1:
+        return None
+    sort_columns = [Post.created_at, Post.id]
+    
+    if use_cursor:
+        before = decode_cursor(cursor, sort_columns) if cursor else None
+        posts = TimelineService.get_feed(user_id, per_page + 1, before=before)
+        if posts is None:
+            return None
+        
+        next_cursor = None
+        if len(posts) > per_page:
+            posts = posts[:per_page]
+            next_cursor = encode_cursor([posts[-1].created_at, posts[-1].id])
+        
+        pagination_data = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'has_prev': cursor is not None,
+        }
+        if include_total:
+            total = TimelineService.size(user_id)
+            if total is None:
+                return None
+            pagination_data['total'] = total
+        
+        return jsonify({
+            'posts': serialize_posts(posts),
+            'pagination': pagination_data
+        }), 200
+    
+    page = max(page, 1)
+    posts = TimelineService.get_feed(user_id, per_page, offset=(page - 1) * per_page)
+    total = TimelineService.size(user_id)
+    if posts is None or total is None:
+        return None
+    pages = (total + per_page - 1) // per_page if per_page else 0
+    
     return jsonify({
-        'posts': [post.to_dict() for post in pagination.items],
+        'posts': serialize_posts(posts),
         'pagination': {
             'page': page,
             'per_page': per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev,
+            'total': total,
+            'pages': pages,
+            'has_next': page < pages,
+            'has_prev': page > 1,
         }
     }), 200
 
 @posts_bp.route('/<post_id>', methods=['GET'])
 def get_post(post_id):
     """Получить единое сообщение"""
-    post = Post.query.get_or_404(post_id)
+    cached = CacheManager.cache_post(post_id)
+    if cached is None:
+        post = Post.query.get_or_404(post_id)
+        
+        if post.is_deleted:
+            return jsonify({'error': 'Пост не найден'}), 404
+        
+        # Автор хранится отдельно, чтобы изменения профиля не требовали сброса всех постов
+        cached = {'post': post.to_dict(include_author=False), 'user_id': post.user_id}
+        CacheManager.set_post(post.id, cached)
+    
+    # Просмотры буферизуются и записываются пачками (см. app.services.view_counter)
+    pending_views = view_counter.record(cached['post']['id'])
+    
+    # ETag из версий поста и автора; просмотры сами по себе не меняют ETag
+    is_anonymous = cached['post']['is_anonymous']
+    version_names = [f"post:{cached['post']['id']}"]
+    if not is_anonymous:
+        version_names.append(f"user:{cached['user_id']}")
+    versions = CacheManager.get_versions(version_names)
+    response = not_modified(versions)
+    if response is not None:
+        return response
+    
+    data = dict(cached['post'])
+    if not is_anonymous:
+        data['author'] = CacheManager.get_author(cached['user_id'])
+    data['views_count'] += pending_views
+    return conditional_json(data, versions), 200
+
+@posts_bp.route('/<post_id>/related', methods=['GET'])
+def get_related_posts(post_id):
+    """Похожие посты (по тексту и тегам)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
     
-    if post.is_deleted:
+    exists = db.session.query(Post.id).filter(Post.id == post_id, Post.is_deleted == False).first()
+    if exists is None:
         return jsonify({'error': 'Пост не найден'}), 404
     
-    post.views_count += 1
-    db.session.commit()
-    
-    return jsonify(post.to_dict()), 200
+    posts = [
+        post for post in CacheManager.get_posts(related_posts.related_ids(post_id, limit))
+        if post['moderation_status'] == 'approved'
+    ]
+    return jsonify({'posts': posts, 'count': len(posts)}), 200
 
 @posts_bp.route('/', methods=['POST'])
 @limiter.limit("5 per minute")  # Ограничение: 5 постов в минуту
@@ -196,7 +350,7 @@ def create_post():
         user_id=request.current_user.id,
         content=content,
         theme=data.get('theme'),
-        tags_list=data.get('tags', []),
+        tags_list=TagService.normalize(data.get('tags', [])),
         image_url=data.get('image_url'),
         is_nsfw=data.get('is_nsfw', False),
         is_anonymous=data.get('is_anonymous', False),
@@ -214,6 +368,9 @@ def create_post():
     
     db.session.commit()
     
+    # Разослать пост в ленты подписчиков (только одобренные)
+    TimelineService.fan_out(post)
+    
     # Сбросить статус активности после 30 секунд и запустить автокомментарий Miku
     from threading import Timer
     from app.models.user import User
@@ -255,25 +412,14 @@ def create_post():
 @limiter.limit("30 per minute")  # Предотвратить спам лайков на IP/пользователя
 def like_post(post_id):
     """Лайк/дизлайк поста (toggle)"""
-    from app.models.post_like import PostLike
-    
     post = Post.query.get_or_404(post_id)
-    user_id = request.current_user.id
     
-    # Проверить, уже ли пользователь лайкнул этот пост
-    existing_like = PostLike.query.filter_by(post_id=post_id, user_id=user_id).first()
-    
-    if existing_like:
-        # Удалить лайк (дизлайк)
-        db.session.delete(existing_like)
-        post.likes_count = max(0, post.likes_count - 1)
-    else:
-        # Добавить лайк
-        like = PostLike(post_id=post_id, user_id=user_id)
-        db.session.add(like)
-        post.likes_count += 1
-    
-    db.session.commit()
+    # Вставка/удаление лайка и счетчик меняются атомарно на стороне БД
+    liked, liked_at = LikeService.toggle_post_like(post.id, request.current_user.id)
+    if liked_at is not None:
+        # Лайк снимается с тем же весом по времени, с которым был добавлен
+        TrendingService.record_event(post, 'like' if liked else 'unlike', liked_at)
+    CacheManager.invalidate_post(post.id)
     
     return jsonify(post.to_dict()), 200
 
@@ -315,6 +461,8 @@ def repost(post_id):
     db.session.add(repost)
     db.session.commit()
     
+    TrendingService.record_event(original_post, 'repost')
+    
     return jsonify(repost.to_dict()), 201
 
 @posts_bp.route('/<post_id>/report', methods=['POST'])
@@ -356,4 +504,6 @@ def delete_post(post_id):
     post.is_deleted = True
     db.session.commit()
     
+    TrendingService.remove(post.id)
+    
     return jsonify({'message': 'Пост удален'}), 200
@@ -1,13 +1,14 @@
 """
 Search and discovery routes
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models.user import User
 from app.models.post import Post
 from app.models.user_bookmark import UserBookmark
 from app.middleware.auth import token_required
 from app.services.search_service import SearchService
+from app.services.user_suggest_service import UserSuggestService
 from flask_jwt_extended import get_jwt_identity
 import uuid
 
@@ -18,9 +19,10 @@ def search_posts():
     """
     Search for posts
     Query params: q (query), emotion, sort_by (new/popular/trending/relevant), 
-    date_range, author, min_likes, max_likes, page, per_page
+    date_range, author, min_likes, max_likes, page, per_page, lang (ru/uk/en)
     """
     query = request.args.get('q', '').strip()
+    lang = request.args.get('lang')
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
     
@@ -38,7 +40,7 @@ def search_posts():
     if request.args.get('max_likes'):
         filters['max_likes'] = request.args.get('max_likes', type=int)
     
-    result = SearchService.search_posts(query, filters, page, per_page)
+    result = SearchService.search_posts(query, filters, page, per_page, lang=lang)
     return jsonify(result), 200
 
 @search_bp.route('/users', methods=['GET'])
@@ -57,6 +59,22 @@ def search_users():
     result = SearchService.search_users(query, page, per_page)
     return jsonify(result), 200
 
+@search_bp.route('/users/suggest', methods=['GET'])
+def suggest_users():
+    """
+    Username typeahead: prefix (then similar) matches ranked by followers
+    Query params: q (query), limit
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config.get('USER_SUGGEST_MAX_LIMIT', 20))
+    
+    if not query:
+        return jsonify({'users': []}), 200
+    if len(query) > 50:
+        return jsonify({'error': 'Query too long (max 50 chars)'}), 400
+    
+    return jsonify({'users': UserSuggestService.suggest(query, limit)}), 200
+
 @search_bp.route('/trending', methods=['GET'])
 def get_trending():
     """
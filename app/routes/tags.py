@@ -0,0 +1,23 @@
+"""
+Tags routes - tag list with precomputed usage counts
+"""
+from flask import Blueprint, request, jsonify
+from app.services.tag_service import TagService
+
+tags_bp = Blueprint('tags', __name__)
+
+@tags_bp.route('', methods=['GET'])
+def get_tags():
+    """Get tags with usage counts (sort=popular|name, q=prefix, source=posts|gallery)"""
+    sort = request.args.get('sort', 'popular')
+    prefix = request.args.get('q', '').strip() or None
+    source = request.args.get('source')
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    
+    if sort not in ('popular', 'name'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    if source not in (None, 'posts', 'gallery'):
+        return jsonify({'error': 'Invalid source'}), 400
+    
+    tags = TagService.get_tags(sort=sort, limit=limit, prefix=prefix, source=source)
+    return jsonify({'tags': [tag.to_dict() for tag in tags]}), 200
@@ -9,6 +9,11 @@ from app.middleware.auth import token_required
 from app.middleware.security_manager import SuspiciousActivityTracker
 from app.middleware.sql_injection_protection import validate_request
 from app.utils.password import hash_password
+from app.services.serializers import serialize_posts
+from app.services.timeline_service import TimelineService
+from app.services.cache_manager import CacheManager
+from app.services.user_suggest_service import UserSuggestService
+from app.utils.http_cache import not_modified, conditional_json
 import uuid
 
 users_bp = Blueprint('users', __name__)
@@ -16,9 +21,18 @@ users_bp = Blueprint('users', __name__)
 @users_bp.route('/<username>', methods=['GET'])
 def get_user(username):
     """Get user profile"""
-    user = User.query.filter_by(username=username).first_or_404()
-    
-    return jsonify(user.to_dict()), 200
+    versions = CacheManager.get_versions([f"profile:{username}"])
+    response = not_modified(versions)
+    if response is not None:
+        return response
+    
+    user_data = CacheManager.cache_user_profile(username)
+    if user_data is None:
+        user = User.query.filter_by(username=username).first_or_404()
+        user_data = user.to_dict()
+        CacheManager.set_user_profile(username, user_data)
+    
+    return conditional_json(user_data, versions), 200
 
 @users_bp.route('/<username>/posts', methods=['GET'])
 def get_user_posts(username):
@@ -37,7 +51,7 @@ def get_user_posts(username):
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'posts': [post.to_dict() for post in pagination.items],
+        'posts': serialize_posts(pagination.items),
         'pagination': {
             'page': page,
             'per_page': per_page,
@@ -118,6 +132,7 @@ def follow_user(user_id):
     
     if existing_follow:
         db.session.delete(existing_follow)
+        UserSuggestService.adjust_followers(user_id, -1)
         action = 'unfollowed'
     else:
         follow = Follow(
@@ -126,8 +141,12 @@ def follow_user(user_id):
             following_id=user_id
         )
         db.session.add(follow)
+        UserSuggestService.adjust_followers(user_id, 1)
         action = 'followed'
     
     db.session.commit()
     
+    # Состав ленты подписок изменился — пересобрать при следующем чтении
+    TimelineService.invalidate(request.current_user.id)
+    
     return jsonify({'message': f'User {action}', 'action': action}), 200
@@ -0,0 +1,108 @@
+"""
+Microbenchmark of the spam pattern matching
+Run with: python -m app.scripts.bench_spam_matcher [words_per_post] [repeats]
+
+Times the per-pattern regex loops the spam detectors used to run against
+the shared PatternMatcher on short and long posts, and checks that both
+find exactly the same patterns. Needs no database or app context.
+"""
+import random
+import re
+import sys
+import time
+from app.services.spam_detector import SPAM_KEYWORDS, SpamDetector as ServiceSpamDetector
+from app.middleware.spam_detector import SpamPatterns, CONTENT_MATCHER, URL_MATCHER
+
+FILLER = (
+    'сегодня гуляли в парке и обсуждали новый альбом группы погода была отличная '
+    'we watched the match yesterday and talked about the classic hell of a game '
+    'мику поёт лучше всех а ещё мы нарисовали фанарт и выложили его в галерею '
+    # Near misses: keywords inside longer words, case variants
+    'cryptography Hello classic Bitcoins wallets CLICK Here https://example.com/promo'
+).split()
+
+CONTENT_PATTERNS = (
+    [('spam', pattern) for pattern in SpamPatterns.SPAM_KEYWORDS]
+    + [('phishing', pattern) for pattern in SpamPatterns.PHISHING_KEYWORDS]
+    + [('malware', pattern) for pattern in SpamPatterns.MALWARE_KEYWORDS]
+    + [('profanity', pattern) for pattern in SpamPatterns.PROFANITY_KEYWORDS]
+)
+
+
+def old_keywords(content):
+    """Previous SpamDetector.check_spam_keywords: one regex built per keyword"""
+    text_lower = content.lower()
+    return sorted(
+        keyword for keyword in SPAM_KEYWORDS
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower)
+    )
+
+
+def old_content_hits(text):
+    """Previous check_spam_content pattern loops"""
+    text_lower = text.lower()
+    return [
+        (category, pattern) for category, pattern in CONTENT_PATTERNS
+        if re.search(pattern, text_lower, re.IGNORECASE)
+    ]
+
+
+def old_url_hits(url):
+    """Previous suspicious URL loop"""
+    return [pattern for pattern in SpamPatterns.SPAM_URLS if re.search(pattern, url, re.IGNORECASE)]
+
+
+def make_post(words, spam_words=()):
+    tokens = random.choices(FILLER, k=words)
+    for spam in spam_words:
+        tokens.insert(random.randrange(len(tokens) + 1), spam)
+    return ' '.join(tokens)
+
+
+def timed(func, texts, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - started) / (repeats * len(texts)) * 1e6
+
+
+def bench_spam_matcher(words=2000, repeats=20):
+    """Run the benchmark; returns True when both implementations agree"""
+    random.seed(42)
+    samples = sorted(SPAM_KEYWORDS) + [
+        'click here now', 'Click Here', 'free bitcoin', 'verify your account', 'run setup.exe', 'discount 50%'
+    ]
+    corpora = {
+        'short clean': [make_post(30) for _ in range(50)],
+        'short spam': [make_post(30, random.sample(samples, 3)) for _ in range(50)],
+        f'long clean ({words} words)': [make_post(words) for _ in range(10)],
+        f'long spam ({words} words)': [make_post(words, random.sample(samples, 5)) for _ in range(10)],
+    }
+
+    agree = True
+    for texts in corpora.values():
+        for text in texts:
+            if old_keywords(text) != sorted(ServiceSpamDetector.check_spam_keywords(text)):
+                agree = False
+            if old_content_hits(text) != [tuple(hit) for hit in CONTENT_MATCHER.search(text.lower())]:
+                agree = False
+    for url in ('https://BIT.LY/x', 'http://shop.example/?Referral=1', 'https://example.com/a', 'https://tinyurl.com/promo'):
+        if old_url_hits(url) != [hit.pattern for hit in URL_MATCHER.search(url.lower())]:
+            agree = False
+    print(f"{'✅' if agree else '❌'} Same matches as the per-pattern loops")
+
+    print(f"{'corpus':<28}{'keywords old':>14}{'new':>10}{'content old':>14}{'new':>10}  (µs per text)")
+    for name, texts in corpora.items():
+        keywords_old = timed(old_keywords, texts, repeats)
+        keywords_new = timed(ServiceSpamDetector.check_spam_keywords, texts, repeats)
+        content_old = timed(old_content_hits, texts, repeats)
+        content_new = timed(lambda text: CONTENT_MATCHER.search(text.lower()), texts, repeats)
+        print(f"{name:<28}{keywords_old:>14.1f}{keywords_new:>10.1f}{content_old:>14.1f}{content_new:>10.1f}"
+              f"  x{keywords_old / keywords_new:.1f} / x{content_old / content_new:.1f}")
+    return agree
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(0 if bench_spam_matcher(*args) else 1)
@@ -0,0 +1,83 @@
+"""
+Microbenchmark of the SQL injection scanner
+Run with: python -m app.scripts.bench_sql_injection [repeats]
+
+Compares SQLinjectionDetector.is_sql_injection with the previous
+implementation (one re.search per pattern) on typical query parameters
+and on adversarial payloads, and checks that both flag exactly the same
+values, including random strings built from SQL metacharacters and
+keyword fragments. Needs no database or app context.
+"""
+import logging
+import random
+import re
+import sys
+import time
+from app.middleware.sql_injection_protection import SQLinjectionDetector, SQLinjectionPatterns
+
+TYPICAL = [
+    '1', '2', '20', '100', 'new', 'popular', 'following', 'true', 'HP', 'AG', 'NT',
+    'miku', 'vocaloid fanart', 'привет мир', 'хатсуне мику концерт', 'user_name-42',
+    'someone@example.com', 'gezdcnrsgq3tmnzygm2dmmbxgiytcnbygyzdi', '2024-05-01T10:00:00',
+    'selection of arts', 'created by me', 'drops and updates',
+]
+
+ADVERSARIAL = [
+    "1' OR '1'='1", "1 OR 1=1", "admin'--", "1; DROP TABLE users", "1 UNION SELECT password FROM users",
+    "1 union all select null,null", "1 AND SLEEP(5)", "1 AND BENCHMARK(1000000,MD5(1))",
+    "1; WAITFOR DELAY '0:0:5'", "1 AND 1=2", "x' AND EXTRACTVALUE(1,CONCAT(0x5c,version()))",
+    "1 AND UPDATEXML(1,CONCAT(0x7e,user()),1)", "/* comment */", "#", "--",
+    "ſelect", "SELECT", "xunion selectx", "waitfor\tdelay", "ınsert",
+    "or '" + "'" * 2000, "a" * 5000, "x" * 5000 + " union select", "привет " * 500,
+]
+
+FRAGMENTS = ['union', 'select', ' ', "'", '=', '1', 'or', 'and', '(', 'sleep', '-', ';', '#', '*', '/',
+             'drop', 'x', 'ſ', 'ı', 'İ', 'K', 'Ü', '\t', 'waitfor', 'delay', 'benchmark', 'all', '2']
+
+
+def old_is_sql_injection(value):
+    """Previous is_sql_injection: every pattern searched separately"""
+    value_lower = value.lower()
+    return any(
+        re.search(pattern, value_lower, re.IGNORECASE)
+        for pattern in SQLinjectionPatterns.DANGEROUS_PATTERNS
+    )
+
+
+def timed(func, values, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for value in values:
+            func(value)
+    return (time.perf_counter() - started) / (repeats * len(values)) * 1e6
+
+
+def bench_sql_injection(repeats=200):
+    """Run the benchmark; returns True when both implementations agree"""
+    # Detections are logged as warnings; keep the output readable
+    logging.getLogger('app.middleware.sql_injection_protection').setLevel(logging.ERROR)
+    random.seed(42)
+    fuzz = [''.join(random.choices(FRAGMENTS, k=random.randint(1, 8))) for _ in range(20000)]
+
+    mismatches = [
+        value for value in TYPICAL + ADVERSARIAL + fuzz
+        if old_is_sql_injection(value) != SQLinjectionDetector.is_sql_injection(value)
+    ]
+    flagged = sum(1 for value in fuzz if old_is_sql_injection(value))
+    print(f"{'✅' if not mismatches else '❌'} Same verdicts on {len(TYPICAL) + len(ADVERSARIAL) + len(fuzz)} values "
+          f"({flagged} of {len(fuzz)} fuzz values flagged)")
+    for value in mismatches[:10]:
+        print(f"   mismatch: {value[:60]!r}")
+
+    print(f"{'payloads':<14}{'old':>10}{'new':>10}  (µs per value)")
+    for name, values in (('typical', TYPICAL), ('adversarial', ADVERSARIAL), ('fuzz', fuzz[:2000])):
+        count = repeats if name == 'typical' else max(1, repeats // 20)
+        old = timed(old_is_sql_injection, values, count)
+        new = timed(SQLinjectionDetector.is_sql_injection, values, count)
+        print(f"{name:<14}{old:>10.2f}{new:>10.2f}  x{old / new:.1f}")
+    return not mismatches
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:2]]
+    sys.exit(0 if bench_sql_injection(*args) else 1)
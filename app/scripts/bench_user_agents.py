@@ -0,0 +1,108 @@
+"""
+Microbenchmark of the User-Agent checks of the bot detector
+Run with: python -m app.scripts.bench_user_agents [requests] [distinct_user_agents]
+
+Replays a request stream in which a few User-Agents are very common and
+most are rare (Zipf-like), and times the previous checks (user_agents.parse
+plus one re.search per bot signature on every request) against the cached
+classification. Checks that both classify every User-Agent the same way.
+Uses only the per-process LRU: needs no Redis, database or app context.
+"""
+import logging
+import random
+import re
+import sys
+import time
+from user_agents import parse
+from app.middleware.bot_detection import BotSignature, UserAgentCache, classify_user_agent
+
+BROWSERS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.{b}.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{v}.0 Safari/605.1.{b}',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:{v}.0) Gecko/20100101 Firefox/{v}.{b}',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_{b} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{v}.0 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Linux; Android 14; Pixel {b}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36',
+]
+BOTS = [
+    'curl/8.{b}.0', 'python-requests/2.{b}.0', 'Wget/1.{v}', 'PostmanRuntime/7.{b}.0',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html) {b}',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/{v}.0.{b}.0 Safari/537.36',
+    'Unknown',
+]
+
+
+def old_is_suspicious(user_agent):
+    """Previous is_suspicious_user_agent: one re.search per signature"""
+    user_agent = user_agent.lower()
+    return any(re.search(pattern, user_agent, re.IGNORECASE) for pattern in BotSignature.BOT_USER_AGENTS)
+
+
+def old_is_real_browser(user_agent):
+    """Previous is_real_browser: parse on every request"""
+    try:
+        ua = parse(user_agent)
+        if ua.is_bot:
+            return False
+        if not ua.os.family or ua.os.family == 'Other':
+            return False
+        if not ua.browser.family or ua.browser.family == 'Other':
+            return False
+        return True
+    except Exception:
+        return True
+
+
+def make_stream(requests, distinct):
+    user_agents = [
+        random.choice(BROWSERS if i % 5 else BOTS).format(v=random.randint(100, 130), b=i)
+        for i in range(distinct)
+    ]
+    # Zipf-like popularity: the i-th User-Agent is requested ~1/(i+1) as often
+    weights = [1 / (i + 1) for i in range(distinct)]
+    return user_agents, random.choices(user_agents, weights=weights, k=requests)
+
+
+def bench_user_agents(requests=20000, distinct=2000):
+    """Run the benchmark; returns True when both implementations agree"""
+    logging.getLogger('app.middleware.bot_detection').setLevel(logging.CRITICAL)
+    random.seed(42)
+    user_agents, stream = make_stream(requests, distinct)
+
+    mismatches = [
+        user_agent for user_agent in user_agents
+        if classify_user_agent(user_agent) != {
+            'real_browser': old_is_real_browser(user_agent), 'suspicious': old_is_suspicious(user_agent)
+        }
+    ]
+    print(f"{'✅' if not mismatches else '❌'} Same classification of {len(user_agents)} User-Agents")
+    for user_agent in mismatches[:10]:
+        print(f"   mismatch: {user_agent!r}")
+
+    started = time.perf_counter()
+    for user_agent in stream:
+        old_is_real_browser(user_agent)
+        old_is_suspicious(user_agent)
+    old = (time.perf_counter() - started) / len(stream) * 1e6
+
+    cache = UserAgentCache()
+    started = time.perf_counter()
+    for user_agent in stream:
+        cache.classify(user_agent)
+    new = (time.perf_counter() - started) / len(stream) * 1e6
+
+    started = time.perf_counter()
+    for user_agent in stream:
+        cache.classify(user_agent)
+    warm = (time.perf_counter() - started) / len(stream) * 1e6
+
+    stats = cache.get_stats()
+    print(f"{len(stream)} requests, {len(set(stream))} distinct User-Agents")
+    print(f"previous checks     {old:>10.1f} µs per request")
+    print(f"cached (cold start) {new:>10.1f} µs per request  x{old / new:.1f}, hit ratio {stats['hit_ratio']}")
+    print(f"cached (warm)       {warm:>10.2f} µs per request  x{old / warm:.0f}")
+    return not mismatches
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(0 if bench_user_agents(*args) else 1)
@@ -0,0 +1,37 @@
+"""
+Script to compute post recommendations now instead of waiting for the daily job
+Run with: python -m app.scripts.build_recommendations [user_id ...]
+
+Builds the interaction matrix, stores the top recommendations per user and
+prints, for the given users, what /api/search/recommended would return.
+"""
+import time
+from app import create_app
+from app.services.recommendation_service import RecommendationService
+
+
+def build_recommendations(user_ids=None):
+    """Rebuild recommendations; returns the build summary (None without numpy/scipy)"""
+    from config import Config
+
+    app = create_app(Config)
+    with app.app_context():
+        started = time.perf_counter()
+        result = RecommendationService.build()
+        if result is None:
+            print("❌ numpy/scipy not installed: pip install -r requirements-optional.txt")
+            return None
+        print(f"✅ {result['recommendations']} recommendations for {result['users']} users "
+              f"({result['posts']} posts, {result['interactions']} interactions) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        for user_id in user_ids or []:
+            started = time.perf_counter()
+            post_ids = RecommendationService.get_recommended_ids(user_id, 20)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"   {user_id}: {len(post_ids)} posts in {elapsed:.1f} ms")
+        return result
+
+if __name__ == '__main__':
+    import sys
+    build_recommendations(sys.argv[1:])
@@ -0,0 +1,43 @@
+"""
+Script to build the related posts vector index snapshot
+Run with: python -m app.scripts.build_related_index [post_id ...]
+
+Vectorizes all visible posts, writes the snapshot to RELATED_INDEX_PATH so
+workers memory-map it on start, then times loading it back and, if given,
+the related posts lookup for a few posts.
+"""
+import time
+from app import create_app
+from app.services.related_posts import related_posts, NUMPY_AVAILABLE
+
+
+def build_related_index(post_ids=None):
+    """Build and write the snapshot; returns the number of indexed posts"""
+    from config import Config
+
+    if not NUMPY_AVAILABLE:
+        print("❌ numpy not installed: pip install -r requirements-optional.txt")
+        return None
+
+    app = create_app(Config)
+    with app.app_context():
+        related_posts.app = app
+        related_posts.rebuild()
+        print(f"✅ Indexed {len(related_posts.index)} posts")
+        print(f"✅ Snapshot written to {related_posts.snapshot_path}")
+
+        started = time.perf_counter()
+        related_posts._load_snapshot()
+        related_posts._ready = True
+        print(f"   Snapshot loads in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for post_id in post_ids or []:
+            started = time.perf_counter()
+            related = related_posts.related_ids(post_id, 10)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"   {post_id}: {len(related)} related posts in {elapsed:.2f} ms")
+        return len(related_posts.index)
+
+if __name__ == '__main__':
+    import sys
+    build_related_index(sys.argv[1:])
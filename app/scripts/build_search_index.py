@@ -0,0 +1,39 @@
+"""
+Script to build the in-process search index snapshot (SEARCH_BACKEND=memory)
+Run with: python -m app.scripts.build_search_index [query ...]
+
+Rebuilds the post and user indexes from the database, writes the snapshot
+to SEARCH_INDEX_PATH so workers start from it, then times loading it back
+and, if given, a few queries.
+"""
+import time
+from app import create_app
+from app.services.search_index import search_index
+from app.utils.inverted_index import InvertedIndex
+
+
+def build_search_index(queries=None):
+    """Build and write the snapshot; returns the number of indexed posts"""
+    from config import Config
+
+    app = create_app(Config)
+    with app.app_context():
+        search_index.app = app
+        search_index.rebuild()
+        print(f"✅ Indexed {len(search_index.posts)} posts and {len(search_index.users)} users")
+        print(f"✅ Snapshot written to {search_index.snapshot_path}")
+
+        started = time.perf_counter()
+        posts, _ = InvertedIndex.load(search_index.snapshot_path)
+        print(f"   Snapshot loads in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for query in queries or []:
+            started = time.perf_counter()
+            results = posts.search(query, 20)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"   {query!r}: {len(results)} results in {elapsed:.2f} ms")
+        return len(posts)
+
+if __name__ == '__main__':
+    import sys
+    build_search_index(sys.argv[1:])
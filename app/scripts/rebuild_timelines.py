@@ -0,0 +1,36 @@
+"""
+Script to backfill (or rebuild) home timelines in Redis
+Run with: python -m app.scripts.rebuild_timelines [user_id ...]
+"""
+from app import create_app, db
+from app.models.user import User
+from app.services.timeline_service import TimelineService
+
+
+def rebuild_timelines(user_ids=None):
+    """Rebuild timelines for the given users (all users if none given)"""
+    from config import Config
+
+    app = create_app(Config)
+    with app.app_context():
+        if not app.config.get('REDIS_AVAILABLE'):
+            print("❌ Redis is not available, nothing to rebuild")
+            return 0
+
+        heavy = TimelineService.refresh_heavy_authors()
+        print(f"✅ {heavy} authors served by fan-out-on-read")
+
+        if not user_ids:
+            user_ids = [row[0] for row in db.session.query(User.id).all()]
+
+        count = 0
+        for user_id in user_ids:
+            if TimelineService.rebuild(user_id):
+                count += 1
+
+        print(f"✅ Rebuilt {count} of {len(user_ids)} timelines")
+        return count
+
+if __name__ == '__main__':
+    import sys
+    rebuild_timelines(sys.argv[1:])
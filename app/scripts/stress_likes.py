@@ -0,0 +1,74 @@
+"""
+Concurrency stress test for like toggling
+Run with: python -m app.scripts.stress_likes [users] [toggles_per_user] [threads]
+
+Creates a throwaway post and users, toggles likes from many threads at once
+and checks that posts.likes_count matches the post_likes rows and the
+expected final state (a user who toggled an odd number of times likes the
+post). Everything created is removed afterwards.
+"""
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app, db
+from app.models.post import Post
+from app.models.post_like import PostLike
+from app.models.user import User
+from app.services.like_service import LikeService
+
+
+def stress_likes(users=50, toggles_per_user=7, threads=16):
+    """Run the stress test; returns True when no update was lost"""
+    from config import Config
+
+    app = create_app(Config)
+    with app.app_context():
+        run_id = uuid.uuid4().hex[:8]
+        user_ids = []
+        for i in range(users):
+            user = User(
+                id=str(uuid.uuid4()),
+                username=f'stress_{run_id}_{i}',
+                email=f'stress_{run_id}_{i}@example.invalid',
+                password_hash='!'
+            )
+            db.session.add(user)
+            user_ids.append(user.id)
+        post = Post(id=str(uuid.uuid4()), user_id=user_ids[0], content='like stress test', moderation_status='rejected')
+        db.session.add(post)
+        db.session.commit()
+        post_id = post.id
+
+    def toggle(user_id):
+        with app.app_context():
+            for _ in range(toggles_per_user):
+                LikeService.toggle_post_like(post_id, user_id)
+
+    try:
+        # Every user toggles concurrently with all the others
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(toggle, user_ids))
+
+        with app.app_context():
+            likes_count = db.session.get(Post, post_id).likes_count
+            rows = PostLike.query.filter_by(post_id=post_id).count()
+            expected = users if toggles_per_user % 2 else 0
+
+            print(f"Toggles:     {users * toggles_per_user} ({users} users x {toggles_per_user}, {threads} threads)")
+            print(f"likes_count: {likes_count}")
+            print(f"Like rows:   {rows}")
+            print(f"Expected:    {expected}")
+
+            ok = likes_count == rows == expected
+            print("✅ No lost updates" if ok else "❌ Lost updates detected")
+            return ok
+    finally:
+        with app.app_context():
+            PostLike.query.filter_by(post_id=post_id).delete()
+            Post.query.filter_by(id=post_id).delete()
+            User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:4]]
+    sys.exit(0 if stress_likes(*args) else 1)
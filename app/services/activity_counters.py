@@ -0,0 +1,262 @@
+"""
+Rolling per-user activity counters (spam behaviour checks, admin view)
+
+Each user has one sliding-window counter per kind of activity:
+
+- posts, comments: created posts and comments
+- link_posts: posts containing a link
+- post_texts: distinct post texts (by content hash)
+
+With Redis a counter is a sorted set of event IDs (or content hashes)
+scored by time, `activity:<user ID>:<kind>`, so the count over any window
+up to ACTIVITY_RETENTION_HOURS is one ZCOUNT and all counters of a user
+are read in one round trip. Without Redis the same data lives in this
+process and is reloaded every LOCAL_RELOAD_INTERVAL seconds to pick up
+posts and comments of other workers.
+
+Counters are updated after commit when posts and comments are created.
+A user's counters are loaded from the database on first read and again
+once per retention period (`activity:<user ID>:loaded` marks them), so
+they are complete even for activity recorded before a restart.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+from redis.exceptions import RedisError
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.post import Post
+from app.models.comment import Comment
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('posts', 'comments', 'link_posts', 'post_texts')
+
+
+def _timestamp(created_at):
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _post_events(post_id, content_hash, has_link):
+    """(kind, member) pairs recorded for a post"""
+    events = [('posts', post_id)]
+    if has_link:
+        events.append(('link_posts', post_id))
+    if content_hash:
+        events.append(('post_texts', content_hash))
+    return events
+
+
+class ActivityCounters:
+    """Sliding-window counts of each user's posts and comments"""
+
+    KEY_PREFIX = 'activity:'
+    PRUNE_INTERVAL = 300
+    LOCAL_RELOAD_INTERVAL = 300
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._events = {}   # (user ID, kind) -> {member: timestamp}
+        self._loaded = {}   # user ID -> time of the next reload from the database
+        self._last_prune = 0.0
+
+    def init_app(self, app):
+        """Bind to the application (first app wins)"""
+        if self.app is not None:
+            return
+        self.app = app
+        self.register_events()
+
+    @property
+    def retention(self):
+        return current_app.config.get('ACTIVITY_RETENTION_HOURS', 24) * 3600
+
+    def _key(self, user_id, kind):
+        return f"{self.KEY_PREFIX}{user_id}:{kind}"
+
+    def record(self, user_id, events, created_at=None):
+        """
+        Count activity of a user.
+
+        Args:
+            events: Iterable of (kind, member); a member counts once per window
+            created_at: Time of the activity (default now)
+        """
+        timestamp = _timestamp(created_at or datetime.utcnow())
+        retention = self.retention
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                for kind, member in events:
+                    key = self._key(user_id, kind)
+                    pipe.zadd(key, {member: timestamp})
+                    pipe.zremrangebyscore(key, '-inf', time.time() - retention)
+                    pipe.expire(key, retention)
+                pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Activity counters update failed: {e}")
+            return
+
+        with self._lock:
+            for kind, member in events:
+                self._events.setdefault((user_id, kind), {})[member] = timestamp
+            self._prune(retention)
+
+    def _prune(self, retention):
+        """Forget activity older than the retention (at most every PRUNE_INTERVAL seconds)"""
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        cutoff = now - retention
+        for key in list(self._events):
+            members = {member: ts for member, ts in self._events[key].items() if ts >= cutoff}
+            if members:
+                self._events[key] = members
+            else:
+                del self._events[key]
+        self._loaded = {user_id: until for user_id, until in self._loaded.items() if until > now}
+
+    def _load_rows(self, user_id, since):
+        """The user's activity since a time, from the database"""
+        rows = []
+        posts = db.session.execute(
+            select(Post.id, Post.content_hash, Post.content.ilike('%http%'), Post.created_at)
+            .where(Post.user_id == user_id, Post.created_at >= since)
+        ).all()
+        for post_id, content_hash, has_link, created_at in posts:
+            rows.append((_post_events(post_id, content_hash, has_link), _timestamp(created_at)))
+        comments = db.session.execute(
+            select(Comment.id, Comment.created_at)
+            .where(Comment.user_id == user_id, Comment.created_at >= since)
+        ).all()
+        for comment_id, created_at in comments:
+            rows.append(([('comments', comment_id)], _timestamp(created_at)))
+        return rows
+
+    def _since(self, retention):
+        return datetime.utcfromtimestamp(time.time() - retention)
+
+    def counts(self, user_id, windows):
+        """
+        Activity counts of a user over each window.
+
+        Args:
+            windows: Window lengths in seconds (clipped to ACTIVITY_RETENTION_HOURS)
+
+        Returns:
+            {kind: {window: count}} for every kind in KINDS
+        """
+        retention = self.retention
+        windows = list(windows)
+        now = time.time()
+        r = get_redis()
+        if r is not None:
+            try:
+                return self._redis_counts(r, user_id, windows, retention, now)
+            except RedisError as e:
+                logger.warning(f"Activity counters unavailable, using local counters: {e}")
+
+        with self._lock:
+            if self._loaded.get(user_id, 0) <= now:
+                for events, timestamp in self._load_rows(user_id, self._since(retention)):
+                    for kind, member in events:
+                        self._events.setdefault((user_id, kind), {})[member] = timestamp
+                self._loaded[user_id] = now + min(self.LOCAL_RELOAD_INTERVAL, retention)
+            return {
+                kind: {
+                    window: sum(
+                        1 for ts in self._events.get((user_id, kind), {}).values()
+                        if ts >= now - min(window, retention)
+                    )
+                    for window in windows
+                }
+                for kind in KINDS
+            }
+
+    def _redis_counts(self, r, user_id, windows, retention, now):
+        loaded_key = f"{self.KEY_PREFIX}{user_id}:loaded"
+        pipe = r.pipeline(transaction=False)
+        pipe.exists(loaded_key)
+        for kind in KINDS:
+            for window in windows:
+                pipe.zcount(self._key(user_id, kind), now - min(window, retention), '+inf')
+        loaded, *values = pipe.execute()
+
+        if not loaded:
+            # First read (or the counters expired): load what the database has
+            pipe = r.pipeline(transaction=False)
+            scores = {}
+            for events, timestamp in self._load_rows(user_id, self._since(retention)):
+                for kind, member in events:
+                    scores.setdefault(kind, {})[member] = max(timestamp, scores.get(kind, {}).get(member, 0))
+            for kind, members in scores.items():
+                pipe.zadd(self._key(user_id, kind), members)
+                pipe.expire(self._key(user_id, kind), retention)
+            pipe.set(loaded_key, 1, ex=retention)
+            for kind in KINDS:
+                for window in windows:
+                    pipe.zcount(self._key(user_id, kind), now - min(window, retention), '+inf')
+            values = pipe.execute()[-len(KINDS) * len(windows):]
+
+        values = iter(values)
+        return {kind: {window: int(next(values)) for window in windows} for kind in KINDS}
+
+    def summary(self, user_id, windows):
+        """Counts plus hourly rates over each window (admin view)"""
+        windows = sorted({min(window, self.retention) for window in windows})
+        counts = self.counts(user_id, windows)
+        return {
+            'windows': windows,
+            'counts': counts,
+            'per_hour': {
+                kind: {window: round(count * 3600 / window, 2) for window, count in by_window.items()}
+                for kind, by_window in counts.items()
+            },
+            'backend': 'redis' if get_redis() is not None else 'memory',
+        }
+
+    def register_events(self):
+        """Count posts and comments of this worker once they are committed"""
+        if not event.contains(Session, 'after_flush', _collect_activity):
+            event.listen(Session, 'after_flush', _collect_activity)
+            event.listen(Session, 'after_commit', _record_activity)
+            event.listen(Session, 'after_rollback', _discard_activity)
+
+
+def _collect_activity(session, flush_context):
+    """Capture new posts and comments at flush time (objects are expired after commit)"""
+    if activity_counters.app is None:
+        return
+    pending = session.info.setdefault('activity_events', [])
+    for obj in session.new:
+        if isinstance(obj, Post):
+            has_link = 'http' in (obj.content or '').lower()
+            pending.append((obj.user_id, _post_events(obj.id, obj.content_hash, has_link), obj.created_at))
+        elif isinstance(obj, Comment):
+            pending.append((obj.user_id, [('comments', obj.id)], obj.created_at))
+
+
+def _record_activity(session):
+    pending = session.info.pop('activity_events', None)
+    if not pending or not has_app_context():
+        return
+    try:
+        for user_id, events, created_at in pending:
+            activity_counters.record(user_id, events, created_at)
+    except Exception as e:
+        logger.warning(f"Activity counters update failed: {e}")
+
+
+def _discard_activity(session):
+    session.info.pop('activity_events', None)
+
+
+# Глобальный экземпляр
+activity_counters = ActivityCounters()
@@ -7,6 +7,7 @@ from app.models.post import Post
 from app.models.comment import Comment
 from app.models.admin_log import AdminLog
 from app.models.moderation_log import ModerationLog
+from app.services.cache_manager import CacheManager, single_flight
 from sqlalchemy import func, and_
 from datetime import datetime, timedelta
 
@@ -14,6 +15,7 @@ class AnalyticsService:
     """Service for generating analytics and statistics"""
     
     @staticmethod
+    @single_flight('user_stats', timeout=CacheManager.CACHE_5MIN, stale_timeout=CacheManager.CACHE_30MIN)
     def get_user_stats():
         """Get overall user statistics"""
         total_users = User.query.count()
@@ -36,6 +38,7 @@ class AnalyticsService:
         }
     
     @staticmethod
+    @single_flight('content_stats', timeout=CacheManager.CACHE_5MIN, stale_timeout=CacheManager.CACHE_30MIN)
     def get_content_stats():
         """Get content statistics"""
         total_posts = Post.query.count()
@@ -1,33 +1,117 @@
 """
 Caching utilities for performance optimization
+
+Read paths (post detail, the first page of the public feeds, user profiles,
+trending) go through CacheManager. Entries are invalidated when the rows
+behind them change: ORM writes are picked up by session events after the
+transaction commits, bulk UPDATEs (likes, view flushes) invalidate
+explicitly. Groups of keys that cannot be listed (feed pages, trending) are
+invalidated by bumping a version number that is part of their keys; search
+result pages use the 'content' generation, bumped when posts are created,
+deleted, moderated or edited.
 """
-from app import cache
+from flask import current_app
+from app import cache, db
 from app.models.post import Post
 from app.models.user import User
+from app.models.badge import UserBadge
+from app.utils.redis_client import get_redis
+from app.services.two_tier_cache import two_tier_cache
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 from datetime import timedelta
+from functools import wraps
 import hashlib
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 class CacheManager:
     """Centralized cache management"""
     
     # Cache timeout constants
+    CACHE_30SEC = 30
+    CACHE_1MIN = 60
     CACHE_5MIN = 5 * 60
     CACHE_15MIN = 15 * 60
     CACHE_30MIN = 30 * 60
     CACHE_1HOUR = 60 * 60
     CACHE_6HOURS = 6 * 60 * 60
+    CACHE_1DAY = 24 * 60 * 60
+    
+    # Hit/miss counters per key namespace (per worker process)
+    _stats = {}
+    _stats_lock = threading.Lock()
+    
+    @staticmethod
+    def _record(namespace, value):
+        """Count a lookup as a hit or miss and pass the value through"""
+        with CacheManager._stats_lock:
+            counters = CacheManager._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counters['hits' if value is not None else 'misses'] += 1
+        return value
+    
+    @staticmethod
+    def get_stats():
+        """Hit/miss counters of this worker process"""
+        with CacheManager._stats_lock:
+            stats = {}
+            for namespace, counters in CacheManager._stats.items():
+                total = counters['hits'] + counters['misses']
+                stats[namespace] = {
+                    **counters,
+                    'hit_rate': round(counters['hits'] / total, 4) if total else None,
+                }
+            return stats
+    
+    @staticmethod
+    def get_version(name, timeout=0):
+        """
+        Current version of a key group or resource.
+        
+        Versions are nanosecond timestamps of the last change. A missing
+        (never bumped or expired) version starts at the current time, so an
+        expired version never repeats an old value.
+        """
+        key = f"version:{name}"
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=timeout)
+            version = cache.get(key) or time.time_ns()
+        return version
     
     @staticmethod
-    def cache_trending_posts(emotion=None, days=7):
-        """Cache trending posts"""
-        cache_key = f"trending_posts:{emotion}:{days}"
-        return cache.get(cache_key)
+    def bump_version(name, timeout=0):
+        """Invalidate every key built with the current version of a group"""
+        # A fresh timestamp instead of INCR: works on every cache backend and never repeats
+        cache.set(f"version:{name}", time.time_ns(), timeout=timeout)
     
     @staticmethod
-    def set_trending_posts(posts, emotion=None, days=7):
-        """Set trending posts cache"""
-        cache_key = f"trending_posts:{emotion}:{days}"
-        cache.set(cache_key, posts, CacheManager.CACHE_15MIN)
+    def get_versions(names):
+        """Versions of several per-resource version counters (one cache round trip)"""
+        keys = [f"version:{name}" for name in names]
+        versions = list(cache.get_many(*keys))
+        for i, version in enumerate(versions):
+            if version is None:
+                versions[i] = CacheManager.get_version(names[i], CacheManager.CACHE_1DAY)
+        return versions
+    
+    @staticmethod
+    def bump_versions(names):
+        """Mark several resources as changed (for ETags)"""
+        now = time.time_ns()
+        if names:
+            cache.set_many({f"version:{name}": now for name in names}, timeout=CacheManager.CACHE_1DAY)
+    
+    @staticmethod
+    def trending_key(emotion=None, days=7, limit=20):
+        """Cache key of a trending posts list"""
+        return f"trending_posts:{CacheManager.get_version('trending')}:{emotion}:{days}:{limit}"
     
     @staticmethod
     def cache_user_stats():
@@ -52,7 +136,7 @@ class CacheManager:
     @staticmethod
     def cache_post(post_id):
         """Get cached post"""
-        return cache.get(f"post:{post_id}")
+        return CacheManager._record('post', cache.get(f"post:{post_id}"))
     
     @staticmethod
     def set_post(post_id, post_data):
@@ -63,21 +147,122 @@ class CacheManager:
     def invalidate_post(post_id):
         """Invalidate post cache"""
         cache.delete(f"post:{post_id}")
+        CacheManager.bump_versions([f"post:{post_id}"])
     
     @staticmethod
-    def cache_user_profile(user_id):
+    def invalidate_posts(post_ids):
+        """Invalidate many post caches at once (ETag versions are kept: used for view counts)"""
+        post_ids = list(post_ids)
+        if post_ids:
+            cache.delete_many(*[f"post:{post_id}" for post_id in post_ids])
+    
+    @staticmethod
+    def get_posts(post_ids):
+        """
+        Serialized posts (with authors) in the given order, like serialize_posts().
+        
+        Reads the post and author entries of the whole list in one cache
+        round trip each; misses are loaded with one query and cached. Posts
+        that were deleted in the meantime are left out.
+        """
+        from app.services.serializers import load_authors
+        
+        post_ids = list(post_ids)
+        if not post_ids:
+            return []
+        entries = dict(zip(post_ids, cache.get_many(*[f"post:{post_id}" for post_id in post_ids])))
+        for entry in entries.values():
+            CacheManager._record('post', entry)
+        
+        missing = [post_id for post_id, entry in entries.items() if entry is None]
+        if missing:
+            loaded = {}
+            for post in Post.query.filter(Post.id.in_(missing), Post.is_deleted == False).all():
+                loaded[post.id] = {'post': post.to_dict(include_author=False), 'user_id': post.user_id}
+            if loaded:
+                cache.set_many({f"post:{post_id}": entry for post_id, entry in loaded.items()},
+                               timeout=CacheManager.CACHE_1HOUR)
+            entries.update(loaded)
+        
+        user_ids = list({
+            entry['user_id'] for entry in entries.values()
+            if entry is not None and not entry['post']['is_anonymous']
+        })
+        authors = dict(zip(user_ids, cache.get_many(*[f"author:{user_id}" for user_id in user_ids]))) if user_ids else {}
+        missing_authors = [user_id for user_id, author in authors.items() if CacheManager._record('author', author) is None]
+        if missing_authors:
+            loaded_authors = load_authors(missing_authors)
+            if loaded_authors:
+                cache.set_many({f"author:{user_id}": author for user_id, author in loaded_authors.items()},
+                               timeout=CacheManager.CACHE_1HOUR)
+            authors.update(loaded_authors)
+        
+        result = []
+        for post_id in post_ids:
+            entry = entries.get(post_id)
+            if entry is None:
+                continue
+            data = dict(entry['post'])
+            if not data['is_anonymous']:
+                data['author'] = authors.get(entry['user_id'])
+            result.append(data)
+        return result
+    
+    @staticmethod
+    def get_author(user_id):
+        """Serialized author (user with badges) for embedding in cached posts"""
+        author = CacheManager._record('author', cache.get(f"author:{user_id}"))
+        if author is None:
+            from app.services.serializers import load_authors
+            author = load_authors([user_id]).get(user_id)
+            if author is not None:
+                cache.set(f"author:{user_id}", author, CacheManager.CACHE_1HOUR)
+        return author
+    
+    @staticmethod
+    def cache_user_profile(username):
         """Get cached user profile"""
-        return cache.get(f"user_profile:{user_id}")
+        return CacheManager._record('user_profile', cache.get(f"user_profile:{username}"))
     
     @staticmethod
-    def set_user_profile(user_id, user_data):
+    def set_user_profile(username, user_data):
         """Cache user profile"""
-        cache.set(f"user_profile:{user_id}", user_data, CacheManager.CACHE_6HOURS)
+        cache.set(f"user_profile:{username}", user_data, CacheManager.CACHE_6HOURS)
+    
+    @staticmethod
+    def invalidate_user_profile(username, user_id=None):
+        """Invalidate user profile cache (and the author data embedded in cached posts)"""
+        keys = [f"user_profile:{username}"]
+        if user_id:
+            keys.append(f"author:{user_id}")
+        cache.delete_many(*keys)
+    
+    @staticmethod
+    def feed_key(filter_type, emotion, per_page, use_cursor, include_total):
+        """Cache key of the first page of a public feed"""
+        version = CacheManager.get_version('feed')
+        mode = 'cursor' if use_cursor else 'page'
+        return f"feed:{version}:{filter_type}:{emotion}:{per_page}:{mode}:{int(include_total)}"
+    
+    @staticmethod
+    def feed_window_version():
+        """Changes every CACHE_30SEC: counters in feed pages may change without a version bump"""
+        return int(time.time() // CacheManager.CACHE_30SEC) * CacheManager.CACHE_30SEC * 10**9
+    
+    @staticmethod
+    def cache_feed(cache_key):
+        """Get cached feed page"""
+        return CacheManager._record('feed', cache.get(cache_key))
     
     @staticmethod
-    def invalidate_user_profile(user_id):
-        """Invalidate user profile cache"""
-        cache.delete(f"user_profile:{user_id}")
+    def set_feed(cache_key, feed_data):
+        """Cache feed page (short timeout: counters in it keep changing)"""
+        cache.set(cache_key, feed_data, CacheManager.CACHE_30SEC)
+    
+    @staticmethod
+    def invalidate_feeds():
+        """Invalidate all cached feed pages"""
+        CacheManager.bump_version('feed')
     
     @staticmethod
     def invalidate_stats():
@@ -88,9 +273,230 @@ class CacheManager:
     @staticmethod
     def invalidate_trending():
         """Invalidate trending posts caches"""
-        # Would need to iterate through possible keys
-        # For now, just clear all trending
-        cache.delete_pattern("trending_posts:*")
+        CacheManager.bump_version('trending')
+    
+    @staticmethod
+    def search_key(query_text, filters, page, per_page, lang=None):
+        """
+        Cache key of a post search page (query_text already normalized).
+        
+        Includes the content generation, so every cached search is retired
+        at once when posts appear, disappear or change text, without
+        listing keys.
+        """
+        params = repr((query_text, sorted((filters or {}).items()), lang, page, per_page))
+        digest = hashlib.sha1(params.encode('utf-8')).hexdigest()
+        return f"search:{CacheManager.get_version('content')}:{digest}"
+    
+    @staticmethod
+    def cache_search(cache_key):
+        """Get cached search result page (post IDs, snippets, totals)"""
+        return CacheManager._record('search', cache.get(cache_key))
+    
+    @staticmethod
+    def set_search(cache_key, result):
+        """Cache search result page"""
+        cache.set(cache_key, result, current_app.config.get('SEARCH_CACHE_TIMEOUT', CacheManager.CACHE_1MIN))
+    
+    @staticmethod
+    def invalidate_search():
+        """Start a new content generation (all cached searches become stale)"""
+        CacheManager.bump_version('content')
+    
+    @staticmethod
+    def register_invalidation_events():
+        """Invalidate cached posts and users when ORM writes to them are committed"""
+        if not event.contains(Session, 'after_flush', _collect_invalidations):
+            event.listen(Session, 'after_flush', _collect_invalidations)
+            event.listen(Session, 'after_commit', _apply_invalidations)
+            event.listen(Session, 'after_rollback', _discard_invalidations)
+
+
+def _collect_invalidations(session, flush_context):
+    """Remember which cached entries a flush touched (applied only after commit)"""
+    pending = session.info.setdefault('cache_invalidations', {
+        'posts': set(), 'users': set(), 'user_ids': set(), 'feeds': False, 'search': False
+    })
+    
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            pending['posts'].add(obj.id)
+            state = inspect(obj)
+            if (obj in session.new and obj.moderation_status == 'approved') or obj in session.deleted \
+                    or state.attrs.is_deleted.history.has_changes() \
+                    or state.attrs.moderation_status.history.has_changes():
+                pending['feeds'] = True
+                pending['search'] = True
+            elif state.attrs.content.history.has_changes() or state.attrs.tags.history.has_changes():
+                # Matches for the old or new text may be cached
+                pending['search'] = True
+        elif isinstance(obj, User):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            pending['user_ids'].add(obj.id)
+            pending['users'].add(obj.username)
+            # The profile may still be cached under the previous username
+            pending['users'].update(inspect(obj).attrs.username.history.deleted or ())
+        elif isinstance(obj, UserBadge):
+            pending['user_ids'].add(obj.user_id)
+            with session.no_autoflush:
+                user = session.get(User, obj.user_id) if obj.user_id else None
+            if user is not None:
+                pending['users'].add(user.username)
+
+
+def _apply_invalidations(session):
+    pending = session.info.pop('cache_invalidations', None)
+    if not pending:
+        return
+    try:
+        keys = [f"post:{post_id}" for post_id in pending['posts']]
+        keys += [f"user_profile:{username}" for username in pending['users']]
+        keys += [f"author:{user_id}" for user_id in pending['user_ids']]
+        if keys:
+            cache.delete_many(*keys)
+            # ETag versions (see app.utils.http_cache)
+            CacheManager.bump_versions(
+                [f"post:{post_id}" for post_id in pending['posts']]
+                + [f"profile:{username}" for username in pending['users']]
+                + [f"user:{user_id}" for user_id in pending['user_ids']]
+            )
+        if pending['user_ids']:
+            # Users cached for authentication (see app.middleware.auth)
+            two_tier_cache.delete(*[f"auth_user:{user_id}" for user_id in pending['user_ids']])
+        if pending['feeds']:
+            CacheManager.invalidate_feeds()
+            CacheManager.invalidate_trending()
+        if pending['search']:
+            CacheManager.invalidate_search()
+    except Exception as e:
+        logger.warning(f"Cache invalidation failed: {e}")
+
+
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
+
+
+# Release a lock only if it still holds our token (it may have expired and been re-taken)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def _acquire_lock(key, lock_timeout):
+    """
+    Try to become the single worker recomputing a key.
+
+    Uses a Redis lock shared by all workers when Redis is available,
+    otherwise a per-process lock. Returns a release callable, or None.
+    """
+    r = get_redis()
+    if r is not None:
+        lock_key = f"lock:cache:{key}"
+        token = uuid.uuid4().hex
+        try:
+            if r.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)):
+                script = r.register_script(RELEASE_LOCK_SCRIPT)
+                return lambda: script(keys=[lock_key], args=[token])
+            return None
+        except Exception as e:
+            logger.warning(f"Cache lock unavailable for {key}: {e}")
+
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(key, threading.Lock())
+    if lock.acquire(blocking=False):
+        return lock.release
+    return None
+
+
+def single_flight(key, timeout, stale_timeout=0, beta=1.0, lock_timeout=30, namespace=None):
+    """
+    Cache a function's result with stampede protection.
+
+    - Only one worker (Redis lock, or a per-process lock without Redis)
+      recomputes an expired key; the others wait for its result.
+    - Probabilistic early refresh (XFetch): a reader may recompute shortly
+      before expiry, with a probability growing as expiry approaches and
+      with how long the value took to compute.
+    - With stale_timeout, the old value is kept that long past expiry and
+      returned to everyone except the worker recomputing it
+      (stale-while-revalidate).
+
+    The value is stored under the key as-is, next to a "<key>:meta" entry
+    with its expiry time and compute duration.
+
+    Args:
+        key: Cache key, or a callable building it from the function arguments
+        timeout: Seconds the value is considered fresh
+        stale_timeout: Extra seconds a stale value may be served
+        beta: Early refresh aggressiveness (0 disables early refresh)
+        lock_timeout: Max seconds a recompute may hold the lock
+        namespace: Name for hit/miss counters (defaults to the key)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if callable(key) else key
+            meta_key = f"{cache_key}:meta"
+            stats_name = namespace or (key if isinstance(key, str) else func.__name__)
+
+            def compute():
+                started = time.monotonic()
+                value = func(*args, **kwargs)
+                delta = time.monotonic() - started
+                ttl = timeout + stale_timeout
+                cache.set_many({
+                    cache_key: value,
+                    meta_key: {'expires_at': time.time() + timeout, 'delta': delta},
+                }, timeout=ttl)
+                return value
+
+            value, meta = cache.get_many(cache_key, meta_key)
+            now = time.time()
+            if value is not None and meta:
+                # XFetch: -delta * beta * ln(U) is a random head start before expiry
+                early = meta['delta'] * beta * -math.log(1.0 - random.random())
+                if now + early < meta['expires_at']:
+                    CacheManager._record(stats_name, value)
+                    return value
+
+            release = _acquire_lock(cache_key, lock_timeout)
+            if release is not None:
+                CacheManager._record(stats_name, None)
+                try:
+                    return compute()
+                finally:
+                    try:
+                        release()
+                    except Exception:
+                        pass
+
+            if value is not None:
+                # Someone else is refreshing: serve the value we have (possibly stale)
+                CacheManager._record(stats_name, value)
+                return value
+
+            # Cold miss while another worker computes: wait for its result
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = cache.get(cache_key)
+                if value is not None:
+                    CacheManager._record(stats_name, value)
+                    return value
+
+            CacheManager._record(stats_name, None)
+            return compute()
+        return wrapper
+    return decorator
 
 
 class QueryOptimizer:
@@ -112,8 +518,7 @@ class QueryOptimizer:
         # Use select with specific columns to reduce data transfer
         query = query.with_entities(
             Post.id,
-            Post.title,
-            Post.text,
+            Post.content,
             Post.user_id,
             Post.likes_count,
             Post.comments_count,
@@ -151,7 +556,7 @@ class QueryOptimizer:
             )
         ).with_entities(
             Post.id,
-            Post.title,
+            Post.content,
             Post.user_id,
             Post.likes_count,
             Post.created_at
@@ -165,19 +570,14 @@ class QueryOptimizer:
     @staticmethod
     def get_search_results_optimized(query_text, limit=20):
         """Optimized search with minimal fields"""
-        from sqlalchemy import or_
-        
         search_term = f"%{query_text}%"
         results = Post.query.filter(
-            or_(
-                Post.title.ilike(search_term),
-                Post.text.ilike(search_term)
-            ),
+            Post.content.ilike(search_term),
             Post.is_deleted == False,
             Post.moderation_status == 'approved'
         ).with_entities(
             Post.id,
-            Post.title,
+            Post.content,
             Post.user_id,
             Post.created_at
         ).order_by(
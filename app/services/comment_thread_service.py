@@ -0,0 +1,117 @@
+"""
+Comment thread loading
+
+Comment.to_dict() loads the replies and every author lazily, one query per
+comment. The thread loader fetches the comments of a page with a fixed
+number of queries (top-level comments, their replies through one recursive
+CTE, then authors and badges in one batch each) and assembles the reply
+tree in Python. The JSON shape is the same as Comment.to_dict().
+"""
+from flask import current_app
+from sqlalchemy import literal, select, tuple_
+from app.models.comment import Comment
+from app.services.serializers import load_authors
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+class CommentThreadService:
+    """Loads comment trees of a post in a constant number of queries"""
+
+    SORT_COLUMNS = [Comment.created_at, Comment.id]
+
+    @staticmethod
+    def _max_depth(max_depth):
+        if max_depth is None:
+            max_depth = current_app.config.get('COMMENT_MAX_DEPTH', 1)
+        return max(0, max_depth)
+
+    @staticmethod
+    def _replies(root_ids, max_depth):
+        """Non-deleted descendants of the given comments, down to max_depth levels"""
+        if not root_ids or max_depth < 1:
+            return []
+
+        table = Comment.__table__
+        thread = select(
+            table.c.id, literal(0).label('depth')
+        ).where(table.c.id.in_(root_ids)).cte('thread', recursive=True)
+        thread = thread.union_all(
+            select(table.c.id, (thread.c.depth + 1).label('depth'))
+            .join(thread, table.c.parent_id == thread.c.id)
+            .where(table.c.is_deleted == False, thread.c.depth < max_depth)
+        )
+        return Comment.query.join(thread, Comment.id == thread.c.id).filter(
+            thread.c.depth > 0
+        ).order_by(*CommentThreadService.SORT_COLUMNS).all()
+
+    @staticmethod
+    def _build(roots, comments, max_depth):
+        """Serialize roots with nested replies (the deepest level has no 'replies' key)"""
+        children = {}
+        for comment in comments:
+            children.setdefault(comment.parent_id, []).append(comment)
+
+        # Walk the tree first: replies under a deleted comment or too deep are not shown
+        shown = []
+
+        def collect(comment, depth):
+            shown.append(comment)
+            if depth < max_depth:
+                for reply in children.get(comment.id, []):
+                    collect(reply, depth + 1)
+
+        for root in roots:
+            collect(root, 0)
+        authors = load_authors(comment.user_id for comment in shown)
+
+        def serialize(comment, depth):
+            data = comment.to_dict(include_author=False, include_replies=False)
+            data['author'] = authors.get(comment.user_id)
+            if depth < max_depth:
+                data['replies'] = [serialize(reply, depth + 1) for reply in children.get(comment.id, [])]
+            return data
+
+        return [serialize(root, 0) for root in roots]
+
+    @staticmethod
+    def get_thread(post_id, max_depth=None):
+        """
+        All top-level comments of a post with their replies, oldest first.
+
+        Without pagination the whole thread is a single query over the post's comments.
+        """
+        max_depth = CommentThreadService._max_depth(max_depth)
+        query = Comment.query.filter_by(post_id=post_id, is_deleted=False)
+        if max_depth < 1:
+            query = query.filter(Comment.parent_id.is_(None))
+        comments = query.order_by(*CommentThreadService.SORT_COLUMNS).all()
+
+        roots = [comment for comment in comments if comment.parent_id is None]
+        return CommentThreadService._build(roots, comments, max_depth)
+
+    @staticmethod
+    def get_thread_page(post_id, cursor=None, per_page=20, max_depth=None):
+        """
+        One page of top-level comments (keyset on created_at, id) with their replies.
+
+        Returns:
+            Tuple of (comments, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            InvalidCursor: if the cursor cannot be decoded
+        """
+        max_depth = CommentThreadService._max_depth(max_depth)
+        columns = CommentThreadService.SORT_COLUMNS
+
+        query = Comment.query.filter_by(post_id=post_id, parent_id=None, is_deleted=False)
+        if cursor:
+            query = query.filter(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+        roots = query.order_by(*columns).limit(per_page + 1).all()
+
+        next_cursor = None
+        if len(roots) > per_page:
+            roots = roots[:per_page]
+            next_cursor = encode_cursor([roots[-1].created_at, roots[-1].id])
+
+        replies = CommentThreadService._replies([root.id for root in roots], max_depth)
+        return CommentThreadService._build(roots, roots + replies, max_depth), next_cursor
@@ -0,0 +1,157 @@
+"""
+Like toggling and like counter maintenance for posts and comments
+
+Toggling never reads the like row or the counter into Python: the like is
+deleted or inserted by the (target, user) unique constraint and likes_count
+is adjusted inside the UPDATE statement, so concurrent toggles on a hot post
+cannot overwrite each other's increments.
+"""
+import logging
+import uuid
+from datetime import datetime
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.post import Post
+from app.models.comment import Comment
+from app.models.post_like import PostLike
+from app.models.comment_like import CommentLike
+
+logger = logging.getLogger(__name__)
+
+# Dialects supporting INSERT ... ON CONFLICT DO NOTHING
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class LikeService:
+    """Atomic like toggles and periodic likes_count reconciliation"""
+
+    @staticmethod
+    def _insert_like(like_table, values):
+        """Insert a like row, ignoring a concurrent duplicate; returns True if inserted"""
+        dialect_insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+        if dialect_insert is not None:
+            statement = dialect_insert(like_table).values(**values).on_conflict_do_nothing()
+            return db.session.execute(statement).rowcount > 0
+
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(like_table).values(**values))
+            return True
+        except IntegrityError:
+            return False
+
+    @staticmethod
+    def _toggle(like_model, target_column, target_model, target_id, user_id):
+        """
+        Toggle a like and adjust the target's counter in the database.
+
+        Returns:
+            (liked, liked_at): liked is True if the user now likes the target,
+            False if the like was removed; liked_at is the creation time of the
+            added or removed like, None if a concurrent request already added it
+        """
+        like_table = like_model.__table__
+        target_table = target_model.__table__
+        target_key = like_table.c[target_column]
+        own_like = (target_key == target_id) & (like_table.c.user_id == user_id)
+
+        if db.engine.dialect.delete_returning:
+            removed_at = db.session.execute(
+                delete(like_table).where(own_like).returning(like_table.c.created_at)
+            ).scalars().all()
+        else:
+            removed_at = db.session.execute(select(like_table.c.created_at).where(own_like)).scalars().all()
+            if removed_at and not db.session.execute(delete(like_table).where(own_like)).rowcount:
+                removed_at = []
+        removed = len(removed_at)
+
+        if removed:
+            delta = case(
+                (target_table.c.likes_count > removed, target_table.c.likes_count - removed),
+                else_=0
+            )
+            liked = False
+            liked_at = removed_at[0]
+        else:
+            liked_at = datetime.utcnow()
+            inserted = LikeService._insert_like(like_table, {
+                'id': str(uuid.uuid4()),
+                target_column: target_id,
+                'user_id': user_id,
+                'created_at': liked_at,
+            })
+            # A concurrent request already added this like: nothing to count
+            delta = target_table.c.likes_count + 1 if inserted else None
+            liked = True
+            if not inserted:
+                liked_at = None
+
+        if delta is not None:
+            db.session.execute(
+                update(target_table).where(target_table.c.id == target_id).values(likes_count=delta)
+            )
+        db.session.commit()
+        return liked, liked_at
+
+    @staticmethod
+    def toggle_post_like(post_id, user_id):
+        """Like/unlike a post; returns (liked, liked_at), see _toggle"""
+        return LikeService._toggle(PostLike, 'post_id', Post, post_id, user_id)
+
+    @staticmethod
+    def toggle_comment_like(comment_id, user_id):
+        """Like/unlike a comment; returns (liked, liked_at), see _toggle"""
+        return LikeService._toggle(CommentLike, 'comment_id', Comment, comment_id, user_id)
+
+    @staticmethod
+    def _reconcile(like_model, target_column, target_model, batch_size):
+        """Recompute likes_count from like rows, one batch of targets per transaction"""
+        like_table = like_model.__table__
+        target_table = target_model.__table__
+
+        actual = select(func.count()).select_from(like_table).where(
+            like_table.c[target_column] == target_table.c.id
+        ).scalar_subquery()
+
+        fixed = 0
+        last_id = None
+        while True:
+            ids_query = select(target_table.c.id).order_by(target_table.c.id).limit(batch_size)
+            if last_id is not None:
+                ids_query = ids_query.where(target_table.c.id > last_id)
+            ids = db.session.execute(ids_query).scalars().all()
+            if not ids:
+                break
+
+            result = db.session.execute(
+                update(target_table)
+                .where(target_table.c.id.in_(ids), target_table.c.likes_count != actual)
+                .values(likes_count=actual)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            fixed += result.rowcount
+            last_id = ids[-1]
+
+        return fixed
+
+    @staticmethod
+    def reconcile_counts(batch_size=1000):
+        """
+        Repair drifted likes_count values on posts and comments.
+
+        Returns:
+            Dict with the number of corrected posts and comments
+        """
+        result = {
+            'posts': LikeService._reconcile(PostLike, 'post_id', Post, batch_size),
+            'comments': LikeService._reconcile(CommentLike, 'comment_id', Comment, batch_size),
+        }
+        if result['posts'] or result['comments']:
+            logger.info(f"Like counters reconciled: {result}")
+        return result
@@ -0,0 +1,256 @@
+"""
+Near-duplicate post index for spam waves (many accounts, lightly edited text)
+
+Every new post gets a MinHash signature (app.utils.minhash) whose bands
+are bucket keys. With Redis each bucket is a sorted set of post IDs scored
+by creation time, and the signature and author are stored under the post:
+
+    neardup:bucket:<band key>  zset   post ID -> created timestamp
+    neardup:post:<post ID>     string "<user ID>|<signature>"
+
+Both expire NEAR_DUPLICATE_HOURS after the last write. A lookup reads the
+BANDS buckets of a text and the signatures of the candidates found there
+(two round trips) and keeps those with an estimated similarity of at
+least NEAR_DUPLICATE_THRESHOLD, so the cost depends on the number of near
+duplicates, not on the number of recent posts.
+
+Without Redis the same buckets live in this process, filled with the
+window's posts from the database on first use and then with the posts
+committed by this worker.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app, has_app_context
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models.post import Post
+from app.utils.inverted_index import tokenize
+from app.utils.minhash import band_keys, minhash, shingles, similarity
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(created_at):
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+class NearDuplicateIndex:
+    """LSH buckets of MinHash signatures of recent posts"""
+
+    KEY_PREFIX = 'neardup:'
+    # Texts with fewer words match too easily to be compared
+    MIN_TOKENS = 8
+    WARM_LIMIT = 20000
+    PRUNE_INTERVAL = 60
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(dict)   # band key -> {post ID: timestamp}
+        self._posts = {}                    # post ID -> (user ID, signature, timestamp)
+        self._warmed = False
+        self._last_prune = 0.0
+        self.stats = {'added': 0, 'lookups': 0, 'candidates': 0, 'matches': 0}
+
+    def init_app(self, app):
+        """Bind to the application (first app wins)"""
+        if self.app is not None:
+            return
+        self.app = app
+        self.register_events()
+
+    @property
+    def window(self):
+        return current_app.config.get('NEAR_DUPLICATE_HOURS', 24) * 3600
+
+    @staticmethod
+    def signature(content):
+        """MinHash signature of a text, or None when it is too short to compare"""
+        tokens = tokenize(content)
+        if len(tokens) < NearDuplicateIndex.MIN_TOKENS:
+            return None
+        return minhash(shingles(tokens))
+
+    @staticmethod
+    def _encode(user_id, signature):
+        return f"{user_id}|{','.join(format(value, 'x') for value in signature)}"
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, bytes):
+            value = value.decode()
+        user_id, signature = value.split('|', 1)
+        return user_id, tuple(int(part, 16) for part in signature.split(','))
+
+    def add(self, post_id, user_id, content, created_at=None):
+        """Index a post (no-op for short texts)"""
+        signature = self.signature(content)
+        if signature is None:
+            return
+        timestamp = _timestamp(created_at or datetime.utcnow())
+        window = self.window
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                pipe.set(f"{self.KEY_PREFIX}post:{post_id}", self._encode(user_id, signature), ex=window)
+                for key in band_keys(signature):
+                    bucket = f"{self.KEY_PREFIX}bucket:{key}"
+                    pipe.zadd(bucket, {post_id: timestamp})
+                    pipe.zremrangebyscore(bucket, '-inf', time.time() - window)
+                    pipe.expire(bucket, window)
+                pipe.execute()
+                self.stats['added'] += 1
+            except RedisError as e:
+                logger.warning(f"Near-duplicate index update failed: {e}")
+            return
+
+        # Not warmed here: SQL can't be emitted after commit, and warming later re-adds the same posts
+        with self._lock:
+            self._add_local(post_id, user_id, signature, timestamp)
+            self._prune(window)
+
+    def _add_local(self, post_id, user_id, signature, timestamp):
+        self._posts[post_id] = (user_id, signature, timestamp)
+        for key in band_keys(signature):
+            self._buckets[key][post_id] = timestamp
+        self.stats['added'] += 1
+
+    def _prune(self, window, force=False):
+        """Drop posts older than the window (at most every PRUNE_INTERVAL seconds)"""
+        now = time.time()
+        if not force and now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        cutoff = now - window
+        expired = [post_id for post_id, (_, _, timestamp) in self._posts.items() if timestamp < cutoff]
+        for post_id in expired:
+            _, signature, _ = self._posts.pop(post_id)
+            for key in band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.pop(post_id, None)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _ensure_warm(self):
+        """Index the window's posts from the database before the first local lookup"""
+        if self._warmed:
+            return
+        with self._lock:
+            if self._warmed:
+                return
+            since = datetime.utcnow() - timedelta(seconds=self.window)
+            rows = db.session.query(Post.id, Post.user_id, Post.content, Post.created_at).filter(
+                Post.created_at >= since,
+                Post.is_deleted == False
+            ).order_by(Post.created_at.desc()).limit(self.WARM_LIMIT).all()
+            for post_id, user_id, content, created_at in rows:
+                signature = self.signature(content)
+                if signature is not None:
+                    self._add_local(post_id, user_id, signature, _timestamp(created_at))
+            self._warmed = True
+            logger.info(f"Near-duplicate index warmed with {len(self._posts)} posts")
+
+    def find(self, content, exclude_post_id=None):
+        """
+        Recent posts whose text is nearly the same as content.
+
+        Returns:
+            List of {'post_id', 'user_id', 'similarity'}, most similar first
+        """
+        if self.app is None or not has_app_context():
+            return []
+        signature = self.signature(content)
+        if signature is None:
+            return []
+        keys = band_keys(signature)
+        window = self.window
+        cutoff = time.time() - window
+        self.stats['lookups'] += 1
+
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zrangebyscore(f"{self.KEY_PREFIX}bucket:{key}", cutoff, '+inf')
+                candidates = set()
+                for members in pipe.execute():
+                    candidates.update(m.decode() if isinstance(m, bytes) else m for m in members)
+                candidates.discard(exclude_post_id)
+                candidates = sorted(candidates)
+                values = r.mget([f"{self.KEY_PREFIX}post:{post_id}" for post_id in candidates]) if candidates else []
+                entries = [
+                    (post_id, *self._decode(value))
+                    for post_id, value in zip(candidates, values) if value is not None
+                ]
+            except RedisError as e:
+                logger.warning(f"Near-duplicate lookup failed: {e}")
+                return []
+        else:
+            self._ensure_warm()
+            with self._lock:
+                candidates = set()
+                for key in keys:
+                    candidates.update(
+                        post_id for post_id, timestamp in self._buckets.get(key, {}).items() if timestamp >= cutoff
+                    )
+                candidates.discard(exclude_post_id)
+                entries = [(post_id, *self._posts[post_id][:2]) for post_id in candidates]
+
+        threshold = current_app.config.get('NEAR_DUPLICATE_THRESHOLD', 0.6)
+        matches = []
+        for post_id, user_id, other in entries:
+            score = similarity(signature, other)
+            if score >= threshold:
+                matches.append({'post_id': post_id, 'user_id': user_id, 'similarity': round(score, 3)})
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        self.stats['candidates'] += len(entries)
+        self.stats['matches'] += len(matches)
+        return matches
+
+    def get_stats(self):
+        return {'local_posts': len(self._posts), 'warmed': self._warmed, **self.stats}
+
+    def register_events(self):
+        """Index posts of this worker once they are committed"""
+        if not event.contains(Session, 'after_flush', _collect_new_posts):
+            event.listen(Session, 'after_flush', _collect_new_posts)
+            event.listen(Session, 'after_commit', _index_new_posts)
+            event.listen(Session, 'after_rollback', _discard_new_posts)
+
+
+def _collect_new_posts(session, flush_context):
+    """Capture new posts at flush time (objects are expired after commit)"""
+    if near_duplicate_index.app is None:
+        return
+    pending = session.info.setdefault('near_duplicate_posts', [])
+    for obj in session.new:
+        if isinstance(obj, Post) and not obj.is_deleted:
+            pending.append((obj.id, obj.user_id, obj.content, obj.created_at))
+
+
+def _index_new_posts(session):
+    pending = session.info.pop('near_duplicate_posts', None)
+    if not pending or not has_app_context():
+        return
+    try:
+        for post_id, user_id, content, created_at in pending:
+            near_duplicate_index.add(post_id, user_id, content, created_at)
+    except Exception as e:
+        logger.warning(f"Near-duplicate index update failed: {e}")
+
+
+def _discard_new_posts(session):
+    session.info.pop('near_duplicate_posts', None)
+
+
+# Глобальный экземпляр
+near_duplicate_index = NearDuplicateIndex()
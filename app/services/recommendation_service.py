@@ -0,0 +1,297 @@
+"""
+Collaborative-filtering post recommendations
+
+An offline job (RecommendationService.build, run by the scheduler) builds a
+sparse user x item interaction matrix. Items are the visible posts of the
+last RECOMMEND_WINDOW_DAYS plus authors, so follows take part as well:
+
+- like of the post: 1.0, bookmark: 2.0, like of a comment on the post: 0.5
+- following an author: 1.0 on the author's column
+
+Columns are L2-normalized and multiplied to get item-item cosine
+similarities; each post keeps its RECOMMEND_NEIGHBORS most similar items.
+A user's score for a post is the sum of its similarities to everything the
+user interacted with, and the RECOMMEND_TOP_K best posts the user has not
+seen or written are stored in post_recommendations. Serving is then one
+indexed lookup, blended with fresh posts from followed authors that are too
+new to have interactions.
+
+NumPy and SciPy are optional (requirements-optional.txt): without them the
+job is skipped and users only get the fresh and trending posts.
+"""
+import logging
+from array import array
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, insert, select
+from app import db
+from app.models.post import Post
+from app.models.comment import Comment
+from app.models.post_like import PostLike
+from app.models.comment_like import CommentLike
+from app.models.user_bookmark import UserBookmark
+from app.models.follow import Follow
+from app.models.recommendation import PostRecommendation
+
+# Optional import - only needed by the offline job
+try:
+    import numpy as np
+    from scipy import sparse
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    sparse = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationService:
+    """Item-item collaborative filtering over likes, bookmarks, comment likes and follows"""
+
+    # Interaction weights in the user x item matrix
+    WEIGHTS = {
+        'like': 1.0,
+        'bookmark': 2.0,
+        'comment_like': 0.5,
+        'follow': 1.0,
+    }
+    # Posts per similarity block and users per scoring block (bounds memory)
+    POST_BLOCK = 2000
+    USER_BLOCK = 5000
+    INSERT_BATCH = 5000
+
+    @staticmethod
+    def _load_matrix(since):
+        """
+        Interaction matrix of the window.
+
+        Returns:
+            (matrix, user_ids, post_ids, post_authors) where the first
+            len(post_ids) columns are posts and post_authors holds the
+            matrix row of each post's author (-1 if the author has none)
+        """
+        visible = (Post.is_deleted == False, Post.moderation_status == 'approved', Post.created_at >= since)
+
+        posts = db.session.execute(select(Post.id, Post.user_id).where(*visible).order_by(Post.id)).all()
+        post_ids = [post_id for post_id, _ in posts]
+        columns = {post_id: i for i, post_id in enumerate(post_ids)}
+        authors = {}
+        users = {}
+        user_ids = []
+        rows, cols, values = array('i'), array('i'), array('f')
+
+        def row_of(user_id):
+            row = users.get(user_id)
+            if row is None:
+                row = users[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            return row
+
+        def add(user_id, column, weight):
+            rows.append(row_of(user_id))
+            cols.append(column)
+            values.append(weight)
+
+        sources = (
+            ('like', select(PostLike.user_id, PostLike.post_id).join(Post, Post.id == PostLike.post_id)),
+            ('bookmark', select(UserBookmark.user_id, UserBookmark.post_id).join(Post, Post.id == UserBookmark.post_id)),
+            ('comment_like', select(CommentLike.user_id, Comment.post_id)
+                .join(Comment, Comment.id == CommentLike.comment_id)
+                .join(Post, Post.id == Comment.post_id)),
+        )
+        for kind, statement in sources:
+            weight = RecommendationService.WEIGHTS[kind]
+            for user_id, post_id in db.session.execute(statement.where(*visible)).yield_per(10000):
+                column = columns.get(post_id)
+                if column is not None:
+                    add(user_id, column, weight)
+
+        weight = RecommendationService.WEIGHTS['follow']
+        for follower_id, following_id in db.session.execute(
+            select(Follow.follower_id, Follow.following_id)
+        ).yield_per(10000):
+            column = authors.get(following_id)
+            if column is None:
+                column = authors[following_id] = len(post_ids) + len(authors)
+            add(follower_id, column, weight)
+
+        post_authors = np.array([users.get(author_id, -1) for _, author_id in posts], dtype=np.int64)
+        matrix = sparse.csr_matrix(
+            (np.frombuffer(values, dtype=np.float32), (np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32))),
+            shape=(len(user_ids), len(post_ids) + len(authors)),
+            dtype=np.float32
+        )
+        # Repeated interactions with the same item (e.g. several liked comments) are summed
+        matrix.sum_duplicates()
+        return matrix, user_ids, post_ids, post_authors
+
+    @staticmethod
+    def _top_per_column(block, count):
+        """Keep the `count` largest entries of every column of a CSC block"""
+        keep = np.ones(block.nnz, dtype=bool)
+        for column in range(block.shape[1]):
+            start, end = block.indptr[column], block.indptr[column + 1]
+            if end - start > count:
+                order = np.argpartition(block.data[start:end], end - start - count)
+                keep[start + order[:end - start - count]] = False
+        block.data[~keep] = 0
+        block.eliminate_zeros()
+        return block
+
+    @staticmethod
+    def _similarities(matrix, n_posts, neighbors):
+        """Item x post cosine similarities, pruned to the top neighbors of each post"""
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        normalized = matrix.multiply(1.0 / norms).tocsc()
+        transposed = normalized.T.tocsr()
+
+        blocks = []
+        for start in range(0, n_posts, RecommendationService.POST_BLOCK):
+            end = min(start + RecommendationService.POST_BLOCK, n_posts)
+            block = (transposed @ normalized[:, start:end]).tocoo()
+            # A post is not its own neighbor
+            mask = block.row != block.col + start
+            block = sparse.csc_matrix((block.data[mask], (block.row[mask], block.col[mask])), shape=block.shape)
+            blocks.append(RecommendationService._top_per_column(block, neighbors))
+        return sparse.hstack(blocks).tocsr() if blocks else sparse.csr_matrix((matrix.shape[1], 0))
+
+    @staticmethod
+    def _top_posts(scores, seen, post_authors, first_row, top_k):
+        """
+        Best unseen, not own posts per user row of a score block.
+
+        Yields:
+            (matrix row, post columns, scores)
+        """
+        rows = scores.shape[0]
+        # Drop seen and own posts with sparse arithmetic instead of per-row set lookups
+        own_posts = np.flatnonzero((post_authors >= first_row) & (post_authors < first_row + rows))
+        own = sparse.csr_matrix(
+            (np.ones(len(own_posts), dtype=np.float32), (post_authors[own_posts] - first_row, own_posts)),
+            shape=scores.shape
+        )
+        hidden = (seen + own) > 0
+        scores = (scores - scores.multiply(hidden)).tocsr()
+        scores.data[scores.data < 0] = 0
+        scores.eliminate_zeros()
+
+        for i in range(rows):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            if start == end:
+                continue
+            columns = scores.indices[start:end]
+            values = scores.data[start:end]
+            if end - start > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                columns, values = columns[best], values[best]
+            yield first_row + i, columns, values
+
+    @staticmethod
+    def build():
+        """
+        Recompute all stored recommendations (replaces the table in one transaction).
+
+        Returns:
+            Dict with matrix sizes and the number of stored recommendations,
+            or None when NumPy/SciPy are not installed
+        """
+        if not NUMPY_AVAILABLE:
+            logger.warning("numpy/scipy not installed, recommendations are not computed")
+            return None
+
+        config = current_app.config
+        since = datetime.utcnow() - timedelta(days=config.get('RECOMMEND_WINDOW_DAYS', 90))
+        top_k = config.get('RECOMMEND_TOP_K', 100)
+
+        matrix, user_ids, post_ids, post_authors = RecommendationService._load_matrix(since)
+        n_posts = len(post_ids)
+        similarities = RecommendationService._similarities(matrix, n_posts, config.get('RECOMMEND_NEIGHBORS', 50))
+
+        table = PostRecommendation.__table__
+        now = datetime.utcnow()
+        stored = 0
+        db.session.execute(delete(table))
+        batch = []
+        for start in range(0, len(user_ids), RecommendationService.USER_BLOCK):
+            block = matrix[start:start + RecommendationService.USER_BLOCK]
+            scores = (block @ similarities).tocsr()
+            seen = block[:, :n_posts].tocsr()
+            for row, columns, values in RecommendationService._top_posts(scores, seen, post_authors, start, top_k):
+                user_id = user_ids[row]
+                batch.extend(
+                    {'user_id': user_id, 'post_id': post_ids[column], 'score': float(value), 'created_at': now}
+                    for column, value in zip(columns.tolist(), values.tolist())
+                )
+                if len(batch) >= RecommendationService.INSERT_BATCH:
+                    db.session.execute(insert(table), batch)
+                    stored += len(batch)
+                    batch = []
+        if batch:
+            db.session.execute(insert(table), batch)
+            stored += len(batch)
+        db.session.commit()
+
+        result = {
+            'users': len(user_ids),
+            'posts': n_posts,
+            'interactions': int(matrix.nnz),
+            'recommendations': stored,
+        }
+        logger.info(f"Recommendations built: {result}")
+        return result
+
+    @staticmethod
+    def _fresh_post_ids(user_id, limit):
+        """Newest posts of followed authors (too new for the offline job)"""
+        since = datetime.utcnow() - timedelta(hours=current_app.config.get('RECOMMEND_FRESH_HOURS', 48))
+        following = select(Follow.following_id).where(Follow.follower_id == user_id)
+        return db.session.execute(
+            select(Post.id).where(
+                Post.user_id.in_(following),
+                Post.is_deleted == False,
+                Post.moderation_status == 'approved',
+                Post.created_at >= since
+            ).order_by(Post.created_at.desc()).limit(limit)
+        ).scalars().all()
+
+    @staticmethod
+    def get_recommended_ids(user_id, limit=20):
+        """
+        Post IDs to recommend: stored recommendations with fresh posts of
+        followed authors mixed in (every 1/RECOMMEND_FRESH_SHARE-th slot).
+        Posts the user liked since the last build are skipped.
+        """
+        stored = db.session.execute(
+            select(PostRecommendation.post_id)
+            .where(PostRecommendation.user_id == user_id)
+            .order_by(PostRecommendation.score.desc())
+            .limit(limit * 2)
+        ).scalars().all()
+        fresh = RecommendationService._fresh_post_ids(user_id, limit)
+
+        candidates = set(stored) | set(fresh)
+        liked = set(db.session.execute(
+            select(PostLike.post_id).where(PostLike.user_id == user_id, PostLike.post_id.in_(candidates))
+        ).scalars()) if candidates else set()
+        stored = [post_id for post_id in stored if post_id not in liked]
+        fresh = [post_id for post_id in fresh if post_id not in liked]
+
+        share = current_app.config.get('RECOMMEND_FRESH_SHARE', 0.25)
+        step = max(1, round(1 / share)) if share > 0 else 0
+        result = []
+        seen = set()
+        stored_iter, fresh_iter = iter(stored), iter(fresh)
+        while len(result) < limit:
+            use_fresh = step and (len(result) + 1) % step == 0
+            post_id = next(fresh_iter if use_fresh else stored_iter, None)
+            if post_id is None:
+                # One source ran out: continue with the other
+                post_id = next(stored_iter if use_fresh else fresh_iter, None)
+                if post_id is None:
+                    break
+            if post_id not in seen:
+                seen.add(post_id)
+                result.append(post_id)
+        return result
@@ -0,0 +1,317 @@
+"""
+Related posts from a TF-IDF vector index (GET /api/posts/<id>/related)
+
+Each worker keeps a VectorIndex of visible posts: hashed TF-IDF vectors of
+the content plus tags (tags count twice). Nearest neighbours by cosine
+similarity are the related posts, with no external service involved.
+
+- on start the snapshot in RELATED_INDEX_PATH is memory-mapped (workers
+  share its pages), or the index is built from the database and saved
+- posts committed by this worker are added or removed right away (ORM
+  events); posts written by other workers are picked up by re-reading rows
+  updated since the last sync, at most every RELATED_SYNC_INTERVAL seconds
+- the snapshot is rewritten every RELATED_SNAPSHOT_INTERVAL seconds when
+  something changed
+
+Without NumPy (requirements-optional.txt) related posts are the posts
+sharing the most tags, from the normalized tag tables.
+"""
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.post import Post
+from app.models.tag import post_tags
+from app.services.tag_service import TagService
+from app.utils.inverted_index import tokenize
+
+# Optional import - numpy is only in requirements-optional.txt
+try:
+    from app.utils.vector_index import HashingVectorizer, VectorIndex
+    NUMPY_AVAILABLE = True
+except ImportError:
+    HashingVectorizer = None
+    VectorIndex = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(content, tags):
+    return zlib.crc32(f"{content or ''}\x00{tags or ''}".encode('utf-8'))
+
+
+def _post_tokens(content, tags):
+    # Tags are short and deliberate: weigh them like two mentions in the text
+    return tokenize(content) + tokenize(' '.join(map(str, TagService.parse(tags)))) * 2
+
+
+class RelatedPostsIndex:
+    """Vector index of visible posts kept in sync with the database"""
+
+    # Rows updated shortly before a sync may belong to transactions that commit after it
+    SYNC_OVERLAP = timedelta(seconds=10)
+    BUILD_BATCH = 1000
+
+    def __init__(self):
+        self.app = None
+        self.index = None
+        self.vectorizer = None
+        self._fingerprints = {}  # post ID -> fingerprint of the indexed text
+        self._lock = threading.Lock()
+        self._ready = False
+        self._watermark = None
+        self._last_sync = 0.0
+        self._last_snapshot = 0.0
+        self._changed = False
+        self.stats = {'builds': 0, 'snapshot_loads': 0, 'syncs': 0, 'synced_rows': 0, 'live_updates': 0}
+
+    def init_app(self, app):
+        """Bind to the application (first app wins)"""
+        if self.app is not None:
+            return
+        self.app = app
+        if self.enabled:
+            self.register_events()
+
+    @property
+    def enabled(self):
+        return NUMPY_AVAILABLE and self.app is not None and self.app.config.get('RELATED_POSTS_INDEX', True)
+
+    @property
+    def snapshot_path(self):
+        return str(self.app.config.get('RELATED_INDEX_PATH', './data/related_posts.json'))
+
+    @property
+    def dim(self):
+        return self.app.config.get('RELATED_INDEX_DIM', 256)
+
+    def ensure_ready(self):
+        """Load or build the index on first use, then sync recent changes when due"""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if not self._load_snapshot():
+                        self.rebuild()
+                    self._ready = True
+        if time.monotonic() - self._last_sync >= self.app.config.get('RELATED_SYNC_INTERVAL', 60):
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.sync()
+                finally:
+                    self._lock.release()
+
+    def _load_snapshot(self):
+        path = self.snapshot_path
+        if not os.path.exists(path):
+            return False
+        try:
+            started = time.monotonic()
+            index, meta, arrays = VectorIndex.load(path)
+            if index.dim != self.dim:
+                raise ValueError(f"snapshot has {index.dim} dimensions, RELATED_INDEX_DIM is {self.dim}")
+            vectorizer = HashingVectorizer(index.dim, arrays['df'], meta['n_docs'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Related posts snapshot unusable, rebuilding: {e}")
+            return False
+        self.index, self.vectorizer = index, vectorizer
+        self._fingerprints = {}
+        self._watermark = datetime.fromisoformat(meta['watermark'])
+        self._last_snapshot = time.monotonic()
+        self.stats['snapshot_loads'] += 1
+        logger.info(f"Related posts index loaded: {len(index)} posts in {time.monotonic() - started:.2f}s")
+        # Catch up with everything written since the snapshot
+        self.sync()
+        return True
+
+    def save_snapshot(self):
+        """Write the index to disk"""
+        self.index.save(
+            self.snapshot_path,
+            meta={'watermark': self._watermark.isoformat(), 'n_docs': self.vectorizer.n_docs},
+            arrays={'df': self.vectorizer.df}
+        )
+        self._last_snapshot = time.monotonic()
+        self._changed = False
+
+    def rebuild(self):
+        """Vectorize all visible posts from the database and write a snapshot"""
+        started = time.monotonic()
+        watermark = datetime.utcnow() - self.SYNC_OVERLAP
+        query = db.session.query(Post.id, Post.content, Post.tags).filter(
+            Post.is_deleted == False, Post.moderation_status == 'approved'
+        )
+
+        # Two passes: document frequencies first, so every vector uses the same IDF
+        vectorizer = HashingVectorizer(self.dim)
+        for rows in self._batches(query):
+            for _, content, tags in rows:
+                vectorizer.count(_post_tokens(content, tags))
+        index = VectorIndex(self.dim)
+        fingerprints = {}
+        for rows in self._batches(query):
+            for post_id, content, tags in rows:
+                index.add(post_id, vectorizer.vectorize(_post_tokens(content, tags)))
+                fingerprints[post_id] = _fingerprint(content, tags)
+
+        self.index, self.vectorizer, self._fingerprints = index, vectorizer, fingerprints
+        self._watermark = watermark
+        self._last_sync = time.monotonic()
+        self.stats['builds'] += 1
+        logger.info(f"Related posts index built: {len(index)} posts in {time.monotonic() - started:.2f}s")
+        try:
+            self.save_snapshot()
+        except OSError as e:
+            logger.warning(f"Could not write related posts snapshot: {e}")
+
+    def _batches(self, query):
+        last_id = None
+        while True:
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(Post.id > last_id)
+            rows = batch.order_by(Post.id).limit(self.BUILD_BATCH).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def sync(self):
+        """Re-index posts updated since the last sync (changes from other workers)"""
+        watermark = datetime.utcnow() - self.SYNC_OVERLAP
+        since = self._watermark or watermark
+
+        rows = db.session.query(
+            Post.id, Post.content, Post.tags, Post.is_deleted, Post.moderation_status
+        ).filter(Post.updated_at >= since).all()
+        for post_id, content, tags, is_deleted, moderation_status in rows:
+            self._apply_post(post_id, content, tags, not is_deleted and moderation_status == 'approved')
+
+        self._watermark = watermark
+        self._last_sync = time.monotonic()
+        self.stats['syncs'] += 1
+        self.stats['synced_rows'] += len(rows)
+        if rows:
+            self._changed = True
+
+        if self._changed and time.monotonic() - self._last_snapshot >= self.app.config.get('RELATED_SNAPSHOT_INTERVAL', 600):
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                logger.warning(f"Could not write related posts snapshot: {e}")
+
+    def _apply_post(self, post_id, content, tags, visible):
+        if not visible:
+            self.index.remove(post_id)
+            self._fingerprints.pop(post_id, None)
+            return
+        fingerprint = _fingerprint(content, tags)
+        indexed = post_id in self.index
+        if indexed and self._fingerprints.get(post_id) == fingerprint:
+            # Only counters changed (likes, views): the vector is the same
+            return
+        tokens = _post_tokens(content, tags)
+        if not indexed:
+            self.vectorizer.count(tokens)
+        self.index.add(post_id, self.vectorizer.vectorize(tokens))
+        self._fingerprints[post_id] = fingerprint
+
+    def related_ids(self, post_id, limit=10):
+        """
+        IDs of the posts most similar to a post, best first.
+
+        Uses the vector index when enabled, else shared tags.
+        """
+        if not self.enabled:
+            return self._related_by_tags(post_id, limit)
+
+        self.ensure_ready()
+        vector = self.index.vector(post_id)
+        if vector is None:
+            # Not indexed (e.g. hidden): vectorize it on the fly
+            row = db.session.query(Post.content, Post.tags).filter(Post.id == post_id).first()
+            if row is None:
+                return []
+            vector = self.vectorizer.vectorize(_post_tokens(row.content, row.tags))
+        if not vector.any():
+            return []
+        results = self.index.search(vector, limit + 1)
+        return [doc_id for doc_id, score in results if doc_id != post_id and score > 0][:limit]
+
+    @staticmethod
+    def _related_by_tags(post_id, limit):
+        """Visible posts sharing the most tags with a post"""
+        tag_ids = select(post_tags.c.tag_id).where(post_tags.c.post_id == post_id)
+        shared = func.count().label('shared')
+        rows = db.session.execute(
+            select(post_tags.c.post_id, shared)
+            .join(Post, Post.id == post_tags.c.post_id)
+            .where(
+                post_tags.c.tag_id.in_(tag_ids),
+                post_tags.c.post_id != post_id,
+                Post.is_deleted == False,
+                Post.moderation_status == 'approved'
+            )
+            .group_by(post_tags.c.post_id, Post.created_at)
+            .order_by(shared.desc(), Post.created_at.desc())
+            .limit(limit)
+        ).all()
+        return [row.post_id for row in rows]
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'ready': self._ready,
+            'posts': len(self.index) if self.index is not None else 0,
+            'watermark': self._watermark.isoformat() if self._watermark else None,
+            **self.stats,
+        }
+
+    def register_events(self):
+        """Apply committed post writes of this worker to the index"""
+        if not event.contains(Session, 'after_flush', _collect_related_changes):
+            event.listen(Session, 'after_flush', _collect_related_changes)
+            event.listen(Session, 'after_commit', _apply_related_changes)
+            event.listen(Session, 'after_rollback', _discard_related_changes)
+
+
+def _collect_related_changes(session, flush_context):
+    """Capture content and visibility at flush time (objects are expired after commit)"""
+    if not related_posts._ready:
+        return
+    pending = session.info.setdefault('related_posts_changes', {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            if obj in session.dirty:
+                state = inspect(obj)
+                if not any(state.attrs[name].history.has_changes()
+                           for name in ('content', 'tags', 'is_deleted', 'moderation_status')):
+                    continue
+            visible = obj not in session.deleted and not obj.is_deleted and obj.moderation_status == 'approved'
+            pending[obj.id] = (obj.content, obj.tags, visible)
+
+
+def _apply_related_changes(session):
+    pending = session.info.pop('related_posts_changes', None)
+    if not pending:
+        return
+    try:
+        for post_id, (content, tags, visible) in pending.items():
+            related_posts._apply_post(post_id, content, tags, visible)
+        related_posts._changed = True
+        related_posts.stats['live_updates'] += len(pending)
+    except Exception as e:
+        logger.warning(f"Related posts index update failed: {e}")
+
+
+def _discard_related_changes(session):
+    session.info.pop('related_posts_changes', None)
+
+
+# Глобальный экземпляр
+related_posts = RelatedPostsIndex()
@@ -0,0 +1,229 @@
+"""
+Text search backends for SearchService.search_posts
+
+A backend narrows a Post query to the posts matching the search text,
+provides a relevance expression for sort_by=relevant and builds highlighted
+snippets for the posts of the result page.
+
+- postgres: full-text search over a generated `posts.search_vector`
+  column with a GIN index (migrations/migrate_post_search.py), ranked with
+  ts_rank and highlighted with ts_headline
+- memory: BM25 over an in-process inverted index (app.services.search_index),
+  for deployments without PostgreSQL
+- like: ILIKE substring match, for SQLite or until the migration has run
+
+Backends also match users for SearchService.search_users. SEARCH_BACKEND
+selects one explicitly; 'auto' prefers postgres, then like.
+"""
+import html
+import logging
+import re
+from flask import current_app, g
+from sqlalchemy import case, cast, false, func, inspect, literal_column, or_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from app import db
+from app.models.post import Post
+from app.models.user import User
+from app.utils.inverted_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Snippet highlight markers: private-use characters that cannot clash with
+# post text, replaced with <mark> after the snippet is HTML-escaped
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+# Stored tsvector over tags (weight A) and content. Content is indexed both
+# stemmed and unstemmed: the 'russian' configuration stems Cyrillic words
+# with the Russian stemmer and Latin words with the English one, while the
+# 'simple' lexemes let queries in any configuration (Ukrainian has no
+# built-in stemmer) still match exact word forms.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(tags, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'D')"
+)
+
+
+def highlight(text, pattern, width=200):
+    """
+    HTML-escaped excerpt of text around the first match of a regex, matches wrapped in <mark>.
+
+    Returns None when nothing matches.
+    """
+    if not text:
+        return None
+    match = pattern.search(text)
+    if match is None:
+        return None
+
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), start + width)
+    excerpt = pattern.sub(lambda m: f'{MARK_START}{m.group(0)}{MARK_END}', text[start:end])
+    return _render_marks(('…' if start > 0 else '') + excerpt + ('…' if end < len(text) else ''))
+
+
+def _render_marks(snippet):
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class LikeSearchBackend:
+    """Substring search with ILIKE (no index; fine for small tables)"""
+
+    name = 'like'
+
+    @staticmethod
+    def _pattern(text):
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    def filter(self, query, text, lang=None):
+        term = f"%{self._pattern(text)}%"
+        return query.filter(or_(
+            Post.content.ilike(term, escape='\\'),
+            Post.tags.ilike(term, escape='\\')
+        ))
+
+    def rank(self, text, lang=None):
+        # Posts starting with the search text first
+        return Post.content.ilike(f"{self._pattern(text)}%", escape='\\')
+
+    def snippets(self, posts, text, lang=None):
+        pattern = re.compile(re.escape(text), re.IGNORECASE)
+        return {post.id: highlight(post.content, pattern) for post in posts}
+
+    def filter_users(self, query, text):
+        term = f"%{self._pattern(text)}%"
+        return query.filter(or_(
+            User.username.ilike(term, escape='\\'),
+            User.bio.ilike(term, escape='\\')
+        ))
+
+    def user_rank(self, text):
+        """Relevance expression for users (None: keep newest first)"""
+        return None
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """PostgreSQL full-text search on posts.search_vector (users still match with ILIKE)"""
+
+    name = 'postgres'
+    COLUMN = 'search_vector'
+    HEADLINE_OPTIONS = (
+        f'StartSel={MARK_START}, StopSel={MARK_END}, '
+        'MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'
+    )
+
+    def __init__(self):
+        self._ready = {}
+
+    def available(self):
+        """True on PostgreSQL once the search_vector column exists (checked once per engine)"""
+        engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            return False
+        key = str(engine.url)
+        if key not in self._ready:
+            try:
+                columns = {column['name'] for column in inspect(engine).get_columns('posts')}
+                self._ready[key] = self.COLUMN in columns
+            except Exception as e:
+                logger.warning(f"Could not inspect posts table for full-text search: {e}")
+                return False
+            if not self._ready[key]:
+                logger.warning("posts.search_vector missing, run migrations/migrate_post_search.py; using ILIKE search")
+        return self._ready[key]
+
+    @staticmethod
+    def _config(lang):
+        configs = current_app.config.get('SEARCH_TEXT_CONFIGS', {})
+        return configs.get(lang) or configs.get(current_app.config.get('SEARCH_DEFAULT_LANGUAGE', 'ru'), 'simple')
+
+    def _tsquery(self, text, lang):
+        # websearch syntax: "quoted phrases", OR, -excluded
+        return func.websearch_to_tsquery(cast(self._config(lang), REGCONFIG), text)
+
+    def filter(self, query, text, lang=None):
+        vector = literal_column(f'posts.{self.COLUMN}')
+        return query.filter(vector.op('@@')(self._tsquery(text, lang)))
+
+    def rank(self, text, lang=None):
+        return func.ts_rank(literal_column(f'posts.{self.COLUMN}'), self._tsquery(text, lang))
+
+    def snippets(self, posts, text, lang=None):
+        if not posts:
+            return {}
+        headline = func.ts_headline(
+            cast(self._config(lang), REGCONFIG), Post.content, self._tsquery(text, lang), self.HEADLINE_OPTIONS
+        )
+        # Only the page's rows: ts_headline re-parses the whole document
+        rows = db.session.query(Post.id, headline).filter(Post.id.in_([post.id for post in posts])).all()
+        return {post_id: _render_marks(snippet) if MARK_START in (snippet or '') else None for post_id, snippet in rows}
+
+
+class MemorySearchBackend(LikeSearchBackend):
+    """BM25 over the in-process inverted index; SQL only sees the matching IDs"""
+
+    name = 'memory'
+
+    @staticmethod
+    def _results(kind, text):
+        """Matching (id, score) pairs, computed once per request"""
+        from app.services.search_index import search_index
+
+        cache = g.setdefault('search_index_results', {})
+        if (kind, text) not in cache:
+            limit = current_app.config.get('SEARCH_MEMORY_MAX_RESULTS', 1000)
+            search = search_index.search_posts if kind == 'posts' else search_index.search_users
+            cache[(kind, text)] = dict(search(text, limit))
+        return cache[(kind, text)]
+
+    @staticmethod
+    def _filter_ids(query, column, scores):
+        if not scores:
+            return query.filter(false())
+        return query.filter(column.in_(list(scores)))
+
+    @staticmethod
+    def _rank(column, scores):
+        if not scores:
+            return literal_column('0')
+        return case(scores, value=column, else_=0.0)
+
+    def filter(self, query, text, lang=None):
+        return self._filter_ids(query, Post.id, self._results('posts', text))
+
+    def rank(self, text, lang=None):
+        return self._rank(Post.id, self._results('posts', text))
+
+    def snippets(self, posts, text, lang=None):
+        terms = sorted(set(tokenize(text)), key=len, reverse=True)
+        if not terms:
+            return {}
+        # Whole indexed tokens only, as the index matched them
+        pattern = re.compile(
+            r'(?<![^\W_])(?:' + '|'.join(re.escape(term).replace('е', '[её]') for term in terms) + r')(?![^\W_])',
+            re.IGNORECASE
+        )
+        return {post.id: highlight(post.content, pattern) for post in posts}
+
+    def filter_users(self, query, text):
+        return self._filter_ids(query, User.id, self._results('users', text))
+
+    def user_rank(self, text):
+        return self._rank(User.id, self._results('users', text))
+
+
+# Глобальные экземпляры
+like_backend = LikeSearchBackend()
+postgres_backend = PostgresSearchBackend()
+memory_backend = MemorySearchBackend()
+
+
+def get_search_backend():
+    """Backend chosen by SEARCH_BACKEND ('auto', 'postgres', 'memory', 'like')"""
+    choice = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if choice == 'memory':
+        return memory_backend
+    if choice in ('auto', 'postgres') and postgres_backend.available():
+        return postgres_backend
+    return like_backend
@@ -0,0 +1,265 @@
+"""
+In-process search index for posts and users (SEARCH_BACKEND=memory)
+
+Meant for deployments without PostgreSQL full-text search (SQLite staging
+boxes, the HF Space). Each worker keeps an InvertedIndex of visible posts
+(content + tags) and of users who are not banned (username + bio):
+
+- on start it loads the on-disk snapshot, or builds the index from the
+  database and writes one
+- writes committed by this worker are applied right away (ORM events)
+- writes from other workers are picked up by re-reading rows whose
+  updated_at is newer than the last sync, at most every
+  SEARCH_INDEX_SYNC_INTERVAL seconds
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models.post import Post
+from app.models.user import User
+from app.utils.inverted_index import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _post_text(content, tags):
+    return f"{content or ''} {tags or ''}"
+
+
+def _user_text(username, bio):
+    return f"{username or ''} {bio or ''}"
+
+
+class SearchIndex:
+    """Post and user indexes kept in sync with the database"""
+
+    # Rows updated shortly before a sync may belong to transactions that commit after it
+    SYNC_OVERLAP = timedelta(seconds=10)
+    BUILD_BATCH = 1000
+
+    def __init__(self):
+        self.app = None
+        self.posts = InvertedIndex()
+        self.users = InvertedIndex()
+        self._lock = threading.Lock()
+        self._ready = False
+        self._watermark = None
+        self._last_sync = 0.0
+        self._last_snapshot = 0.0
+        self._changed = False
+        self.stats = {'builds': 0, 'snapshot_loads': 0, 'syncs': 0, 'synced_rows': 0, 'live_updates': 0}
+
+    def init_app(self, app):
+        """Bind to the application (first app wins); hooks only run with SEARCH_BACKEND=memory"""
+        if self.app is not None:
+            return
+        self.app = app
+        if app.config.get('SEARCH_BACKEND') == 'memory':
+            self.register_events()
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config.get('SEARCH_BACKEND') == 'memory'
+
+    @property
+    def snapshot_path(self):
+        return str(self.app.config.get('SEARCH_INDEX_PATH', './data/search_index.bin'))
+
+    def ensure_ready(self):
+        """Load or build the indexes on first use, then sync recent changes when due"""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if not self._load_snapshot():
+                        self.rebuild()
+                    self._ready = True
+        if time.monotonic() - self._last_sync >= self.app.config.get('SEARCH_INDEX_SYNC_INTERVAL', 30):
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.sync()
+                finally:
+                    self._lock.release()
+
+    def _load_snapshot(self):
+        path = self.snapshot_path
+        if not os.path.exists(path):
+            return False
+        try:
+            started = time.monotonic()
+            posts, meta = InvertedIndex.load(path)
+            users, _ = InvertedIndex.load(f"{path}.users")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Search index snapshot unusable, rebuilding: {e}")
+            return False
+        self.posts, self.users = posts, users
+        self._watermark = datetime.fromisoformat(meta['watermark'])
+        self._last_snapshot = time.monotonic()
+        self.stats['snapshot_loads'] += 1
+        logger.info(f"Search index loaded: {len(posts)} posts, {len(users)} users in {time.monotonic() - started:.2f}s")
+        # Catch up with everything written since the snapshot
+        self.sync()
+        return True
+
+    def save_snapshot(self):
+        """Write both indexes to disk"""
+        meta = {'watermark': self._watermark.isoformat()}
+        path = self.snapshot_path
+        self.users.save(f"{path}.users", meta)
+        # The posts file is written last: its presence means the snapshot is complete
+        self.posts.save(path, meta)
+        self._last_snapshot = time.monotonic()
+        self._changed = False
+
+    def rebuild(self):
+        """Index all visible posts and users from the database and write a snapshot"""
+        started = time.monotonic()
+        watermark = datetime.utcnow() - self.SYNC_OVERLAP
+        posts, users = InvertedIndex(), InvertedIndex()
+
+        for rows in self._batches(db.session.query(Post.id, Post.content, Post.tags).filter(
+            Post.is_deleted == False, Post.moderation_status == 'approved'
+        ), Post.id):
+            for post_id, content, tags in rows:
+                posts.add(post_id, _post_text(content, tags))
+
+        for rows in self._batches(db.session.query(User.id, User.username, User.bio).filter(
+            User.is_banned == False
+        ), User.id):
+            for user_id, username, bio in rows:
+                users.add(user_id, _user_text(username, bio))
+
+        self.posts, self.users = posts, users
+        self._watermark = watermark
+        self._last_sync = time.monotonic()
+        self.stats['builds'] += 1
+        logger.info(f"Search index built: {len(posts)} posts, {len(users)} users in {time.monotonic() - started:.2f}s")
+        try:
+            self.save_snapshot()
+        except OSError as e:
+            logger.warning(f"Could not write search index snapshot: {e}")
+
+    def _batches(self, query, key):
+        last_id = None
+        while True:
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(key > last_id)
+            rows = batch.order_by(key).limit(self.BUILD_BATCH).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def sync(self):
+        """Re-index posts and users updated since the last sync (changes from other workers)"""
+        watermark = datetime.utcnow() - self.SYNC_OVERLAP
+        since = self._watermark or watermark
+
+        rows = db.session.query(
+            Post.id, Post.content, Post.tags, Post.is_deleted, Post.moderation_status
+        ).filter(Post.updated_at >= since).all()
+        for post_id, content, tags, is_deleted, moderation_status in rows:
+            self._apply_post(post_id, content, tags, not is_deleted and moderation_status == 'approved')
+
+        user_rows = db.session.query(User.id, User.username, User.bio, User.is_banned).filter(
+            User.updated_at >= since
+        ).all()
+        for user_id, username, bio, is_banned in user_rows:
+            self._apply_user(user_id, username, bio, not is_banned)
+
+        self._watermark = watermark
+        self._last_sync = time.monotonic()
+        self.stats['syncs'] += 1
+        self.stats['synced_rows'] += len(rows) + len(user_rows)
+        if rows or user_rows:
+            self._changed = True
+
+        if self._changed and time.monotonic() - self._last_snapshot >= self.app.config.get('SEARCH_INDEX_SNAPSHOT_INTERVAL', 600):
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                logger.warning(f"Could not write search index snapshot: {e}")
+
+    def _apply_post(self, post_id, content, tags, visible):
+        if visible:
+            self.posts.add(post_id, _post_text(content, tags))
+        else:
+            self.posts.remove(post_id)
+
+    def _apply_user(self, user_id, username, bio, visible):
+        if visible:
+            self.users.add(user_id, _user_text(username, bio))
+        else:
+            self.users.remove(user_id)
+
+    def search_posts(self, text, limit=1000):
+        """Best matching visible posts as (post_id, score)"""
+        self.ensure_ready()
+        return self.posts.search(text, limit)
+
+    def search_users(self, text, limit=1000):
+        """Best matching users as (user_id, score)"""
+        self.ensure_ready()
+        return self.users.search(text, limit)
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'ready': self._ready,
+            'posts': len(self.posts),
+            'users': len(self.users),
+            'watermark': self._watermark.isoformat() if self._watermark else None,
+            **self.stats,
+        }
+
+    def register_events(self):
+        """Apply committed post/user writes of this worker to the index"""
+        if not event.contains(Session, 'after_flush', _collect_index_changes):
+            event.listen(Session, 'after_flush', _collect_index_changes)
+            event.listen(Session, 'after_commit', _apply_index_changes)
+            event.listen(Session, 'after_rollback', _discard_index_changes)
+
+
+def _collect_index_changes(session, flush_context):
+    """Capture indexed fields at flush time (objects are expired after commit)"""
+    if not search_index._ready:
+        return
+    pending = session.info.setdefault('search_index_changes', {'posts': {}, 'users': {}})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            visible = obj not in session.deleted and not obj.is_deleted and obj.moderation_status == 'approved'
+            pending['posts'][obj.id] = (obj.content, obj.tags, visible)
+        elif isinstance(obj, User):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            pending['users'][obj.id] = (obj.username, obj.bio, obj not in session.deleted and not obj.is_banned)
+
+
+def _apply_index_changes(session):
+    pending = session.info.pop('search_index_changes', None)
+    if not pending:
+        return
+    try:
+        for post_id, (content, tags, visible) in pending['posts'].items():
+            search_index._apply_post(post_id, content, tags, visible)
+        for user_id, (username, bio, visible) in pending['users'].items():
+            search_index._apply_user(user_id, username, bio, visible)
+        search_index._changed = True
+        search_index.stats['live_updates'] += len(pending['posts']) + len(pending['users'])
+    except Exception as e:
+        logger.warning(f"Search index update failed: {e}")
+
+
+def _discard_index_changes(session):
+    session.info.pop('search_index_changes', None)
+
+
+# Глобальный экземпляр
+search_index = SearchIndex()
@@ -5,6 +5,11 @@ from app import db
 from app.models.post import Post
 from app.models.user import User
 from app.models.follow import Follow
+from app.services.serializers import serialize_posts, serialize_users
+from app.services.trending_service import TrendingService
+from app.services.cache_manager import CacheManager, single_flight
+from app.services.search_backends import get_search_backend
+from app.services.recommendation_service import RecommendationService
 from sqlalchemy import or_, and_, func
 from datetime import datetime, timedelta
 
@@ -12,21 +17,58 @@ class SearchService:
     """Service for searching and discovering content"""
     
     @staticmethod
-    def search_posts(query_text, filters=None, page=1, per_page=20):
+    def normalize_query(query_text):
+        """Lowercase and collapse whitespace, so equivalent queries share cache entries"""
+        return ' '.join((query_text or '').lower().split())
+    
+    @staticmethod
+    def search_posts(query_text, filters=None, page=1, per_page=20, lang=None):
         """
         Search for posts by text
         
+        Result pages are cached as post IDs (see CacheManager.search_key)
+        and hydrated from the post and author caches.
+        
         Args:
             query_text: Search query
             filters: Dict with filter options (emotion, sort_by, date_range, etc.)
             page: Page number
             per_page: Items per page
+            lang: Language of the query (picks the full-text configuration)
             
         Returns:
-            List of Post objects
+            Dict with serialized posts (with a highlighted 'snippet' when
+            searching by text) and pagination
         """
+        query_text = SearchService.normalize_query(query_text)
         filters = filters or {}
         
+        cache_key = CacheManager.search_key(query_text, filters, page, per_page, lang)
+        result = CacheManager.cache_search(cache_key)
+        if result is None:
+            result = SearchService._search_post_ids(query_text, filters, page, per_page, lang)
+            CacheManager.set_search(cache_key, result)
+        
+        items = CacheManager.get_posts(result['ids'])
+        if query_text:
+            for item in items:
+                item['snippet'] = result['snippets'].get(item['id'])
+        
+        return {
+            'items': items,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': result['total'],
+                'pages': result['pages'],
+            }
+        }
+    
+    @staticmethod
+    def _search_post_ids(query_text, filters, page, per_page, lang):
+        """Run a post search; returns the page's post IDs, snippets and totals"""
+        backend = get_search_backend()
+        
         # Base query - only approved, non-deleted posts
         query = Post.query.filter_by(
             is_deleted=False,
@@ -35,14 +77,7 @@ class SearchService:
         
         # Text search
         if query_text:
-            search_term = f"%{query_text}%"
-            query = query.filter(
-                or_(
-                    Post.title.ilike(search_term),
-                    Post.text.ilike(search_term),
-                    Post.description.ilike(search_term)
-                )
-            )
+            query = backend.filter(query, query_text, lang)
         
         # Filter by emotion (theme)
         if filters.get('emotion'):
@@ -76,10 +111,10 @@ class SearchService:
                 Post.comments_count.desc()
             )
         elif sort_by == 'relevant':
-            # For text search - posts with title match rank higher
+            # For text search - best matches first
             if query_text:
                 query = query.order_by(
-                    Post.title.ilike(f"{query_text}%").desc(),
+                    backend.rank(query_text, lang).desc(),
                     Post.created_at.desc()
                 )
             else:
@@ -89,14 +124,12 @@ class SearchService:
         
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
+        snippets = backend.snippets(pagination.items, query_text, lang) if query_text else {}
         return {
-            'items': [p.to_dict() for p in pagination.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-            }
+            'ids': [post.id for post in pagination.items],
+            'snippets': snippets,
+            'total': pagination.total,
+            'pages': pagination.pages,
         }
     
     @staticmethod
@@ -112,18 +145,18 @@ class SearchService:
         Returns:
             List of users
         """
-        search_term = f"%{query_text}%"
-        query = User.query.filter(
-            or_(
-                User.username.ilike(search_term),
-                User.bio.ilike(search_term)
-            )
-        ).filter_by(is_banned=False).order_by(User.created_at.desc())
+        backend = get_search_backend()
+        query = backend.filter_users(User.query, query_text).filter_by(is_banned=False)
+        rank = backend.user_rank(query_text)
+        if rank is not None:
+            query = query.order_by(rank.desc(), User.created_at.desc())
+        else:
+            query = query.order_by(User.created_at.desc())
         
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         return {
-            'items': [u.to_dict() for u in pagination.items],
+            'items': serialize_users(pagination.items),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -133,6 +166,8 @@ class SearchService:
         }
     
     @staticmethod
+    @single_flight(CacheManager.trending_key, timeout=CacheManager.CACHE_1MIN,
+                   stale_timeout=CacheManager.CACHE_5MIN, namespace='trending')
     def get_trending_posts(emotion=None, days=7, limit=20):
         """
         Get trending posts based on engagement
@@ -145,6 +180,11 @@ class SearchService:
         Returns:
             List of trending posts
         """
+        # Precomputed decayed scores in Redis; None means use the SQL query
+        posts = TrendingService.get_trending(emotion, days, limit)
+        if posts is not None:
+            return serialize_posts(posts)
+        
         start_date = datetime.utcnow() - timedelta(days=days)
         
         query = Post.query.filter(
@@ -161,12 +201,16 @@ class SearchService:
             (Post.likes_count + Post.comments_count * 2).desc()
         ).limit(limit)
         
-        return [p.to_dict() for p in query.all()]
+        return serialize_posts(query.all())
     
     @staticmethod
     def get_recommended_posts(user_id, limit=20):
         """
-        Get recommended posts for a user based on their activity
+        Get recommended posts for a user
+        
+        Collaborative-filtering recommendations computed offline, mixed with
+        fresh posts of followed authors (see RecommendationService) and
+        topped up with trending posts for new users.
         
         Args:
             user_id: User ID
@@ -179,22 +223,18 @@ class SearchService:
         if not user:
             return []
         
-        # Get users they follow
-        following = db.session.query(Follow.following_id).filter_by(
-            follower_id=user_id
-        ).subquery()
-        
-        # Get posts from following and similar emotion preferences
-        query = Post.query.filter(
-            Post.is_deleted == False,
-            Post.moderation_status == 'approved'
-        ).filter(
-            or_(
-                Post.user_id.in_(db.session.query(following)),
-                Post.theme == getattr(user, 'activity_status', '')
-            )
-        ).order_by(
-            Post.created_at.desc()
-        ).limit(limit)
-        
-        return [p.to_dict() for p in query.all()]
+        posts = [
+            post for post in CacheManager.get_posts(RecommendationService.get_recommended_ids(user_id, limit))
+            if post['moderation_status'] == 'approved'
+        ]
+        
+        if len(posts) < limit:
+            included = {post['id'] for post in posts}
+            for post in SearchService.get_trending_posts(limit=limit):
+                if len(posts) >= limit:
+                    break
+                author = post.get('author') or {}
+                if post['id'] not in included and author.get('id') != user_id:
+                    posts.append(post)
+        
+        return posts
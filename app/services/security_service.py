@@ -165,23 +165,14 @@ class ContentModerationHelper:
     
     @staticmethod
     def detect_duplicate_content(user_id, content_hash, time_window_minutes=60):
-        """Detect if user is posting duplicate content"""
-        from app.models.post import Post
-        
-        cutoff_time = datetime.utcnow() - timedelta(minutes=time_window_minutes)
-        
-        # For now, check for exact text matches (simple approach)
-        # Could use fuzzy matching for more sophisticated detection
-        recent_posts = Post.query.filter(
-            Post.user_id == user_id,
-            Post.created_at >= cutoff_time
-        ).all()
-        
-        for post in recent_posts:
-            if hashlib.md5(post.text.encode()).hexdigest() == content_hash:
-                return True
+        """
+        Detect if user is posting duplicate content
+        content_hash is app.utils.content_hash.content_hash() of the text;
+        looked up in the same recent-hash index as the spam detector's duplicate check
+        """
+        from app.services.spam_detector import SpamDetector
         
-        return False
+        return SpamDetector.has_recent_hash(user_id, content_hash, time_window_minutes)
     
     @staticmethod
     def calculate_content_score(title, text):
@@ -0,0 +1,59 @@
+"""
+Bulk serialization helpers for listing endpoints
+
+Model to_dict() methods lazily load the author and the author's badges,
+which costs two extra queries per item on a page. These helpers collect
+the related IDs for the whole page and load them in one query each,
+producing exactly the same JSON shape.
+"""
+from sqlalchemy.orm import joinedload
+from app.models.user import User
+from app.models.badge import UserBadge
+
+
+def load_user_badges(user_ids) -> dict:
+    """Load badges for many users at once, grouped by user ID"""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+
+    user_badges = UserBadge.query.options(
+        joinedload(UserBadge.badge)
+    ).filter(UserBadge.user_id.in_(user_ids)).all()
+
+    grouped = {}
+    for user_badge in user_badges:
+        grouped.setdefault(user_badge.user_id, []).append(user_badge)
+    return grouped
+
+
+def serialize_users(users, include_email=False) -> list:
+    """Serialize users with a single badge query for the whole list"""
+    badges = load_user_badges(user.id for user in users)
+    return [
+        user.to_dict(include_email=include_email, badges=badges.get(user.id, []))
+        for user in users
+    ]
+
+
+def load_authors(user_ids) -> dict:
+    """Load and serialize authors by ID (one query for users, one for badges)"""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+
+    users = User.query.filter(User.id.in_(user_ids)).all()
+    return {data['id']: data for data in serialize_users(users)}
+
+
+def serialize_posts(posts) -> list:
+    """Serialize posts exactly like Post.to_dict(), batching author lookups"""
+    authors = load_authors(post.user_id for post in posts if not post.is_anonymous)
+
+    result = []
+    for post in posts:
+        data = post.to_dict(include_author=False)
+        if not post.is_anonymous:
+            data['author'] = authors.get(post.user_id)
+        result.append(data)
+    return result
@@ -1,13 +1,24 @@
 """
 Spam prevention and detection service
 """
+import logging
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import event, inspect, select, union_all
+from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
 from app import db
 from app.models.post import Post
 from app.models.comment import Comment
 from app.models.user import User
 from app.models.ip_ban import IPBan
+from app.services.near_duplicate_index import near_duplicate_index
+from app.utils.content_hash import content_hash, normalize_content
+from app.utils.pattern_matcher import PatternMatcher
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
 
 # List of common spam keywords/phrases
 SPAM_KEYWORDS = {
@@ -30,6 +41,12 @@ SPAM_KEYWORDS = {
     'быстрые деньги', 'легкие деньги', 'без вложений',
 }
 
+# All keywords as whole words, matched in one scan of the lowercased text
+# (each keyword is its own category)
+KEYWORD_MATCHER = PatternMatcher(
+    (keyword, r'\b' + re.escape(keyword) + r'\b') for keyword in sorted(SPAM_KEYWORDS)
+)
+
 # URL regex pattern
 URL_PATTERN = re.compile(
     r'https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&/=]*)',
@@ -42,14 +59,47 @@ SHORT_LINK_PATTERN = re.compile(
     re.IGNORECASE
 )
 
+# Merges content hashes into a user's recent hashes: keeps the newest time per
+# hash and the oldest "complete since" sentinel, and never shortens the TTL.
+# Used by both the after-commit hook and the load from the database, so neither
+# can drop what the other wrote in between.
+# KEYS: set; ARGV: ttl, sentinel, since (or ''), then score, hash pairs
+MERGE_HASHES_SCRIPT = """
+local key = KEYS[1]
+for i = 4, #ARGV, 2 do
+    local current = redis.call('ZSCORE', key, ARGV[i + 1])
+    if not current or tonumber(current) < tonumber(ARGV[i]) then
+        redis.call('ZADD', key, ARGV[i], ARGV[i + 1])
+    end
+end
+if ARGV[3] ~= '' then
+    local since = redis.call('ZSCORE', key, ARGV[2])
+    if not since or tonumber(since) > tonumber(ARGV[3]) then
+        redis.call('ZADD', key, ARGV[3], ARGV[2])
+    end
+end
+if redis.call('TTL', key) < tonumber(ARGV[1]) then
+    redis.call('EXPIRE', key, ARGV[1])
+end
+return 1
+"""
+
 
 class SpamDetector:
     """Spam detection and prevention utility class"""
     
+    # Redis sorted set per user: content hash -> creation time. The sentinel's
+    # score is the time since which the set holds all of the user's texts; a
+    # set without it (only hashes added after commit) is completed from the
+    # database on the next check. The set expires one check window after the
+    # last write.
+    RECENT_HASHES_PREFIX = 'recent_hashes:'
+    SENTINEL = '__since__'
+    
     @staticmethod
     def normalize_text(text: str) -> str:
         """Normalize text for comparison"""
-        return text.strip().lower()
+        return normalize_content(text)
     
     @staticmethod
     def check_duplicate_content(user_id: str, content: str, minutes: int = 5) -> bool:
@@ -62,34 +112,85 @@ class SpamDetector:
         Returns:
             True if duplicate found, False otherwise
         """
-        normalized_content = SpamDetector.normalize_text(content)
+        return SpamDetector.has_recent_hash(user_id, content_hash(content), minutes)
+    
+    @staticmethod
+    def _recent_hashes_key(user_id):
+        return f"{SpamDetector.RECENT_HASHES_PREFIX}{user_id}"
+    
+    @staticmethod
+    def _score(created_at):
+        return created_at.replace(tzinfo=timezone.utc).timestamp()
+    
+    @staticmethod
+    def has_recent_hash(user_id: str, digest: str, minutes: int = 5) -> bool:
+        """
+        Check if user has a post or comment with this content hash created
+        in the last N minutes (deleted ones don't count)
+        Args:
+            user_id: User ID
+            digest: content_hash() of the text
+            minutes: Time window to check
+        Returns:
+            True if such a post or comment exists
+        """
         time_threshold = datetime.utcnow() - timedelta(minutes=minutes)
+        key = SpamDetector._recent_hashes_key(user_id)
+        r = get_redis()
+        since = None
         
-        # Check recent posts
-        recent_posts = Post.query.filter_by(
-            user_id=user_id,
-            is_deleted=False
-        ).filter(
-            Post.created_at >= time_threshold
-        ).all()
-        
-        for post in recent_posts:
-            if SpamDetector.normalize_text(post.content) == normalized_content:
-                return True
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                pipe.zscore(key, SpamDetector.SENTINEL)
+                pipe.zscore(key, digest)
+                since, created = pipe.execute()
+                if since is not None and since <= SpamDetector._score(time_threshold):
+                    return created is not None and created >= SpamDetector._score(time_threshold)
+            except RedisError as e:
+                logger.warning(f"Recent content hashes unavailable: {e}")
+                r = None
         
-        # Check recent comments
-        recent_comments = Comment.query.filter_by(
-            user_id=user_id,
-            is_deleted=False
-        ).filter(
-            Comment.created_at >= time_threshold
-        ).all()
+        # Recent hashes of the user from the (user_id, content_hash, created_at) indexes
+        recent = union_all(*(
+            select(model.content_hash, model.created_at).where(
+                model.user_id == user_id,
+                model.created_at >= time_threshold,
+                model.is_deleted == False
+            ) for model in (Post, Comment)
+        ))
+        rows = db.session.execute(recent).all()
         
-        for comment in recent_comments:
-            if SpamDetector.normalize_text(comment.content) == normalized_content:
-                return True
+        if r is not None:
+            # Merged into what is there: hashes committed since the SELECT stay
+            try:
+                scores = {}
+                for row_hash, created_at in rows:
+                    if row_hash:
+                        scores[row_hash] = max(scores.get(row_hash, 0), SpamDetector._score(created_at))
+                SpamDetector._merge_hashes(r, user_id, scores, minutes * 60, since=SpamDetector._score(time_threshold))
+            except RedisError as e:
+                logger.warning(f"Could not store recent content hashes: {e}")
         
-        return False
+        return any(row_hash == digest for row_hash, _ in rows)
+    
+    @staticmethod
+    def _merge_hashes(r, user_id, scores, ttl, since=None, client=None):
+        """Add {hash: created timestamp} to a user's recent hashes (MERGE_HASHES_SCRIPT)"""
+        args = [ttl, SpamDetector.SENTINEL, '' if since is None else since]
+        for digest, score in scores.items():
+            args += [score, digest]
+        r.register_script(MERGE_HASHES_SCRIPT)(
+            keys=[SpamDetector._recent_hashes_key(user_id)], args=args, client=client or r
+        )
+    
+    @staticmethod
+    def register_events():
+        """Keep the users' recent content hashes in Redis up to date with committed writes"""
+        if not event.contains(Session, 'after_flush', _collect_content_hashes):
+            event.listen(Session, 'after_flush', _collect_content_hashes)
+            event.listen(Session, 'after_commit', _apply_content_hashes)
+            event.listen(Session, 'after_rollback', _discard_content_hashes)
     
     @staticmethod
     def check_spam_keywords(content: str) -> list:
@@ -100,16 +201,7 @@ class SpamDetector:
         Returns:
             List of spam keywords found, empty list if none
         """
-        text_lower = content.lower()
-        found_keywords = []
-        
-        for keyword in SPAM_KEYWORDS:
-            # Use word boundaries for whole word matching
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, text_lower):
-                found_keywords.append(keyword)
-        
-        return found_keywords
+        return [hit.category for hit in KEYWORD_MATCHER.search(content.lower())]
     
     @staticmethod
     def count_urls(content: str) -> dict:
@@ -184,6 +276,16 @@ class SpamDetector:
             score += 3
             reasons.append("Short content with URLs (link spam)")
         
+        # Check near-duplicates posted by other accounts (3 points, 7 for a spam wave)
+        near_duplicates = near_duplicate_index.find(content)
+        other_accounts = {match['user_id'] for match in near_duplicates} - {user_id}
+        if other_accounts:
+            if len(other_accounts) >= current_app.config.get('NEAR_DUPLICATE_WAVE_ACCOUNTS', 3):
+                score += 7
+            else:
+                score += 3
+            reasons.append(f"Near-duplicate of recent posts by {len(other_accounts)} other account(s)")
+        
         # Determine spam level
         if score < 3:
             level = 'safe'
@@ -199,6 +301,48 @@ class SpamDetector:
         }
 
 
+def _collect_content_hashes(session, flush_context):
+    """Remember new texts, and users whose older texts changed, until commit"""
+    pending = session.info.setdefault('content_hashes', {'new': [], 'stale_users': set()})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, (Post, Comment)):
+            continue
+        if obj in session.new:
+            if not obj.is_deleted:
+                pending['new'].append((obj.user_id, obj.content_hash, obj.created_at or datetime.utcnow()))
+        elif obj in session.deleted:
+            pending['stale_users'].add(obj.user_id)
+        else:
+            state = inspect(obj)
+            if state.attrs.content.history.has_changes() or state.attrs.is_deleted.history.has_changes():
+                # Simpler to reload the user's set than to patch it
+                pending['stale_users'].add(obj.user_id)
+
+
+def _apply_content_hashes(session):
+    pending = session.info.pop('content_hashes', None)
+    if not pending or not (pending['new'] or pending['stale_users']):
+        return
+    r = get_redis()
+    if r is None:
+        return
+    ttl = current_app.config.get('DUPLICATE_CHECK_MINUTES', 5) * 60
+    try:
+        pipe = r.pipeline(transaction=False)
+        for user_id, digest, created_at in pending['new']:
+            if digest and user_id not in pending['stale_users']:
+                SpamDetector._merge_hashes(r, user_id, {digest: SpamDetector._score(created_at)}, ttl, client=pipe)
+        for user_id in pending['stale_users']:
+            pipe.delete(SpamDetector._recent_hashes_key(user_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not update recent content hashes: {e}")
+
+
+def _discard_content_hashes(session):
+    session.info.pop('content_hashes', None)
+
+
 class IPSpamTracker:
     """Track spam patterns from IP addresses"""
     
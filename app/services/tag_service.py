@@ -0,0 +1,278 @@
+"""
+Normalized tags for posts and gallery items
+
+The JSON `tags` columns stay the source the API writes to; on every flush
+the post_tags / gallery_tags join tables are synced from them and the
+per-tag counters are adjusted inside the same transaction. Counters are
+changed with `count = count + delta` (never recounted from a snapshot), so
+concurrent writers cannot lose each other's updates. A periodic full
+recount repairs drift from writes that bypass the ORM.
+"""
+import json
+import logging
+from sqlalchemy import bindparam, case, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.post import Post
+from app.models.gallery import Gallery
+from app.models.tag import Tag, post_tags, gallery_tags
+from app.services.like_service import UPSERT_DIALECTS
+
+logger = logging.getLogger(__name__)
+
+
+class TagService:
+    """Tag normalization, join table sync and usage counters"""
+
+    # Maximum number of tags kept per post/gallery item
+    MAX_TAGS = 20
+
+    @staticmethod
+    def normalize(tags):
+        """Clean a list of tag names: strip, drop '#' and empties, dedupe (order kept)"""
+        names = []
+        for tag in tags or []:
+            if not isinstance(tag, str):
+                continue
+            name = tag.strip().lstrip('#').strip()[:Tag.MAX_LENGTH]
+            if name and name not in names:
+                names.append(name)
+        return names[:TagService.MAX_TAGS]
+
+    @staticmethod
+    def parse(tags):
+        """List stored in a JSON tags column ([] for empty or malformed values)"""
+        if not tags:
+            return []
+        try:
+            value = json.loads(tags) if isinstance(tags, str) else tags
+        except (TypeError, ValueError):
+            return []
+        return value if isinstance(value, list) else []
+
+    @staticmethod
+    def _tag_ids(connection, names):
+        """Map tag names to ids, creating missing tags"""
+        if not names:
+            return {}
+        table = Tag.__table__
+        ids = dict(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+        missing = [name for name in names if name not in ids]
+        if missing:
+            dialect_insert = UPSERT_DIALECTS.get(connection.dialect.name)
+            for name in missing:
+                # A concurrent writer may create the same tag
+                if dialect_insert is not None:
+                    connection.execute(dialect_insert(table).values(name=name).on_conflict_do_nothing())
+                else:
+                    connection.execute(insert(table).values(name=name))
+            ids.update(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(missing))).all())
+        return ids
+
+    @staticmethod
+    def _sync(connection, join_table, key_column, item_id, names, visible_before, visible_after, counter):
+        """
+        Make the join rows of one item match `names` (None keeps the current tags)
+        and move the tag counters from the old state to the new one.
+        """
+        key = join_table.c[key_column]
+        before = set(connection.execute(select(join_table.c.tag_id).where(key == item_id)).scalars())
+        after = before if names is None else set(TagService._tag_ids(connection, names).values())
+
+        removed = before - after
+        added = after - before
+        if removed:
+            connection.execute(join_table.delete().where(key == item_id, join_table.c.tag_id.in_(removed)))
+        if added:
+            connection.execute(insert(join_table), [{key_column: item_id, 'tag_id': tag_id} for tag_id in added])
+
+        deltas = {}
+        for tag_id in (before if visible_before else ()):
+            deltas[tag_id] = deltas.get(tag_id, 0) - 1
+        for tag_id in (after if visible_after else ()):
+            deltas[tag_id] = deltas.get(tag_id, 0) + 1
+        TagService._adjust(connection, counter, deltas)
+
+    @staticmethod
+    def _adjust(connection, counter, deltas):
+        deltas = {tag_id: delta for tag_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = Tag.__table__
+        column = table.c[counter]
+        new_value = column + bindparam('delta')
+        statement = table.update().where(table.c.id == bindparam('tag_id')).values(
+            {counter: case((new_value > 0, new_value), else_=0)}
+        )
+        connection.execute(statement, [{'tag_id': tag_id, 'delta': delta} for tag_id, delta in deltas.items()])
+
+    @staticmethod
+    def recount():
+        """
+        Recompute every tag counter from the join tables.
+
+        Returns:
+            Number of tags whose counters changed
+        """
+        table = Tag.__table__
+        posts_count = select(func.count()).select_from(
+            post_tags.join(Post.__table__, Post.__table__.c.id == post_tags.c.post_id)
+        ).where(
+            post_tags.c.tag_id == table.c.id,
+            Post.__table__.c.is_deleted == False,
+            Post.__table__.c.moderation_status == 'approved'
+        ).scalar_subquery()
+        gallery_count = select(func.count()).select_from(gallery_tags).where(
+            gallery_tags.c.tag_id == table.c.id
+        ).scalar_subquery()
+
+        result = db.session.execute(
+            table.update()
+            .where(or_(table.c.posts_count != posts_count, table.c.gallery_count != gallery_count))
+            .values(posts_count=posts_count, gallery_count=gallery_count)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.info(f"Tag counters recounted: {result.rowcount} tags corrected")
+        return result.rowcount
+
+    @staticmethod
+    def backfill(batch_size=500):
+        """
+        Fill the join tables from the JSON tag columns of all posts and gallery items.
+
+        Returns:
+            Dict with the number of processed posts and gallery items
+        """
+        result = {}
+        for model, join_table, key_column, counter in (
+            (Post, post_tags, 'post_id', 'posts_count'),
+            (Gallery, gallery_tags, 'gallery_id', 'gallery_count'),
+        ):
+            processed = 0
+            last_id = None
+            while True:
+                query = db.session.query(model.id, model.tags).filter(model.tags.isnot(None))
+                if last_id is not None:
+                    query = query.filter(model.id > last_id)
+                rows = query.order_by(model.id).limit(batch_size).all()
+                if not rows:
+                    break
+                connection = db.session.connection()
+                for item_id, tags in rows:
+                    # Counters are rebuilt by recount() below
+                    TagService._sync(connection, join_table, key_column, item_id,
+                                     TagService.normalize(TagService.parse(tags)), False, False, counter)
+                db.session.commit()
+                processed += len(rows)
+                last_id = rows[-1][0]
+            result[model.__tablename__] = processed
+
+        TagService.recount()
+        return result
+
+    @staticmethod
+    def get_tags(sort='popular', limit=100, prefix=None, source=None):
+        """
+        Tags with their usage counts (reads the precomputed counters only).
+
+        Args:
+            sort: 'popular' (most used first) or 'name'
+            limit: Maximum number of tags
+            prefix: Only tags starting with this text
+            source: 'posts' or 'gallery' to count only one kind of usage
+        """
+        if source == 'posts':
+            usage = Tag.posts_count
+        elif source == 'gallery':
+            usage = Tag.gallery_count
+        else:
+            usage = Tag.posts_count + Tag.gallery_count
+
+        query = Tag.query.filter(usage > 0)
+        if prefix:
+            escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(Tag.name.like(f'{escaped}%', escape='\\'))
+        if sort == 'name':
+            query = query.order_by(Tag.name)
+        else:
+            query = query.order_by(usage.desc(), Tag.name)
+        return query.limit(limit).all()
+
+    @staticmethod
+    def register_events():
+        """Keep the join tables and counters in sync with ORM writes to tags"""
+        if not event.contains(Session, 'after_flush', _sync_new_tags):
+            event.listen(Session, 'before_flush', _sync_changed_tags)
+            event.listen(Session, 'after_flush', _sync_new_tags)
+
+
+def _post_visible(is_deleted, moderation_status):
+    return not is_deleted and moderation_status == 'approved'
+
+
+def _changed(obj, *attributes):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _sync_changed_tags(session, flush_context, instances):
+    """
+    Sync updated and deleted posts/gallery items before the flush.
+
+    The previous visibility of a post is read from its row, which still holds
+    the old values here (attribute history is empty for expired objects), and
+    deleted items lose their tags before ON DELETE CASCADE could drop them unseen.
+    """
+    posts = [
+        obj for obj in session.dirty
+        if isinstance(obj, Post) and _changed(obj, 'tags', 'is_deleted', 'moderation_status')
+    ]
+    posts += [obj for obj in session.deleted if isinstance(obj, Post)]
+    items = [obj for obj in session.dirty if isinstance(obj, Gallery) and _changed(obj, 'tags')]
+    items += [obj for obj in session.deleted if isinstance(obj, Gallery)]
+    if not posts and not items:
+        return
+
+    connection = session.connection()
+    if posts:
+        table = Post.__table__
+        stored = {
+            row.id: _post_visible(row.is_deleted, row.moderation_status)
+            for row in connection.execute(
+                select(table.c.id, table.c.is_deleted, table.c.moderation_status)
+                .where(table.c.id.in_([post.id for post in posts]))
+            )
+        }
+    for post in posts:
+        if post in session.deleted:
+            names, visible_after = [], False
+        else:
+            names = TagService.normalize(TagService.parse(post.tags)) if _changed(post, 'tags') else None
+            visible_after = _post_visible(post.is_deleted, post.moderation_status)
+        visible_before = stored.get(post.id, False)
+        if names is not None or visible_before != visible_after:
+            TagService._sync(connection, post_tags, 'post_id', post.id, names,
+                             visible_before, visible_after, 'posts_count')
+
+    for item in items:
+        names = [] if item in session.deleted else TagService.normalize(TagService.parse(item.tags))
+        TagService._sync(connection, gallery_tags, 'gallery_id', item.id, names,
+                         True, item not in session.deleted, 'gallery_count')
+
+
+def _sync_new_tags(session, flush_context):
+    """Add tags of inserted posts/gallery items (their rows exist only after the flush)"""
+    new = [obj for obj in session.new if isinstance(obj, (Post, Gallery))]
+    if not new:
+        return
+
+    connection = session.connection()
+    for obj in new:
+        names = TagService.normalize(TagService.parse(obj.tags))
+        if isinstance(obj, Post):
+            TagService._sync(connection, post_tags, 'post_id', obj.id, names,
+                             False, _post_visible(obj.is_deleted, obj.moderation_status), 'posts_count')
+        elif names:
+            TagService._sync(connection, gallery_tags, 'gallery_id', obj.id, names, False, True, 'gallery_count')
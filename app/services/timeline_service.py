@@ -0,0 +1,228 @@
+"""
+Home timeline service (filter=following)
+
+Each user's timeline is a Redis sorted set of post IDs scored by creation
+time. New approved posts are pushed into the timelines of the author's
+followers (fan-out-on-write). Authors with more followers than
+TIMELINE_FANOUT_MAX_FOLLOWERS are only recorded in a "heavy authors" set,
+and their posts are merged in at read time (fan-out-on-read).
+
+Timelines are built lazily on first read and trimmed to
+TIMELINE_MAX_LENGTH. Every method degrades to a no-op (or returns None
+from reads) when Redis is unavailable, so callers can fall back to SQL.
+"""
+import logging
+from datetime import timezone
+from flask import current_app
+from sqlalchemy import func, tuple_
+from redis.exceptions import RedisError
+from app import db
+from app.models.post import Post
+from app.models.follow import Follow
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Adds a post to every listed timeline that has already been built and trims it.
+# Rank 0 is the "built" sentinel, so trimming starts at rank 1.
+FAN_OUT_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', key, ARGV[1], ARGV[2])
+        redis.call('ZREMRANGEBYRANK', key, 1, -(tonumber(ARGV[3]) + 1))
+    end
+end
+return 1
+"""
+
+
+class TimelineService:
+    """Materialized per-user home timelines in Redis"""
+
+    KEY_PREFIX = 'timeline:'
+    HEAVY_AUTHORS_KEY = 'timeline:heavy_authors'
+    # Member with score 0 marking a built timeline (an empty timeline is still built)
+    SENTINEL = '__built__'
+    FAN_OUT_BATCH = 500
+    # Extra IDs read to make up for deleted/unapproved posts and equal timestamps
+    READ_SLACK = 20
+
+    @staticmethod
+    def _redis():
+        if not current_app.config.get('TIMELINE_ENABLED', True):
+            return None
+        return get_redis()
+
+    @staticmethod
+    def _key(user_id):
+        return f"{TimelineService.KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def _score(created_at):
+        return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def fan_out(post):
+        """Push an approved post into the timelines of its author and followers"""
+        r = TimelineService._redis()
+        if r is None or post.is_deleted or post.moderation_status != 'approved':
+            return
+
+        follower_ids = [row[0] for row in db.session.query(Follow.follower_id).filter_by(
+            following_id=post.user_id
+        ).all()]
+
+        keys = [TimelineService._key(post.user_id)]
+        max_length = current_app.config.get('TIMELINE_MAX_LENGTH', 800)
+
+        try:
+            if len(follower_ids) > current_app.config.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000):
+                # Too many followers to write to: readers pull these posts themselves
+                r.sadd(TimelineService.HEAVY_AUTHORS_KEY, post.user_id)
+            else:
+                keys.extend(TimelineService._key(follower_id) for follower_id in follower_ids)
+
+            script = r.register_script(FAN_OUT_SCRIPT)
+            score = TimelineService._score(post.created_at)
+            pipe = r.pipeline(transaction=False)
+            for i in range(0, len(keys), TimelineService.FAN_OUT_BATCH):
+                script(keys=keys[i:i + TimelineService.FAN_OUT_BATCH], args=[score, post.id, max_length], client=pipe)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Timeline fan-out failed for post {post.id}: {e}")
+
+    @staticmethod
+    def invalidate(user_id):
+        """Drop a user's timeline so it is rebuilt on next read (e.g. after follow/unfollow)"""
+        r = TimelineService._redis()
+        if r is None:
+            return
+        try:
+            r.delete(TimelineService._key(user_id))
+        except RedisError as e:
+            logger.warning(f"Timeline invalidation failed for user {user_id}: {e}")
+
+    @staticmethod
+    def rebuild(user_id):
+        """Rebuild a user's timeline from the database"""
+        r = TimelineService._redis()
+        if r is None:
+            return False
+
+        max_length = current_app.config.get('TIMELINE_MAX_LENGTH', 800)
+        following = db.session.query(Follow.following_id).filter_by(follower_id=user_id)
+        rows = db.session.query(Post.id, Post.created_at).filter(
+            Post.is_deleted == False,
+            Post.moderation_status == 'approved',
+            (Post.user_id.in_(following)) | (Post.user_id == user_id)
+        ).order_by(Post.created_at.desc()).limit(max_length).all()
+
+        key = TimelineService._key(user_id)
+        mapping = {post_id: TimelineService._score(created_at) for post_id, created_at in rows}
+        mapping[TimelineService.SENTINEL] = 0
+
+        try:
+            pipe = r.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.zadd(key, mapping)
+            pipe.expire(key, current_app.config.get('TIMELINE_TTL', 7 * 24 * 3600))
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Timeline rebuild failed for user {user_id}: {e}")
+            return False
+        return True
+
+    @staticmethod
+    def refresh_heavy_authors():
+        """Recompute the set of authors served by fan-out-on-read"""
+        r = TimelineService._redis()
+        if r is None:
+            return 0
+
+        threshold = current_app.config.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+        heavy_ids = [row[0] for row in db.session.query(Follow.following_id).group_by(
+            Follow.following_id
+        ).having(func.count(Follow.id) > threshold).all()]
+
+        try:
+            pipe = r.pipeline(transaction=True)
+            pipe.delete(TimelineService.HEAVY_AUTHORS_KEY)
+            if heavy_ids:
+                pipe.sadd(TimelineService.HEAVY_AUTHORS_KEY, *heavy_ids)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Heavy author refresh failed: {e}")
+        return len(heavy_ids)
+
+    @staticmethod
+    def size(user_id):
+        """Number of materialized posts in a user's timeline (None without Redis)"""
+        r = TimelineService._redis()
+        if r is None:
+            return None
+        try:
+            return max(r.zcard(TimelineService._key(user_id)) - 1, 0)
+        except RedisError:
+            return None
+
+    @staticmethod
+    def get_feed(user_id, limit, before=None, offset=0):
+        """
+        Read a page of the user's home timeline.
+
+        Args:
+            user_id: Timeline owner
+            limit: Max posts to return
+            before: (created_at, id) sort key of the last post on the previous page
+            offset: Posts to skip (page-based clients)
+
+        Returns:
+            List of approved, non-deleted Post objects, newest first, or None
+            when the timeline cannot serve the request (caller falls back to SQL)
+        """
+        r = TimelineService._redis()
+        if r is None:
+            return None
+
+        key = TimelineService._key(user_id)
+        window = offset + limit
+        max_score = TimelineService._score(before[0]) if before else '+inf'
+        max_length = current_app.config.get('TIMELINE_MAX_LENGTH', 800)
+
+        try:
+            if not r.exists(key) and not TimelineService.rebuild(user_id):
+                return None
+            wanted = window + TimelineService.READ_SLACK
+            post_ids = r.zrevrangebyscore(key, max_score, '(0', start=0, num=wanted)
+            if len(post_ids) < wanted and r.zcard(key) > max_length:
+                # Reading past the trimmed tail of the timeline
+                return None
+            heavy_authors = r.smembers(TimelineService.HEAVY_AUTHORS_KEY)
+            r.expire(key, current_app.config.get('TIMELINE_TTL', 7 * 24 * 3600))
+        except RedisError as e:
+            logger.warning(f"Timeline read failed for user {user_id}: {e}")
+            return None
+
+        visible = Post.query.filter(Post.is_deleted == False, Post.moderation_status == 'approved')
+
+        posts = {}
+        if post_ids:
+            for post in visible.filter(Post.id.in_(post_ids)).all():
+                posts[post.id] = post
+
+        if heavy_authors:
+            followed_heavy = [row[0] for row in db.session.query(Follow.following_id).filter(
+                Follow.follower_id == user_id,
+                Follow.following_id.in_(list(heavy_authors))
+            ).all()]
+            if followed_heavy:
+                heavy_query = visible.filter(Post.user_id.in_(followed_heavy))
+                if before:
+                    heavy_query = heavy_query.filter(tuple_(Post.created_at, Post.id) < tuple_(*before))
+                for post in heavy_query.order_by(Post.created_at.desc(), Post.id.desc()).limit(window).all():
+                    posts[post.id] = post
+
+        ordered = sorted(posts.values(), key=lambda p: (p.created_at, p.id), reverse=True)
+        if before:
+            ordered = [p for p in ordered if (p.created_at, p.id) < tuple(before)]
+        return ordered[offset:window]
@@ -0,0 +1,347 @@
+"""
+Incremental trending ("hot") scores for posts
+
+Every like, comment and repost adds weight * 2^((t - epoch) / half_life) to
+the post's score in Redis sorted sets (one global, one per theme). Because
+all scores grow by the same factor over time, ranking by the stored score is
+the same as ranking by an exponentially decayed score, and no score ever has
+to be recomputed. Reading trending posts is a top-K ZREVRANGE.
+
+The scores are seeded from the posts' counters by rebuild(), which alone sets
+trending:seeded. Until then events are not recorded; the first event or read
+triggers the rebuild, which already counts them.
+
+The epoch is moved forward (rescaling all scores) once it is older than a
+half-life to keep the numbers small, and posts older than TRENDING_WINDOW_DAYS
+are pruned. Reads and writes run this maintenance themselves, at most once per
+MAINTENANCE_INTERVAL across all workers, so it does not depend on the
+scheduler; the record script also rebases before the growth factor could
+overflow. Without Redis, trending falls back to the SQL engagement query.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from app import db
+from app.models.post import Post
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: epoch, all, theme (or ''), created, seeded, score sets...;
+# ARGV: post_id, weight, event_ts, half_life, created_ts, now, max_half_lives
+# Returns 0 without recording when the scores were never seeded from the database
+# (the rebuild then counts the event from the post's counters). Events from
+# before the seeding were counted at the post's creation time, so they are
+# undone at that time too.
+RECORD_SCRIPT = """
+local seeded = tonumber(redis.call('GET', KEYS[5]))
+if not seeded then
+    return 0
+end
+local event_ts = tonumber(ARGV[3])
+if event_ts < seeded then
+    event_ts = tonumber(ARGV[5])
+end
+local now = tonumber(ARGV[6])
+local half_life = tonumber(ARGV[4])
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[1], epoch)
+elseif (now - epoch) / half_life > tonumber(ARGV[7]) then
+    -- Maintenance has not run for too long: rebase here before 2^x overflows
+    local factor = math.pow(2, (epoch - now) / half_life)
+    for i = 6, #KEYS do
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('ZUNIONSTORE', KEYS[i], 1, KEYS[i], 'WEIGHTS', factor)
+        end
+    end
+    epoch = now
+    redis.call('SET', KEYS[1], epoch)
+end
+local delta = tonumber(ARGV[2]) * math.pow(2, (event_ts - epoch) / half_life)
+redis.call('ZINCRBY', KEYS[2], delta, ARGV[1])
+if KEYS[3] ~= '' then
+    redis.call('ZINCRBY', KEYS[3], delta, ARGV[1])
+end
+redis.call('ZADD', KEYS[4], 'NX', ARGV[5], ARGV[1])
+return 1
+"""
+
+# KEYS: epoch, score sets...; ARGV: new_epoch, half_life
+REBASE_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    return 0
+end
+local factor = math.pow(2, (epoch - tonumber(ARGV[1])) / tonumber(ARGV[2]))
+for i = 2, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('ZUNIONSTORE', KEYS[i], 1, KEYS[i], 'WEIGHTS', factor)
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class TrendingService:
+    """Time-decayed trending scores kept in Redis sorted sets"""
+
+    EPOCH_KEY = 'trending:epoch'
+    ALL_KEY = 'trending:all'
+    THEME_KEY_PREFIX = 'trending:theme:'
+    CREATED_KEY = 'trending:created'
+    # Set only by rebuild(): the scores include the database counters
+    SEEDED_KEY = 'trending:seeded'
+    REBUILD_LOCK_KEY = 'trending:rebuild'
+    REBUILD_LOCK_TTL = 60
+    THEMES = ('HP', 'AG', 'NT')
+
+    # Score added per event (same like/comment ratio as the old engagement sort)
+    EVENT_WEIGHTS = {
+        'like': 1,
+        'unlike': -1,
+        'comment': 2,
+        'uncomment': -2,
+        'repost': 2,
+    }
+    # Extra IDs read to make up for posts filtered out while hydrating
+    READ_SLACK = 10
+    # Pruning and rebasing from reads/writes: at most once per interval (seconds) across workers
+    MAINTENANCE_KEY = 'trending:maintenance'
+    MAINTENANCE_INTERVAL = 300
+    # The record script rebases by itself past this many half-lives (2^x stays far from overflow)
+    MAX_HALF_LIVES = 64
+    _next_maintenance = 0.0
+
+    @staticmethod
+    def _theme_key(theme):
+        return f"{TrendingService.THEME_KEY_PREFIX}{theme}"
+
+    @staticmethod
+    def _score_keys():
+        return [TrendingService.ALL_KEY] + [TrendingService._theme_key(theme) for theme in TrendingService.THEMES]
+
+    @staticmethod
+    def _timestamp(dt):
+        return dt.replace(tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def _half_life():
+        return current_app.config.get('TRENDING_HALF_LIFE_HOURS', 12) * 3600
+
+    @staticmethod
+    def _window():
+        return current_app.config.get('TRENDING_WINDOW_DAYS', 7) * 86400
+
+    @staticmethod
+    def record_event(post, event, event_time=None):
+        """
+        Add an engagement event ('like', 'unlike', 'comment', 'uncomment', 'repost') to a post's score.
+
+        Args:
+            event_time: When the like or comment was made (default now). An undo
+                must pass the time of the like/comment it undoes, so it removes
+                exactly the weight that was added
+        """
+        r = get_redis()
+        weight = TrendingService.EVENT_WEIGHTS.get(event)
+        if r is None or weight is None or post.is_deleted or post.moderation_status != 'approved':
+            return
+
+        now = time.time()
+        created_ts = TrendingService._timestamp(post.created_at)
+        if created_ts < now - TrendingService._window():
+            return
+
+        if event_time is not None:
+            event_ts = TrendingService._timestamp(event_time)
+        else:
+            # Unknown time of an undone event: the post's creation time never removes more than was added
+            event_ts = now if weight > 0 else created_ts
+        theme_key = TrendingService._theme_key(post.theme) if post.theme in TrendingService.THEMES else ''
+        try:
+            recorded = r.register_script(RECORD_SCRIPT)(
+                keys=[TrendingService.EPOCH_KEY, TrendingService.ALL_KEY, theme_key, TrendingService.CREATED_KEY,
+                      TrendingService.SEEDED_KEY] + TrendingService._score_keys(),
+                args=[post.id, weight, event_ts, TrendingService._half_life(), created_ts, now,
+                      TrendingService.MAX_HALF_LIVES]
+            )
+            if not recorded:
+                TrendingService.seed(r)
+        except RedisError as e:
+            logger.warning(f"Trending update failed for post {post.id}: {e}")
+        TrendingService.maintain(r)
+
+    @staticmethod
+    def remove(post_id):
+        """Drop a post from trending (deleted or rejected)"""
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            pipe = r.pipeline(transaction=False)
+            for key in TrendingService._score_keys() + [TrendingService.CREATED_KEY]:
+                pipe.zrem(key, post_id)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Trending removal failed for post {post_id}: {e}")
+
+    @staticmethod
+    def rebuild():
+        """
+        Seed scores from the current counters of posts inside the window.
+
+        Engagement that happened before the rebuild is treated as if it
+        happened when the post was created.
+        """
+        r = get_redis()
+        if r is None:
+            return 0
+
+        now = time.time()
+        half_life = TrendingService._half_life()
+        start_date = datetime.utcnow() - timedelta(seconds=TrendingService._window())
+        posts = db.session.query(
+            Post.id, Post.theme, Post.created_at, Post.likes_count, Post.comments_count, Post.reposts_count
+        ).filter(
+            Post.created_at >= start_date,
+            Post.is_deleted == False,
+            Post.moderation_status == 'approved'
+        ).all()
+
+        weights = TrendingService.EVENT_WEIGHTS
+        scores = {key: {} for key in TrendingService._score_keys()}
+        created = {}
+        for post_id, theme, created_at, likes, comments, reposts in posts:
+            created_ts = TrendingService._timestamp(created_at)
+            engagement = likes * weights['like'] + comments * weights['comment'] + reposts * weights['repost']
+            score = engagement * 2 ** ((created_ts - now) / half_life)
+            scores[TrendingService.ALL_KEY][post_id] = score
+            if theme in TrendingService.THEMES:
+                scores[TrendingService._theme_key(theme)][post_id] = score
+            created[post_id] = created_ts
+
+        try:
+            pipe = r.pipeline(transaction=True)
+            pipe.delete(TrendingService.EPOCH_KEY, TrendingService.CREATED_KEY, *scores.keys())
+            for key, mapping in scores.items():
+                if mapping:
+                    pipe.zadd(key, mapping)
+            if created:
+                pipe.zadd(TrendingService.CREATED_KEY, created)
+            pipe.set(TrendingService.EPOCH_KEY, now)
+            pipe.set(TrendingService.SEEDED_KEY, now)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Trending rebuild failed: {e}")
+            return 0
+        return len(posts)
+
+    @staticmethod
+    def seed(r):
+        """Rebuild the scores from the database unless another worker is already doing it"""
+        if not r.set(TrendingService.REBUILD_LOCK_KEY, 1, nx=True, ex=TrendingService.REBUILD_LOCK_TTL):
+            return 0
+        try:
+            return TrendingService.rebuild()
+        finally:
+            r.delete(TrendingService.REBUILD_LOCK_KEY)
+
+    @staticmethod
+    def prune():
+        """
+        Remove posts older than the trending window and move the epoch forward.
+
+        Returns:
+            Number of pruned posts
+        """
+        r = get_redis()
+        if r is None:
+            return 0
+
+        now = time.time()
+        cutoff = now - TrendingService._window()
+        try:
+            expired = r.zrangebyscore(TrendingService.CREATED_KEY, '-inf', cutoff)
+            if expired:
+                pipe = r.pipeline(transaction=False)
+                for key in TrendingService._score_keys() + [TrendingService.CREATED_KEY]:
+                    pipe.zrem(key, *expired)
+                pipe.execute()
+
+            epoch = r.get(TrendingService.EPOCH_KEY)
+            if epoch is not None and now - float(epoch) > TrendingService._half_life():
+                r.register_script(REBASE_SCRIPT)(
+                    keys=[TrendingService.EPOCH_KEY] + TrendingService._score_keys(),
+                    args=[now, TrendingService._half_life()]
+                )
+        except RedisError as e:
+            logger.warning(f"Trending prune failed: {e}")
+            return 0
+        return len(expired)
+
+    @staticmethod
+    def maintain(r):
+        """
+        Prune and rebase if no worker did so within MAINTENANCE_INTERVAL.
+
+        Called from reads and writes so the epoch keeps moving without the
+        scheduler; each process checks Redis at most once per interval.
+        """
+        now = time.time()
+        if now < TrendingService._next_maintenance:
+            return
+        TrendingService._next_maintenance = now + TrendingService.MAINTENANCE_INTERVAL
+        try:
+            if not r.set(TrendingService.MAINTENANCE_KEY, 1, nx=True, ex=TrendingService.MAINTENANCE_INTERVAL):
+                return
+        except RedisError as e:
+            logger.warning(f"Trending maintenance skipped: {e}")
+            return
+        TrendingService.prune()
+
+    @staticmethod
+    def get_trending(emotion=None, days=7, limit=20):
+        """
+        Top trending posts, highest score first.
+
+        Returns:
+            List of Post objects, or None when Redis cannot serve the request
+            (no Redis, or a time window longer than the tracked one)
+        """
+        r = get_redis()
+        if r is None or days * 86400 > TrendingService._window():
+            return None
+
+        key = TrendingService._theme_key(emotion) if emotion in TrendingService.THEMES else TrendingService.ALL_KEY
+        try:
+            if not r.exists(TrendingService.SEEDED_KEY):
+                TrendingService.seed(r)
+            post_ids = r.zrevrangebyscore(key, '+inf', '(0', start=0, num=limit + TrendingService.READ_SLACK)
+        except RedisError as e:
+            logger.warning(f"Trending read failed: {e}")
+            return None
+        TrendingService.maintain(r)
+
+        start_date = datetime.utcnow() - timedelta(days=days)
+        visible = Post.query.filter(
+            Post.created_at >= start_date,
+            Post.is_deleted == False,
+            Post.moderation_status == 'approved'
+        )
+
+        trending = []
+        if post_ids:
+            posts = {post.id: post for post in visible.filter(Post.id.in_(post_ids)).all()}
+            trending = [posts[post_id] for post_id in post_ids if post_id in posts][:limit]
+
+        if len(trending) < limit:
+            # Not enough engagement yet: fill up with the newest posts, like the SQL sort did with ties
+            trending += visible.filter(
+                Post.id.notin_([post.id for post in trending])
+            ).order_by(Post.created_at.desc()).limit(limit - len(trending)).all()
+        return trending
@@ -0,0 +1,205 @@
+"""
+Two-tier cache for hot objects
+
+L1 is a small in-process LRU with a short TTL, L2 is the shared `cache`
+(Redis, or SimpleCache without Redis). Reads hit L1 first and only go over
+the network on an L1 miss. Deletes are broadcast over Redis pub/sub so every
+worker drops its L1 copy; the L1 TTL bounds staleness if a message is lost.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from app import cache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with a size limit and per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """In-process LRU (L1) in front of the shared cache (L2)"""
+
+    CHANNEL = 'cache:invalidate'
+    # Message clearing every worker's L1
+    CLEAR_ALL = '*'
+
+    def __init__(self):
+        self.app = None
+        self.l1 = LRUCache()
+        self.l2_ttl = 300
+        self._stats_lock = threading.Lock()
+        self._subscriber_pid = None
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'invalidations_received': 0}
+
+    def init_app(self, app):
+        """Configure from app config (first app wins; scripts create throwaway apps)"""
+        if self.app is not None:
+            return
+        self.app = app
+        self.l1 = LRUCache(
+            maxsize=app.config.get('TWO_TIER_L1_MAXSIZE', 10000),
+            ttl=app.config.get('TWO_TIER_L1_TTL', 30)
+        )
+        self.l2_ttl = app.config.get('TWO_TIER_L2_TTL', 300)
+
+    def _redis(self):
+        if self.app is None or not self.app.config.get('REDIS_AVAILABLE'):
+            return None
+        return self.app.extensions.get('redis')
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _ensure_subscriber(self):
+        """Start the invalidation listener in the current process (threads do not survive fork)"""
+        pid = os.getpid()
+        if self._subscriber_pid == pid:
+            return
+        r = self._redis()
+        if r is None:
+            return
+        with self._stats_lock:
+            if self._subscriber_pid == pid:
+                return
+            self._subscriber_pid = pid
+        # Anything cached before the fork may have missed invalidations
+        self.l1.clear()
+        thread = threading.Thread(target=self._listen, args=(r,), name='two-tier-cache-invalidation', daemon=True)
+        thread.start()
+
+    def _listen(self, r):
+        while True:
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                while True:
+                    # Polling with a timeout instead of listen(): the shared client has a short socket timeout
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    key = message.get('data')
+                    if key == self.CLEAR_ALL:
+                        self.l1.clear()
+                    else:
+                        self.l1.delete(key)
+                    self._count('invalidations_received')
+            except Exception as e:
+                # Messages may have been missed while disconnected
+                self.l1.clear()
+                logger.warning(f"Cache invalidation listener reconnecting: {e}")
+                time.sleep(1)
+
+    def get(self, key, default=None):
+        """Read from L1, then L2 (filling L1)"""
+        self._ensure_subscriber()
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('l1_hits')
+            return value
+
+        value = cache.get(key)
+        if value is not None:
+            self._count('l2_hits')
+            self.l1.set(key, value)
+            return value
+
+        self._count('misses')
+        return default
+
+    def set(self, key, value, l1_ttl=None, l2_ttl=None):
+        """Store in both tiers"""
+        self._ensure_subscriber()
+        cache.set(key, value, timeout=self.l2_ttl if l2_ttl is None else l2_ttl)
+        self.l1.set(key, value, ttl=l1_ttl)
+
+    def get_or_set(self, key, loader, l1_ttl=None, l2_ttl=None):
+        """Read a key, computing and storing it with loader() on a miss (None is not cached)"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value, l1_ttl=l1_ttl, l2_ttl=l2_ttl)
+        return value
+
+    def delete(self, *keys):
+        """Delete from both tiers and tell the other workers to drop their L1 copies"""
+        if not keys:
+            return
+        for key in keys:
+            self.l1.delete(key)
+        cache.delete_many(*keys)
+
+        r = self._redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                for key in keys:
+                    pipe.publish(self.CHANNEL, key)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Cache invalidation broadcast failed: {e}")
+
+    def get_stats(self):
+        """Per-tier hit ratios of this worker process"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        l2_lookups = stats['l2_hits'] + stats['misses']
+        stats.update({
+            'l1_size': len(self.l1),
+            'l1_maxsize': self.l1.maxsize,
+            'l1_hit_ratio': round(stats['l1_hits'] / lookups, 4) if lookups else None,
+            'l2_hit_ratio': round(stats['l2_hits'] / l2_lookups, 4) if l2_lookups else None,
+            'hit_ratio': round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else None,
+            'coherent': self._redis() is not None,
+        })
+        return stats
+
+
+# Глобальный экземпляр
+two_tier_cache = TwoTierCache()
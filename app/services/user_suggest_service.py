@@ -0,0 +1,194 @@
+"""
+Username typeahead for the user picker
+
+On PostgreSQL, suggestions come from two bounded index scans:
+- prefix matches on lower(username) (btree text_pattern_ops)
+- fuzzy matches with the pg_trgm similarity operator (GIN)
+Both scans are capped, and the candidates are ranked by the denormalized
+users.followers_count. The indexes are created by
+migrations/migrate_user_suggest.py.
+
+Other databases are served from an in-memory top-K prefix trie, which is
+rebuilt every USER_SUGGEST_TRIE_TTL seconds.
+"""
+import logging
+import threading
+import time
+from flask import current_app
+from sqlalchemy import case, func, select, text, update
+from app import db
+from app.models.user import User
+from app.models.follow import Follow
+from app.utils.prefix_trie import PrefixTrie
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_COLUMNS = (
+    User.id, User.username, User.avatar_url, User.verification_type,
+    User.verification_badge, User.premium_tag, User.followers_count,
+)
+
+
+def _serialize(row):
+    return {
+        'id': row.id,
+        'username': row.username,
+        'avatar_url': row.avatar_url,
+        'verification_type': row.verification_type,
+        'verification_badge': row.verification_badge,
+        'premium_tag': row.premium_tag,
+        'followers_count': row.followers_count,
+    }
+
+
+class UserSuggestService:
+    """Prefix and similarity username suggestions ranked by followers"""
+
+    # Prefix candidates read before ranking (bounds the cost of one-letter prefixes)
+    PREFIX_CANDIDATES = 500
+    # Shortest query for similarity matches (pg_trgm needs whole trigrams)
+    MIN_SIMILARITY_LENGTH = 3
+
+    _trie = None
+    _trie_built_at = 0.0
+    _trie_lock = threading.Lock()
+    _trgm_ready = {}
+
+    @staticmethod
+    def _escape_like(value):
+        return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    @staticmethod
+    def _trgm_available():
+        """True on PostgreSQL with the pg_trgm extension (checked once per engine)"""
+        engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            return False
+        key = str(engine.url)
+        if key not in UserSuggestService._trgm_ready:
+            try:
+                with engine.connect() as conn:
+                    UserSuggestService._trgm_ready[key] = conn.execute(
+                        text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    ).first() is not None
+            except Exception as e:
+                logger.warning(f"Could not check for pg_trgm: {e}")
+                return False
+        return UserSuggestService._trgm_ready[key]
+
+    @staticmethod
+    def suggest(query_text, limit=10):
+        """
+        Users whose username starts with (or resembles) the query.
+
+        Returns:
+            List of small user dicts, prefix matches first, each group by followers
+        """
+        query_text = query_text.strip().lower()
+        if not query_text:
+            return []
+        if UserSuggestService._trgm_available():
+            return UserSuggestService._suggest_postgres(query_text, limit)
+        return UserSuggestService._suggest_trie(query_text, limit)
+
+    @staticmethod
+    def _suggest_postgres(query_text, limit):
+        username = func.lower(User.username)
+
+        # Walk the prefix index in key order, then rank the capped candidates
+        candidates = select(User.id).where(
+            User.is_banned == False,
+            username.like(f"{UserSuggestService._escape_like(query_text)}%", escape='\\')
+        ).order_by(username).limit(UserSuggestService.PREFIX_CANDIDATES).subquery()
+        prefix_rows = db.session.query(*SUGGEST_COLUMNS).join(
+            candidates, User.id == candidates.c.id
+        ).order_by(User.followers_count.desc(), User.username).limit(limit).all()
+
+        rows = list(prefix_rows)
+        if len(rows) < limit and len(query_text) >= UserSuggestService.MIN_SIMILARITY_LENGTH:
+            similar = db.session.query(*SUGGEST_COLUMNS).filter(
+                User.is_banned == False,
+                User.username.op('%')(query_text),
+                User.id.notin_([row.id for row in rows])
+            ).order_by(
+                func.similarity(User.username, query_text).desc()
+            ).limit(limit).all()
+            rows += sorted(similar, key=lambda row: -row.followers_count)[:limit - len(rows)]
+        return [_serialize(row) for row in rows]
+
+    @staticmethod
+    def _get_trie():
+        ttl = current_app.config.get('USER_SUGGEST_TRIE_TTL', 60)
+        trie = UserSuggestService._trie
+        if trie is not None and time.monotonic() - UserSuggestService._trie_built_at < ttl:
+            return trie
+
+        # One thread rebuilds; the others keep using the previous trie meanwhile
+        if not UserSuggestService._trie_lock.acquire(blocking=trie is None):
+            return trie
+        try:
+            if UserSuggestService._trie is trie:
+                started = time.monotonic()
+                rows = db.session.query(*SUGGEST_COLUMNS).filter(User.is_banned == False).all()
+                UserSuggestService._trie = PrefixTrie(
+                    ((row.username, _serialize(row), row.followers_count) for row in rows),
+                    top_k=current_app.config.get('USER_SUGGEST_MAX_LIMIT', 20)
+                )
+                UserSuggestService._trie_built_at = time.monotonic()
+                logger.info(f"User suggest trie built: {len(rows)} users in {time.monotonic() - started:.2f}s")
+            return UserSuggestService._trie
+        finally:
+            UserSuggestService._trie_lock.release()
+
+    @staticmethod
+    def _suggest_trie(query_text, limit):
+        return UserSuggestService._get_trie().search(query_text, limit)
+
+    @staticmethod
+    def adjust_followers(user_id, delta):
+        """Change a user's followers_count in the database (no read-modify-write)"""
+        table = User.__table__
+        new_value = table.c.followers_count + delta
+        db.session.execute(
+            update(table).where(table.c.id == user_id).values(
+                followers_count=case((new_value > 0, new_value), else_=0)
+            )
+        )
+
+    @staticmethod
+    def reconcile_followers(batch_size=1000):
+        """
+        Recompute followers_count from follows, one batch of users per transaction.
+
+        Returns:
+            Number of corrected users
+        """
+        table = User.__table__
+        follows = Follow.__table__
+        actual = select(func.count()).select_from(follows).where(
+            follows.c.following_id == table.c.id
+        ).scalar_subquery()
+
+        fixed = 0
+        last_id = None
+        while True:
+            ids_query = select(table.c.id).order_by(table.c.id).limit(batch_size)
+            if last_id is not None:
+                ids_query = ids_query.where(table.c.id > last_id)
+            ids = db.session.execute(ids_query).scalars().all()
+            if not ids:
+                break
+
+            result = db.session.execute(
+                update(table)
+                .where(table.c.id.in_(ids), table.c.followers_count != actual)
+                .values(followers_count=actual)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            fixed += result.rowcount
+            last_id = ids[-1]
+
+        if fixed:
+            logger.info(f"Follower counters reconciled: {fixed} users corrected")
+        return fixed
@@ -0,0 +1,269 @@
+"""
+Write-behind post view counter
+
+Views are buffered instead of committed on every read of a post. The buffer
+is a Redis hash (HINCRBY, shared by all workers) or, without Redis, a dict in
+the worker process. A background thread flushes it into posts.views_count
+with batched UPDATEs every VIEW_COUNTER_FLUSH_INTERVAL seconds, and the
+buffer is flushed once more when the process exits.
+
+A flush renames the Redis hash to views:flushing:<time>:<id> and deletes it
+after the UPDATEs commit. A worker that dies in between leaves that hash
+behind; the next flush of any worker claims such hashes once they are older
+than STALE_FLUSHING_SECONDS and writes them too.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import bindparam
+from redis.exceptions import RedisError
+from app import db
+from app.models.post import Post
+from app.services.cache_manager import CacheManager
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Buffers post view increments and flushes them in batches"""
+
+    PENDING_KEY = 'views:pending'
+    FLUSHING_KEY_PREFIX = 'views:flushing:'
+    UPDATE_BATCH = 500
+    # A flushing hash this old was left by a worker that died mid-flush
+    STALE_FLUSHING_SECONDS = 300
+
+    def __init__(self):
+        self.app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher_pid = None
+        self.stats = {
+            'flushes': 0,
+            'flush_errors': 0,
+            'flushed_views': 0,
+            'flushed_posts': 0,
+            'last_flush_at': None,
+            'last_flush_seconds': None,
+        }
+
+    def init_app(self, app):
+        """Bind the counter to the application (first app wins; scripts create throwaway apps)"""
+        if self.app is not None:
+            return
+        self.app = app
+        atexit.register(self.shutdown)
+
+    def _redis(self):
+        if self.app.config.get('VIEW_COUNTER_BACKEND', 'auto') == 'memory':
+            return None
+        if not self.app.config.get('REDIS_AVAILABLE'):
+            return None
+        return self.app.extensions.get('redis')
+
+    def _ensure_flusher(self):
+        """Start the flush thread in the current process (threads do not survive fork)"""
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            thread.start()
+
+    def _run(self):
+        interval = self.app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 10)
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"View counter flush failed: {e}")
+
+    def _buffer_local(self, post_id, count=1):
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + count
+            return self._pending[post_id]
+
+    def record(self, post_id):
+        """
+        Count one view of a post.
+
+        Returns:
+            Number of views of this post not yet written to the database
+            (including this one), to add to the stored views_count
+        """
+        self._ensure_flusher()
+        r = self._redis()
+        if r is not None:
+            try:
+                return r.hincrby(self.PENDING_KEY, post_id, 1)
+            except RedisError as e:
+                logger.warning(f"View counter falling back to memory: {e}")
+        return self._buffer_local(post_id)
+
+    def _flushing_key(self):
+        return f"{self.FLUSHING_KEY_PREFIX}{int(time.time())}:{uuid.uuid4().hex}"
+
+    def _is_stale(self, key):
+        """Whether a flushing hash was abandoned (keys without a time are from older versions)"""
+        if isinstance(key, bytes):
+            key = key.decode()
+        created, _, _ = key[len(self.FLUSHING_KEY_PREFIX):].partition(':')
+        return not created.isdigit() or int(created) < time.time() - self.STALE_FLUSHING_SECONDS
+
+    def _claim_stale(self, r):
+        """Take over flushing hashes of workers that died before writing them"""
+        claimed = []
+        for key in r.scan_iter(match=f"{self.FLUSHING_KEY_PREFIX}*", count=100):
+            if not self._is_stale(key):
+                continue
+            # RENAME to a fresh key of our own: only one worker gets each hash
+            claim_key = self._flushing_key()
+            try:
+                r.rename(key, claim_key)
+            except RedisError:
+                continue
+            claimed.append(claim_key)
+        if claimed:
+            logger.warning(f"View counter recovering {len(claimed)} abandoned flush buffers")
+        return claimed
+
+    def _drain(self):
+        """Take all buffered counts, returning (counts, flushing_keys)"""
+        with self._lock:
+            counts, self._pending = self._pending, {}
+
+        flushing_keys = []
+        r = self._redis()
+        if r is not None:
+            try:
+                flushing_keys = self._claim_stale(r)
+            except RedisError as e:
+                logger.warning(f"View counter could not look for abandoned flush buffers: {e}")
+            # RENAME is atomic: increments arriving meanwhile go to a fresh hash
+            flushing_key = self._flushing_key()
+            try:
+                r.rename(self.PENDING_KEY, flushing_key)
+                flushing_keys.append(flushing_key)
+            except RedisError as e:
+                # "no such key" means nothing is buffered in Redis
+                if 'no such key' not in str(e).lower():
+                    logger.warning(f"View counter could not drain Redis buffer: {e}")
+            try:
+                buffered = [r.hgetall(key) for key in flushing_keys]
+            except RedisError as e:
+                # The hashes stay in Redis and are claimed again once stale
+                logger.warning(f"View counter could not read Redis buffer: {e}")
+                buffered, flushing_keys = [], []
+            for values in buffered:
+                for post_id, count in values.items():
+                    if isinstance(post_id, bytes):
+                        post_id = post_id.decode()
+                    counts[post_id] = counts.get(post_id, 0) + int(count)
+        return counts, flushing_keys
+
+    def _restore(self, counts, flushing_keys):
+        """Put counts back into the buffer after a failed write"""
+        r = self._redis()
+        if r is not None and flushing_keys:
+            try:
+                pipe = r.pipeline(transaction=False)
+                for post_id, count in counts.items():
+                    pipe.hincrby(self.PENDING_KEY, post_id, count)
+                pipe.delete(*flushing_keys)
+                pipe.execute()
+                return
+            except RedisError as e:
+                logger.warning(f"View counter could not restore Redis buffer: {e}")
+        for post_id, count in counts.items():
+            self._buffer_local(post_id, count)
+
+    def flush(self):
+        """Write buffered views to posts.views_count; returns the number of views written"""
+        if self.app is None:
+            return 0
+
+        with self._flush_lock, self.app.app_context():
+            started = time.monotonic()
+            counts, flushing_keys = self._drain()
+            if not counts:
+                return 0
+
+            table = Post.__table__
+            statement = table.update().where(
+                table.c.id == bindparam('post_id')
+            ).values(views_count=table.c.views_count + bindparam('delta'))
+            rows = [{'post_id': post_id, 'delta': count} for post_id, count in counts.items()]
+
+            try:
+                for i in range(0, len(rows), self.UPDATE_BATCH):
+                    db.session.execute(statement, rows[i:i + self.UPDATE_BATCH])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.stats['flush_errors'] += 1
+                logger.error(f"View counter flush failed, keeping {len(counts)} posts buffered: {e}")
+                self._restore(counts, flushing_keys)
+                return 0
+
+            # Cached post details carry views_count
+            CacheManager.invalidate_posts(counts.keys())
+            
+            if flushing_keys:
+                try:
+                    self._redis().delete(*flushing_keys)
+                except (RedisError, AttributeError):
+                    pass
+
+            views = sum(counts.values())
+            self.stats['flushes'] += 1
+            self.stats['flushed_views'] += views
+            self.stats['flushed_posts'] += len(counts)
+            self.stats['last_flush_at'] = time.time()
+            self.stats['last_flush_seconds'] = round(time.monotonic() - started, 4)
+            return views
+
+    def get_stats(self):
+        """Buffer size and flush statistics for monitoring"""
+        with self._lock:
+            local_posts = len(self._pending)
+            local_views = sum(self._pending.values())
+
+        redis_posts = redis_views = None
+        r = self._redis() if self.app is not None else None
+        if r is not None:
+            try:
+                values = r.hvals(self.PENDING_KEY)
+                redis_posts = len(values)
+                redis_views = sum(int(value) for value in values)
+            except RedisError:
+                pass
+
+        return {
+            'backend': 'redis' if r is not None else 'memory',
+            'flush_interval': self.app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 10) if self.app else None,
+            'pending_posts': local_posts + (redis_posts or 0),
+            'pending_views': local_views + (redis_views or 0),
+            'pending_local_views': local_views,
+            **self.stats,
+        }
+
+    def shutdown(self):
+        """Stop the flush thread and write out everything buffered (graceful worker exit)"""
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"View counter final flush failed: {e}")
+
+
+# Глобальный экземпляр
+view_counter = ViewCounter()
@@ -14,6 +14,11 @@ from app import create_app, db
 from config import Config
 from app.services.miku_comment_service import miku_comment_service
 from app.models.miku_settings import MikuSettings
+from app.services.like_service import LikeService
+from app.services.trending_service import TrendingService
+from app.services.tag_service import TagService
+from app.services.user_suggest_service import UserSuggestService
+from app.services.recommendation_service import RecommendationService
 from datetime import datetime
 import logging
 
@@ -36,6 +41,58 @@ def run_miku_auto_comment():
         except Exception as e:
             logger.error(f"Error in Miku auto-comment: {e}")
 
+def run_like_reconciliation():
+    """Recompute post/comment likes_count from like rows"""
+    app = create_app(Config)
+    with app.app_context():
+        try:
+            result = LikeService.reconcile_counts(app.config.get('LIKE_RECONCILE_BATCH_SIZE', 1000))
+            logger.info(f"Like reconciliation: {result['posts']} posts, {result['comments']} comments corrected")
+        except Exception as e:
+            logger.error(f"Error in like reconciliation: {e}")
+
+def run_trending_prune():
+    """Drop expired posts from trending and rescale scores"""
+    app = create_app(Config)
+    with app.app_context():
+        try:
+            count = TrendingService.prune()
+            logger.info(f"Trending prune: {count} expired posts removed")
+        except Exception as e:
+            logger.error(f"Error in trending prune: {e}")
+
+def run_tag_recount():
+    """Recompute tag usage counters from the tag join tables"""
+    app = create_app(Config)
+    with app.app_context():
+        try:
+            count = TagService.recount()
+            logger.info(f"Tag recount: {count} tags corrected")
+        except Exception as e:
+            logger.error(f"Error in tag recount: {e}")
+
+def run_follower_reconciliation():
+    """Recompute users.followers_count from follows"""
+    app = create_app(Config)
+    with app.app_context():
+        try:
+            count = UserSuggestService.reconcile_followers(app.config.get('FOLLOWER_RECONCILE_BATCH_SIZE', 1000))
+            logger.info(f"Follower reconciliation: {count} users corrected")
+        except Exception as e:
+            logger.error(f"Error in follower reconciliation: {e}")
+
+def run_recommendation_build():
+    """Recompute collaborative-filtering recommendations"""
+    app = create_app(Config)
+    with app.app_context():
+        try:
+            result = RecommendationService.build()
+            if result is not None:
+                logger.info(f"Recommendations rebuilt: {result}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error building recommendations: {e}")
+
 def init_scheduler():
     """Initialize and start scheduler"""
     if not APSCHEDULER_AVAILABLE:
@@ -54,6 +111,51 @@ def init_scheduler():
         replace_existing=True
     )
     
+    # Repair drifted like counters once an hour
+    scheduler.add_job(
+        func=run_like_reconciliation,
+        trigger=CronTrigger(hour='*', minute=30),  # Every hour at minute 30
+        id='like_reconciliation',
+        name='Like Counter Reconciliation',
+        replace_existing=True
+    )
+    
+    # Prune trending scores every 15 minutes
+    scheduler.add_job(
+        func=run_trending_prune,
+        trigger=CronTrigger(minute='*/15'),
+        id='trending_prune',
+        name='Trending Prune',
+        replace_existing=True
+    )
+    
+    # Rebuild recommendations once a day (off-peak)
+    scheduler.add_job(
+        func=run_recommendation_build,
+        trigger=CronTrigger(hour=5, minute=30),
+        id='recommendation_build',
+        name='Recommendation Build',
+        replace_existing=True
+    )
+    
+    # Repair drifted follower counters once an hour
+    scheduler.add_job(
+        func=run_follower_reconciliation,
+        trigger=CronTrigger(hour='*', minute=45),
+        id='follower_reconciliation',
+        name='Follower Counter Reconciliation',
+        replace_existing=True
+    )
+    
+    # Repair drifted tag counters once a day
+    scheduler.add_job(
+        func=run_tag_recount,
+        trigger=CronTrigger(hour=4, minute=15),
+        id='tag_recount',
+        name='Tag Counter Recount',
+        replace_existing=True
+    )
+    
     scheduler.start()
     logger.info("Scheduler started")
 
@@ -0,0 +1,18 @@
+"""
+Content hashes for duplicate detection
+
+Posts and comments store the hash of their normalized text in
+content_hash, so "did this user post the same text recently" is an index
+lookup instead of a comparison of every recent text.
+"""
+import hashlib
+
+
+def normalize_content(text):
+    """Text as compared for duplicates (surrounding whitespace and case ignored)"""
+    return (text or '').strip().lower()
+
+
+def content_hash(text):
+    """SHA-256 hex digest of the normalized text"""
+    return hashlib.sha256(normalize_content(text).encode('utf-8')).hexdigest()
@@ -0,0 +1,55 @@
+"""
+Conditional GET helpers (ETag / Last-Modified / 304)
+
+Validators are built from version counters kept in the cache (see
+CacheManager.get_version), so a request can be answered with 304 before
+anything is loaded or serialized. Versions are nanosecond timestamps of the
+last change, which also gives a Last-Modified date. ETags are weak: payloads
+may differ in counters that do not matter to the client (e.g. views).
+"""
+from datetime import datetime, timezone
+from flask import request, jsonify, current_app
+
+
+def _etag(versions) -> str:
+    return '-'.join(str(version) for version in versions)
+
+
+def _last_modified(versions) -> datetime:
+    return datetime.fromtimestamp(max(versions) / 1e9, tz=timezone.utc).replace(microsecond=0)
+
+
+def not_modified(versions):
+    """
+    Return a 304 response if the client already has this version of the resource.
+
+    Args:
+        versions: Version numbers the response depends on
+
+    Returns:
+        304 Response, or None when the full response must be sent
+    """
+    if request.if_none_match:
+        modified = not request.if_none_match.contains_weak(_etag(versions))
+    elif request.if_modified_since:
+        modified = _last_modified(versions) > request.if_modified_since
+    else:
+        return None
+
+    if modified:
+        return None
+    response = current_app.response_class(status=304)
+    return with_validators(response, versions)
+
+
+def with_validators(response, versions):
+    """Attach ETag/Last-Modified to a response; clients must revalidate before reuse"""
+    response.set_etag(_etag(versions), weak=True)
+    response.last_modified = _last_modified(versions)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional_json(data, versions):
+    """jsonify() with validators for the given versions"""
+    return with_validators(jsonify(data), versions)
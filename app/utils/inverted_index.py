@@ -0,0 +1,235 @@
+"""
+In-memory inverted index with BM25 ranking
+
+Postings are kept per term as two parallel `array('I')` columns (document
+numbers and term frequencies), so the index costs about 8 bytes per
+(term, document) pair instead of a Python object per posting. Documents are
+added incrementally; removing one only marks its number dead, and the
+postings are compacted once dead entries pile up.
+
+The snapshot format is the same arrays written back to back (CSR layout)
+after a small JSON header, so loading is a few bulk `frombytes` calls.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import Counter
+
+# Letters and digits of any script (Cyrillic and Latin alike), no underscores
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+SNAPSHOT_MAGIC = b'INVIDX01'
+
+
+def tokenize(text):
+    """Lowercased word tokens; 'ё' is folded to 'е', single letters are dropped"""
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+        if len(token) > 1 or token.isdigit()
+    ]
+
+
+class InvertedIndex:
+    """Thread-safe BM25 index over documents identified by string IDs"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._doc_ids = []          # document number -> ID (None once removed)
+        self._numbers = {}          # ID -> document number
+        self._lengths = array('I')  # document number -> token count
+        self._postings = {}         # term -> (array of document numbers, array of term frequencies)
+        self._total_length = 0
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._numbers
+
+    def add(self, doc_id, text):
+        """Index a document, replacing a previous version with the same ID"""
+        tokens = tokenize(text)
+        with self._lock:
+            self._remove(doc_id)
+            number = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._numbers[doc_id] = number
+            self._lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('I'), array('I'))
+                postings[0].append(number)
+                postings[1].append(frequency)
+
+    def remove(self, doc_id):
+        """Drop a document (no-op if it is not indexed)"""
+        with self._lock:
+            self._remove(doc_id)
+            if self._dead > 1000 and self._dead > len(self._numbers) // 4:
+                self._compact()
+
+    def _remove(self, doc_id):
+        number = self._numbers.pop(doc_id, None)
+        if number is None:
+            return
+        self._doc_ids[number] = None
+        self._total_length -= self._lengths[number]
+        self._dead += 1
+
+    def _compact(self):
+        """Renumber live documents and drop postings of removed ones"""
+        renumber = {}
+        doc_ids = []
+        lengths = array('I')
+        for number, doc_id in enumerate(self._doc_ids):
+            if doc_id is not None:
+                renumber[number] = len(doc_ids)
+                doc_ids.append(doc_id)
+                lengths.append(self._lengths[number])
+
+        postings = {}
+        for term, (numbers, frequencies) in self._postings.items():
+            new_numbers = array('I')
+            new_frequencies = array('I')
+            for number, frequency in zip(numbers, frequencies):
+                new_number = renumber.get(number)
+                if new_number is not None:
+                    new_numbers.append(new_number)
+                    new_frequencies.append(frequency)
+            if new_numbers:
+                postings[term] = (new_numbers, new_frequencies)
+
+        self._doc_ids = doc_ids
+        self._numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+        self._lengths = lengths
+        self._postings = postings
+        self._dead = 0
+
+    def search(self, query, limit=100):
+        """
+        Rank documents containing any query term with BM25.
+
+        Returns:
+            List of (doc_id, score), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._numbers)
+            if not terms or not live:
+                return []
+            average_length = self._total_length / live or 1.0
+            doc_ids = self._doc_ids
+            lengths = self._lengths
+            k1, b = self.k1, self.b
+
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                matches = [
+                    (number, frequency) for number, frequency in zip(*postings)
+                    if doc_ids[number] is not None
+                ]
+                if not matches:
+                    continue
+                frequency_in_docs = len(matches)
+                idf = math.log(1 + (live - frequency_in_docs + 0.5) / (frequency_in_docs + 0.5))
+                for number, frequency in matches:
+                    norm = k1 * (1 - b + b * lengths[number] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(doc_ids[number], score) for number, score in best]
+
+    def save(self, path, meta=None):
+        """Write a compact snapshot atomically (temp file + rename)"""
+        with self._lock:
+            if self._dead:
+                self._compact()
+            terms = sorted(self._postings)
+            offsets = array('Q', [0])
+            numbers = array('I')
+            frequencies = array('I')
+            for term in terms:
+                term_numbers, term_frequencies = self._postings[term]
+                numbers.extend(term_numbers)
+                frequencies.extend(term_frequencies)
+                offsets.append(len(numbers))
+            header = json.dumps({
+                'byteorder': sys.byteorder,
+                'itemsizes': [values.itemsize for values in (self._lengths, array('Q'))],
+                'k1': self.k1,
+                'b': self.b,
+                'doc_ids': self._doc_ids,
+                'terms': terms,
+                'meta': meta or {},
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            arrays = (self._lengths, offsets, numbers, frequencies)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for values in arrays:
+                data = values.tobytes()
+                f.write(struct.pack('<Q', len(data)))
+                f.write(data)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a snapshot written by save().
+
+        Returns:
+            Tuple of (index, meta)
+
+        Raises:
+            ValueError: if the file is not a compatible snapshot
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError('Not an index snapshot')
+            (header_size,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_size).decode('utf-8'))
+            if header['byteorder'] != sys.byteorder or header['itemsizes'] != [array('I').itemsize, array('Q').itemsize]:
+                raise ValueError('Snapshot written on an incompatible platform')
+
+            arrays = []
+            for typecode in ('I', 'Q', 'I', 'I'):
+                (size,) = struct.unpack('<Q', f.read(8))
+                values = array(typecode)
+                values.frombytes(f.read(size))
+                arrays.append(values)
+        lengths, offsets, numbers, frequencies = arrays
+
+        index = cls(k1=header['k1'], b=header['b'])
+        index._doc_ids = header['doc_ids']
+        index._numbers = {doc_id: number for number, doc_id in enumerate(index._doc_ids)}
+        index._lengths = lengths
+        index._total_length = sum(lengths)
+        index._postings = {
+            term: (numbers[offsets[i]:offsets[i + 1]], frequencies[offsets[i]:offsets[i + 1]])
+            for i, term in enumerate(header['terms'])
+        }
+        return index, header['meta']
@@ -0,0 +1,68 @@
+"""
+MinHash signatures and LSH bands for near-duplicate texts
+
+A text is reduced to its shingles (adjacent word pairs). Its MinHash
+signature holds, for each of NUM_HASHES hash functions, the smallest hash
+of any shingle; the share of positions where two signatures agree
+estimates the Jaccard similarity of the two shingle sets.
+
+Signatures are cut into BANDS bands of ROWS values, and each band is
+hashed to a bucket key. Two texts land in a common bucket with
+probability 1 - (1 - J**ROWS)**BANDS: about 0.9 at J = 0.6 and 0.001 at
+J = 0.05, so near-duplicates are found by looking up BANDS buckets and
+unrelated texts rarely come along.
+"""
+import hashlib
+
+ROWS = 3
+BANDS = 10
+NUM_HASHES = ROWS * BANDS
+# Only the start of long texts is hashed (bounds the work per text)
+MAX_TOKENS = 1000
+
+_PRIME = (1 << 61) - 1
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little') % _PRIME
+
+
+# h_i(x) = (a_i * x + b_i) mod p, with fixed coefficients so signatures are
+# comparable across processes and restarts
+_COEFFICIENTS = [(_hash(f'minhash:a:{i}') | 1, _hash(f'minhash:b:{i}')) for i in range(NUM_HASHES)]
+
+
+def shingles(tokens):
+    """Adjacent word pairs of a token list (the words themselves for a single word)"""
+    tokens = tokens[:MAX_TOKENS]
+    if len(tokens) < 2:
+        return set(tokens)
+    return {f'{first} {second}' for first, second in zip(tokens, tokens[1:])}
+
+
+def minhash(features):
+    """
+    Signature of a set of strings.
+
+    Returns:
+        Tuple of NUM_HASHES ints, or None for an empty set
+    """
+    if not features:
+        return None
+    hashes = [_hash(feature) for feature in features]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _COEFFICIENTS)
+
+
+def band_keys(signature):
+    """One bucket key per band of a signature"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr((band, values)).encode('ascii'), digest_size=8).hexdigest()
+        keys.append(f'{band}:{digest}')
+    return keys
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the sets behind two signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_HASHES
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination utilities
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values) -> str:
+    """Encode sort key values into an opaque cursor string"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    # Base32 keeps the cursor alphanumeric so it passes the SQL injection filter
+    return base64.b32encode(raw).decode('ascii').rstrip('=').lower()
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Decode a cursor produced by encode_cursor() for the given sort columns"""
+    padded = cursor.upper() + '=' * (-len(cursor) % 8)
+    try:
+        values = json.loads(base64.b32decode(padded))
+    except ValueError:
+        raise InvalidCursor('Malformed cursor')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor('Cursor does not match the sort order')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+            if python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError, NotImplementedError):
+            raise InvalidCursor('Malformed cursor value')
+    return decoded
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20):
+    """
+    Paginate a query by a descending sort key instead of OFFSET.
+
+    Args:
+        query: Filtered query without ORDER BY
+        columns: Model columns forming a unique sort key, most significant first
+        cursor: Cursor returned for the previous page (None for the first page)
+        per_page: Items per page
+
+    Returns:
+        Tuple of (items, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    items = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+
+    return items, next_cursor
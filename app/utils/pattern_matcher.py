@@ -0,0 +1,75 @@
+"""
+Multi-pattern matcher: one compiled regex for a whole list of patterns
+
+The text is scanned once with a zero-width alternation of all patterns,
+`(?=p1|p2|...)`, which reports every position where some pattern starts.
+Plain alternations keep the regex engine's fast paths; capturing groups
+and re.IGNORECASE in a scanning regex do not, so the scan has neither and
+matching is case-sensitive (pass lowercased text and lowercase patterns
+for case-insensitive matching).
+
+Which pattern matched is then decided only at those positions, with an
+alternation of named groups anchored there (`match`, not `search`). A
+pattern starting at the same position as an earlier one (e.g. 'click
+here' and 'click here now') is found by matching again without the
+patterns already found, so the result is exactly the set of patterns
+`re.search` would find one by one.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Hit = namedtuple('Hit', ['category', 'pattern'])
+
+
+class PatternMatcher:
+    """Finds which of many (category, regex) patterns occur in a text"""
+
+    def __init__(self, patterns, flags=0):
+        """
+        Args:
+            patterns: Iterable of (category, regex); the regexes must not use
+                numbered backreferences (each one is wrapped in a group)
+            flags: re flags applied to all patterns (avoid re.IGNORECASE, see above)
+        """
+        self.patterns = tuple((category, pattern) for category, pattern in patterns)
+        self.flags = flags
+        self._all = frozenset(range(len(self.patterns)))
+        self._scan = re.compile(
+            '(?=' + '|'.join(f'(?:{pattern})' for _, pattern in self.patterns) + ')',
+            flags
+        )
+        # Anchored matchers; variants without already found patterns are cached
+        self._compile = lru_cache(maxsize=256)(self._build)
+        self._compile(self._all)
+
+    def _build(self, indexes):
+        return re.compile(
+            '|'.join(f'(?P<p{i}>{self.patterns[i][1]})' for i in sorted(indexes)),
+            self.flags
+        )
+
+    def search(self, text):
+        """
+        All patterns occurring in text, in definition order.
+
+        Returns:
+            List of Hit(category, pattern)
+        """
+        if not text or not self.patterns:
+            return []
+        remaining = self._all
+        for position in self._scan.finditer(text):
+            start = position.start()
+            while remaining:
+                match = self._compile(remaining).match(text, start)
+                if match is None:
+                    break
+                remaining = remaining - {int(match.lastgroup[1:])}
+            if not remaining:
+                break
+        return [Hit(*self.patterns[i]) for i in sorted(self._all - remaining)]
+
+    def categories(self, text):
+        """Categories with at least one matching pattern"""
+        return {hit.category for hit in self.search(text)}
@@ -0,0 +1,75 @@
+"""
+Prefix index with precomputed top-K entries for wide prefixes
+
+Keys are kept in one sorted list, so the keys sharing a prefix form a
+contiguous range found with two bisections. A trie is laid over that list
+only where it pays off: every prefix matching more than `leaf_size` keys
+stores its K heaviest entries, and narrower prefixes rank their (at most
+leaf_size) keys at lookup time. A lookup therefore never looks at more than
+leaf_size entries, however many keys share the prefix, and building costs a
+sort plus one pass per trie level instead of a Python node per character.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+
+# Sorts after any character a key can contain
+_KEY_END = '\U0010ffff'
+
+
+class PrefixTrie:
+    """Immutable top-K prefix index (rebuild it to apply changes)"""
+
+    __slots__ = ('top_k', 'leaf_size', '_keys', '_weights', '_values', '_top')
+
+    def __init__(self, entries=(), top_k=10, leaf_size=64):
+        """
+        Args:
+            entries: Iterable of (key, value, weight); keys are matched case-insensitively
+            top_k: Entries kept per wide prefix (the most a lookup can return)
+            leaf_size: Prefixes matching at most this many keys are ranked on lookup
+        """
+        self.top_k = top_k
+        self.leaf_size = leaf_size
+        rows = sorted(((key.lower(), weight, value) for key, value, weight in entries), key=lambda row: row[0])
+        self._keys = [row[0] for row in rows]
+        self._weights = [row[1] for row in rows]
+        self._values = [row[2] for row in rows]
+        self._top = {}
+        self._build()
+
+    def _heaviest(self, lo, hi, count):
+        # Stable, so equal weights keep key order
+        return heapq.nlargest(count, range(lo, hi), key=self._weights.__getitem__)
+
+    def _build(self):
+        keys = self._keys
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= self.leaf_size:
+                continue
+            self._top[prefix] = self._heaviest(lo, hi, self.top_k)
+
+            depth = len(prefix)
+            # The key equal to the prefix itself sorts first and has no child
+            while lo < hi and len(keys[lo]) == depth:
+                lo += 1
+            while lo < hi:
+                child = prefix + keys[lo][depth]
+                end = bisect_right(keys, child + _KEY_END, lo, hi)
+                stack.append((child, lo, end))
+                lo = end
+
+    def __len__(self):
+        return len(self._keys)
+
+    def search(self, prefix, limit=None):
+        """Heaviest values whose key starts with prefix"""
+        prefix = prefix.lower()
+        limit = min(limit or self.top_k, self.top_k)
+        top = self._top.get(prefix)
+        if top is None:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_right(self._keys, prefix + _KEY_END, lo)
+            top = self._heaviest(lo, hi, limit)
+        return [self._values[i] for i in top[:limit]]
@@ -0,0 +1,10 @@
+"""
+Redis client access
+"""
+from flask import current_app
+
+def get_redis():
+    """Return the shared Redis client, or None when Redis is unavailable"""
+    if not current_app.config.get('REDIS_AVAILABLE'):
+        return None
+    return current_app.extensions.get('redis')
@@ -0,0 +1,258 @@
+"""
+Dense vector index with batched cosine top-K search
+
+Vectors are L2-normalized float32 rows, so cosine similarity is a dot
+product and comparing queries with the whole index is a matrix product,
+done BLOCK_ROWS rows at a time to bound memory. Rows loaded from a
+snapshot stay in a read-only memory map (shared by workers through the
+page cache); rows added later go to a growable in-memory array.
+
+HashingVectorizer turns texts into such vectors: TF-IDF weights of word
+tokens hashed, with a random sign, into a fixed number of dimensions.
+Document frequencies are kept per hash bucket as well, so there is no
+vocabulary to store or keep in sync.
+"""
+import json
+import math
+import os
+import threading
+import uuid
+import zlib
+from collections import Counter
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+
+class HashingVectorizer:
+    """Signed feature hashing of TF-IDF weighted tokens"""
+
+    DF_BUCKETS = 1 << 20
+
+    def __init__(self, dim=256, df=None, n_docs=0):
+        self.dim = dim
+        self.df = df if df is not None else np.zeros(self.DF_BUCKETS, dtype=np.int32)
+        self.n_docs = n_docs
+
+    @staticmethod
+    def _hash(term):
+        return zlib.crc32(term.encode('utf-8'))
+
+    def count(self, tokens):
+        """Add a new document's tokens to the document frequencies"""
+        for term in set(tokens):
+            self.df[self._hash(term) & (self.DF_BUCKETS - 1)] += 1
+        self.n_docs += 1
+
+    def vectorize(self, tokens):
+        """Unit vector of a token list (all zeros for no tokens)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term, frequency in Counter(tokens).items():
+            h = self._hash(term)
+            idf = math.log((1 + self.n_docs) / (1 + self.df[h & (self.DF_BUCKETS - 1)])) + 1
+            weight = (1 + math.log(frequency)) * idf
+            # Low bits pick the document frequency bucket, the rest the dimension and sign
+            vector[(h >> 8) % self.dim] += weight if h & 0x80 else -weight
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class VectorIndex:
+    """Thread-safe cosine top-K index over unit vectors identified by string IDs"""
+
+    BLOCK_ROWS = 65536
+
+    def __init__(self, dim):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._base = np.zeros((0, dim), dtype=np.float32)  # Memory-mapped after load()
+        self._extra = np.zeros((64, dim), dtype=np.float32)
+        self._extra_size = 0
+        self._ids = []                              # row -> ID (None once removed)
+        self._rows = {}                             # ID -> row
+        self._alive = np.zeros(64, dtype=bool)      # row -> live (capacity grows by doubling)
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._rows
+
+    def add(self, doc_id, vector):
+        """Index a vector, replacing a previous one with the same ID"""
+        with self._lock:
+            self._remove(doc_id)
+            if self._extra_size == len(self._extra):
+                grown = np.zeros((len(self._extra) * 2, self.dim), dtype=np.float32)
+                grown[:self._extra_size] = self._extra[:self._extra_size]
+                self._extra = grown
+            self._extra[self._extra_size] = vector
+            self._extra_size += 1
+            row = len(self._ids)
+            if row == len(self._alive):
+                self._alive = np.concatenate([self._alive, np.zeros(len(self._alive), dtype=bool)])
+            self._alive[row] = True
+            self._rows[doc_id] = row
+            self._ids.append(doc_id)
+
+    def remove(self, doc_id):
+        """Drop a vector (no-op if it is not indexed)"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._ids[row] = None
+            self._alive[row] = False
+            self._dead += 1
+
+    def _row(self, row):
+        base_size = len(self._base)
+        return self._base[row] if row < base_size else self._extra[row - base_size]
+
+    def vector(self, doc_id):
+        """Stored vector of a document, or None"""
+        with self._lock:
+            row = self._rows.get(doc_id)
+            return None if row is None else np.array(self._row(row))
+
+    def _blocks(self):
+        """(first row, rows) blocks over the memory-mapped and in-memory parts"""
+        for source, offset in ((self._base, 0), (self._extra[:self._extra_size], len(self._base))):
+            for start in range(0, len(source), self.BLOCK_ROWS):
+                yield offset + start, source[start:start + self.BLOCK_ROWS]
+
+    def search(self, queries, limit=10):
+        """
+        Most similar documents for each query vector.
+
+        Args:
+            queries: Array of shape (dim,) or (n, dim) of unit vectors
+            limit: Results per query
+
+        Returns:
+            List of (doc_id, score) best first, or a list of such lists for 2-D queries
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        n = len(queries)
+
+        with self._lock:
+            alive = self._alive
+            best_scores = np.zeros((n, 0), dtype=np.float32)
+            best_rows = np.zeros((n, 0), dtype=np.int64)
+            for start, block in self._blocks():
+                scores = (block @ queries.T).T
+                if self._dead:
+                    scores[:, ~alive[start:start + len(block)]] = -np.inf
+                take = min(limit, scores.shape[1])
+                top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+                best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                best_rows = np.concatenate([best_rows, top + start], axis=1)
+                if best_scores.shape[1] > limit:
+                    keep = np.argpartition(-best_scores, limit - 1, axis=1)[:, :limit]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            results = []
+            for i in range(n):
+                results.append([
+                    (self._ids[best_rows[i, j]], float(best_scores[i, j]))
+                    for j in order[i] if np.isfinite(best_scores[i, j])
+                ])
+        return results[0] if single else results
+
+    def save(self, path, meta=None, arrays=None):
+        """
+        Write a snapshot: `path` (JSON manifest) plus .npy files named after it.
+
+        The manifest is replaced last and atomically, so readers always see
+        a complete snapshot; workers still mapping the previous files keep
+        working, as the files are only unlinked.
+        """
+        with self._lock:
+            alive = self._alive[:len(self._ids)]
+            base_size = len(self._base)
+            vectors = np.concatenate([
+                self._base[alive[:base_size]],
+                self._extra[:self._extra_size][alive[base_size:]],
+            ])
+            ids = [self._ids[row] for row in np.flatnonzero(alive)]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        token = uuid.uuid4().hex[:12]
+        files = {'vectors': f"{os.path.basename(path)}.{token}.vectors.npy"}
+        np.save(os.path.join(directory, files['vectors']), vectors)
+        for name, values in (arrays or {}).items():
+            files[name] = f"{os.path.basename(path)}.{token}.{name}.npy"
+            np.save(os.path.join(directory, files[name]), values)
+
+        previous = None
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    previous = json.load(f).get('files')
+            except (OSError, ValueError):
+                previous = None
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'dim': self.dim,
+                'ids': ids,
+                'files': files,
+                'meta': meta or {},
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+        for name in (previous or {}).values():
+            if name not in files.values():
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, path):
+        """
+        Open a snapshot written by save(); vectors are memory-mapped read-only.
+
+        Returns:
+            Tuple of (index, meta, arrays)
+
+        Raises:
+            ValueError: if the files are missing or inconsistent
+        """
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported vector snapshot version')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        files = manifest['files']
+        try:
+            vectors = np.load(os.path.join(directory, files['vectors']), mmap_mode='r')
+            arrays = {
+                name: np.load(os.path.join(directory, file_name))
+                for name, file_name in files.items() if name != 'vectors'
+            }
+        except OSError as e:
+            raise ValueError(f'Vector snapshot file missing: {e}')
+        if vectors.shape != (len(manifest['ids']), manifest['dim']):
+            raise ValueError('Vector snapshot does not match its manifest')
+
+        index = cls(manifest['dim'])
+        index._base = vectors
+        index._ids = list(manifest['ids'])
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        index._alive = np.zeros(max(len(index._ids), 64), dtype=bool)
+        index._alive[:len(index._ids)] = True
+        return index, manifest['meta'], arrays
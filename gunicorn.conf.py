@@ -14,3 +14,9 @@ capture_output = True
 
 # Recommended limits for production
 worker_connections = 1000
+
+
+def worker_exit(server, worker):
+    """Flush buffered post views before the worker process exits"""
+    from app.services.view_counter import view_counter
+    view_counter.shutdown()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Migration script to create indexes used by comment thread loading
+Run this script to apply the migration: python migrations/migrate_comment_indexes.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect
+from config import Config
+
+def migrate_comment_indexes():
+    """Create missing indexes on comments table"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+    
+    with app.app_context():
+        from app.models.comment import Comment
+        
+        inspector = inspect(db.engine)
+        existing_indexes = {index['name'] for index in inspector.get_indexes('comments')}
+        
+        print("Creating thread indexes on comments table...")
+        for index in Comment.__table__.indexes:
+            if index.name in existing_indexes:
+                print(f"  ✓ Index {index.name} already exists")
+                continue
+            try:
+                index.create(db.engine)
+                print(f"  ✓ Index {index.name} created successfully")
+            except Exception as e:
+                print(f"  ✗ Error creating {index.name}: {e}")
+                return False
+        
+        print("\nMigration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_comment_indexes()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Migration script for duplicate detection by content hash
+Run this script to apply the migration: python migrations/migrate_content_hash.py
+
+Adds content_hash (SHA-256 of the normalized text) to posts and comments,
+backfills it and creates idx_post_user_hash / idx_comment_user_hash on
+(user_id, content_hash, created_at).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect, select, text, update
+from config import Config
+
+BATCH_SIZE = 1000
+
+def backfill(model):
+    """Hash the content of rows without a hash, in batches"""
+    from app.utils.content_hash import content_hash
+
+    table = model.__table__
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.content).where(table.c.content_hash.is_(None)).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return total
+        for row_id, content in rows:
+            db.session.execute(
+                update(table).where(table.c.id == row_id).values(content_hash=content_hash(content))
+            )
+        db.session.commit()
+        total += len(rows)
+
+def migrate_content_hash():
+    """Add, backfill and index content_hash on posts and comments"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+
+    with app.app_context():
+        from app.models.post import Post
+        from app.models.comment import Comment
+
+        inspector = inspect(db.engine)
+        for model in (Post, Comment):
+            table = model.__table__
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+
+            try:
+                if 'content_hash' not in columns:
+                    with db.engine.begin() as conn:
+                        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN content_hash VARCHAR(64)"))
+                    print(f"✓ {table.name}.content_hash column added")
+                else:
+                    print(f"✓ {table.name}.content_hash column already exists")
+
+                print(f"Backfilling {table.name}.content_hash...")
+                print(f"✓ {backfill(model)} {table.name} hashed")
+            except Exception as e:
+                db.session.rollback()
+                print(f"✗ Error adding {table.name}.content_hash: {e}")
+                return False
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if 'content_hash' not in index.columns:
+                    continue
+                if index.name in existing_indexes:
+                    print(f"  ✓ Index {index.name} already exists")
+                    continue
+                try:
+                    index.create(db.engine)
+                    print(f"  ✓ Index {index.name} created successfully")
+                except Exception as e:
+                    print(f"  ✗ Error creating {index.name}: {e}")
+                    return False
+
+        print("\nMigration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_content_hash()
+    sys.exit(0 if success else 1)
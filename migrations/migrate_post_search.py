@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Migration script to add PostgreSQL full-text search to posts
+Run this script to apply the migration: python migrations/migrate_post_search.py
+
+Adds the generated column posts.search_vector (tags + content, see
+app/services/search_backends.py) and a GIN index on it. Other databases
+keep using ILIKE search and are skipped.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect, text
+from config import Config
+
+def migrate_post_search():
+    """Add search_vector column and GIN index to posts"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+    
+    with app.app_context():
+        from app.services.search_backends import SEARCH_VECTOR_SQL
+        
+        if db.engine.dialect.name != 'postgresql':
+            print(f"✓ {db.engine.dialect.name} database: full-text search not available, ILIKE search stays in use")
+            return True
+        
+        inspector = inspect(db.engine)
+        columns = {column['name'] for column in inspector.get_columns('posts')}
+        
+        try:
+            with db.engine.begin() as conn:
+                if 'search_vector' not in columns:
+                    print("Adding posts.search_vector (computes the vector of every post, may take a while)...")
+                    conn.execute(text(
+                        f"ALTER TABLE posts ADD COLUMN search_vector tsvector "
+                        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+                    ))
+                    print("✓ search_vector column added")
+                else:
+                    print("✓ search_vector column already exists")
+                
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_posts_search_vector ON posts USING GIN (search_vector)"
+                ))
+                print("✓ idx_posts_search_vector index ready")
+        except Exception as e:
+            print(f"✗ Error adding full-text search: {e}")
+            return False
+        
+        print("\nMigration completed successfully!")
+        print("Restart the app to switch search to PostgreSQL full-text search.")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_post_search()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the post_recommendations table
+Run this script to apply the migration: python migrations/migrate_recommendations.py
+
+The table is filled by the daily recommendation job (needs numpy/scipy from
+requirements-optional.txt); run python -m app.scripts.build_recommendations
+to fill it right away.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect
+from config import Config
+
+def migrate_recommendations():
+    """Create post_recommendations table"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+    
+    with app.app_context():
+        from app.models.recommendation import PostRecommendation
+        
+        inspector = inspect(db.engine)
+        if PostRecommendation.__tablename__ in inspector.get_table_names():
+            print(f"✓ {PostRecommendation.__tablename__} table already exists")
+        else:
+            try:
+                PostRecommendation.__table__.create(db.engine)
+                print(f"✓ {PostRecommendation.__tablename__} table created successfully")
+            except Exception as e:
+                print(f"✗ Error creating {PostRecommendation.__tablename__} table: {e}")
+                return False
+        
+        print("\nMigration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_recommendations()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the normalized tag tables and backfill them
+Run this script to apply the migration: python migrations/migrate_tags.py
+
+Creates tags, post_tags and gallery_tags, then fills them from the JSON
+`tags` columns of posts and gallery and computes the tag usage counters.
+The JSON columns are kept (the API still writes them); safe to re-run.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect
+from config import Config
+
+def migrate_tags():
+    """Create tag tables and backfill them from JSON tags"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+    
+    with app.app_context():
+        from app.models.tag import Tag, post_tags, gallery_tags
+        from app.services.tag_service import TagService
+        
+        inspector = inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+        
+        for table in (Tag.__table__, post_tags, gallery_tags):
+            if table.name in existing_tables:
+                print(f"✓ {table.name} table already exists")
+                continue
+            try:
+                table.create(db.engine)
+                print(f"✓ {table.name} table created successfully")
+            except Exception as e:
+                print(f"✗ Error creating {table.name} table: {e}")
+                return False
+        
+        print("\nBackfilling tags from JSON columns...")
+        try:
+            result = TagService.backfill()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error backfilling tags: {e}")
+            return False
+        print(f"  ✓ {result['posts']} posts processed")
+        print(f"  ✓ {result['gallery']} gallery items processed")
+        print(f"  ✓ {Tag.query.count()} tags")
+        
+        print("\nMigration completed successfully!")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_tags()
+    sys.exit(0 if success else 1)
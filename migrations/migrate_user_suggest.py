@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Migration script for the username typeahead (/api/search/users/suggest)
+Run this script to apply the migration: python migrations/migrate_user_suggest.py
+
+Adds users.followers_count (backfilled from follows). On PostgreSQL it also
+enables pg_trgm and creates:
+- idx_users_username_trgm: GIN trigram index (similarity matches, ILIKE user search)
+- idx_users_username_prefix: btree on lower(username) for prefix matches
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import inspect, text
+from config import Config
+
+def migrate_user_suggest():
+    """Add followers_count and the username search indexes"""
+    # Prevent app from running full DB initialization during migration
+    os.environ['SKIP_INIT_DB'] = '1'
+    app = create_app(Config)
+
+    with app.app_context():
+        from app.services.user_suggest_service import UserSuggestService
+
+        inspector = inspect(db.engine)
+        columns = {column['name'] for column in inspector.get_columns('users')}
+
+        try:
+            if 'followers_count' not in columns:
+                with db.engine.begin() as conn:
+                    conn.execute(text("ALTER TABLE users ADD COLUMN followers_count INTEGER NOT NULL DEFAULT 0"))
+                print("✓ followers_count column added")
+            else:
+                print("✓ followers_count column already exists")
+
+            print("Backfilling followers_count from follows...")
+            fixed = UserSuggestService.reconcile_followers()
+            print(f"✓ followers_count backfilled ({fixed} users updated)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding followers_count: {e}")
+            return False
+
+        if db.engine.dialect.name != 'postgresql':
+            print(f"✓ {db.engine.dialect.name} database: trigram indexes not available, the in-memory trie is used")
+            print("\nMigration completed successfully!")
+            return True
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                print("✓ pg_trgm extension enabled")
+
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING GIN (username gin_trgm_ops)"
+                ))
+                print("✓ idx_users_username_trgm index ready")
+
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_users_username_prefix ON users (lower(username) text_pattern_ops)"
+                ))
+                print("✓ idx_users_username_prefix index ready")
+        except Exception as e:
+            print(f"✗ Error creating username indexes: {e}")
+            return False
+
+        print("\nMigration completed successfully!")
+        print("Restart the app to switch suggestions to the trigram indexes.")
+        return True
+
+if __name__ == '__main__':
+    success = migrate_user_suggest()
+    sys.exit(0 if success else 1)